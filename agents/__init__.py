@@ -3,7 +3,7 @@ Viral Engine Agents Package
 """
 from .agent_alpha import TrendHunterAgent, run_trend_hunter
 from .agent_beta import NarrativeArchitectAgent, run_narrative_architect
-from .agent_gamma import MediaForgeAgent, run_media_forge
+from .agent_gamma import MediaForgeAgent, run_media_forge, run_media_forge_variations
 from .agent_delta import ProfitOracleAgent, run_profit_oracle
 
 __all__ = [
@@ -14,5 +14,6 @@ __all__ = [
     "run_trend_hunter",
     "run_narrative_architect",
     "run_media_forge",
+    "run_media_forge_variations",
     "run_profit_oracle",
 ]
@@ -0,0 +1,249 @@
+"""
+Adaptive (AIMD) concurrency limits for external providers.
+
+Each provider gets a limiter whose concurrency grows additively while calls
+succeed (+1 per window of `limit` successes) and halves on an overload
+signal: HTTP 429/503, RESOURCE_EXHAUSTED, a timeout, or a rate-limit header
+reporting zero remaining requests. Overloads also block new calls for the
+provider's Retry-After (or an exponential backoff when none is given), with
+jitter so waiting workers don't all retry in the same instant.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Mapping, Optional, Tuple
+
+from loguru import logger
+
+from config.settings import RATE_LIMIT_MAX_BACKOFF
+
+logger_aimd = logger.bind(name="AdaptiveLimiter")
+
+_OVERLOAD_RE = re.compile(
+    r"\b429\b|\b503\b|RESOURCE_EXHAUSTED|rate.?limit|too many requests|overloaded|timed? ?out",
+    re.IGNORECASE,
+)
+_RETRY_DELAY_RE = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+
+# ---------------------------------------------------------------------------
+# Signal extraction
+# ---------------------------------------------------------------------------
+
+def _headers_of(obj: Any) -> Optional[Mapping[str, str]]:
+    if obj is None:
+        return None
+    headers = getattr(obj, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(obj, "response", None), "headers", None)
+    return headers
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After in seconds from either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limit_hint(headers: Optional[Mapping[str, str]]) -> Tuple[bool, Optional[float]]:
+    """
+    (exhausted, retry_after) from response headers: Retry-After, or an
+    X-RateLimit-Remaining of 0 with its reset (epoch or delta seconds).
+    """
+    if not headers:
+        return False, None
+    lowered = {k.lower(): v for k, v in headers.items()}
+    retry_after = parse_retry_after(lowered.get("retry-after"))
+    remaining = lowered.get("x-ratelimit-remaining") or lowered.get("x-ratelimit-remaining-requests")
+    exhausted = False
+    if remaining is not None:
+        try:
+            exhausted = float(remaining) <= 0
+        except ValueError:
+            pass
+    if exhausted and retry_after is None:
+        reset = lowered.get("x-ratelimit-reset") or lowered.get("x-ratelimit-reset-requests")
+        try:
+            reset_s = float(str(reset).rstrip("s"))
+            # Large values are epoch timestamps, small ones are deltas
+            retry_after = max(reset_s - time.time(), 0.0) if reset_s > 1e9 else reset_s
+        except (TypeError, ValueError):
+            pass
+    return exhausted or retry_after is not None, retry_after
+
+
+def overload_signal(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """(is_overload, retry_after) for an exception raised by a provider call."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True, None
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    message = str(error)
+    if status not in (429, 503) and not _OVERLOAD_RE.search(message):
+        return False, None
+    _, retry_after = rate_limit_hint(_headers_of(error))
+    if retry_after is None:
+        match = _RETRY_DELAY_RE.search(message)
+        if match:
+            retry_after = float(match.group(1))
+    return True, retry_after
+
+
+# ---------------------------------------------------------------------------
+# Limiter
+# ---------------------------------------------------------------------------
+
+class _Permit:
+    """Handle for one admitted call; report non-exception signals through it."""
+
+    __slots__ = ("limiter", "started", "reported")
+
+    def __init__(self, limiter: "AdaptiveLimiter", started: float):
+        self.limiter = limiter
+        self.started = started
+        self.reported = False
+
+    def overloaded(self, retry_after: Optional[float] = None) -> None:
+        self.reported = True
+        self.limiter.on_overload(retry_after, self.started)
+
+    def observe_headers(self, headers: Optional[Mapping[str, str]]) -> None:
+        """Treat an exhausted rate-limit budget on a response as an overload."""
+        exhausted, retry_after = rate_limit_hint(headers)
+        if exhausted:
+            self.overloaded(retry_after)
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self, name: str, initial: int, max_limit: int, min_limit: int = 1,
+        backoff_base: float = 1.0, max_backoff: float = RATE_LIMIT_MAX_BACKOFF,
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.in_flight = 0
+        self._lock = threading.Lock()  # overloads may be reported from worker threads
+        self._cond: Optional[asyncio.Condition] = None
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._streak = 0
+        self._stats = {"success": 0, "overload": 0}
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def blocked_for(self) -> float:
+        return max(self._blocked_until - time.monotonic(), 0.0)
+
+    def capacity(self) -> int:
+        return int(self.limit)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._stats["success"] += 1
+            self._streak = 0
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_overload(self, retry_after: Optional[float] = None, started: Optional[float] = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._stats["overload"] += 1
+            self._streak += 1
+            # Calls already in flight at the last cut report the same congestion — cut once
+            if started is None or started >= self._last_decrease:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+            if retry_after is not None:
+                delay = min(retry_after, self.max_backoff) * random.uniform(1.0, 1.2)
+            else:
+                delay = min(self.backoff_base * 2 ** (self._streak - 1), self.max_backoff)
+                delay = delay / 2 + random.uniform(0, delay / 2)
+            self._blocked_until = max(self._blocked_until, now + delay)
+        logger_aimd.warning(
+            f"{self.name}: overload — concurrency {self.limit:.1f}, backing off {delay:.1f}s"
+        )
+
+    async def _acquire(self) -> None:
+        cond = self._condition()
+        async with cond:
+            while True:
+                wait = self.blocked_for()
+                if wait <= 0 and self.in_flight < self.capacity():
+                    self.in_flight += 1
+                    return
+                try:
+                    await asyncio.wait_for(cond.wait(), timeout=wait or None)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self) -> None:
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[_Permit]:
+        """
+        Admit one call. A clean exit counts as success; an exception that
+        looks like throttling counts as overload (with its Retry-After);
+        other errors leave the limit unchanged.
+        """
+        await self._acquire()
+        permit = _Permit(self, time.monotonic())
+        try:
+            yield permit
+        except Exception as e:
+            if not permit.reported:
+                overloaded, retry_after = overload_signal(e)
+                if overloaded:
+                    permit.overloaded(retry_after)
+            raise
+        else:
+            if not permit.reported:
+                self.on_success()
+        finally:
+            await self._release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "max_limit": self.max_limit,
+            "blocked_for_seconds": round(self.blocked_for(), 1),
+            **self._stats,
+        }
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def get_limiter(name: str, initial: int = 2, max_limit: int = 8) -> AdaptiveLimiter:
+    """Shared limiter per provider; initial/max only apply on first use."""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = _limiters[name] = AdaptiveLimiter(name, initial, max_limit)
+    return limiter
+
+
+def limiter_states() -> Dict[str, Dict[str, Any]]:
+    return {name: lim.snapshot() for name, lim in sorted(_limiters.items())}
@@ -20,6 +20,7 @@ from config.settings import (
     PLAYWRIGHT_HEADLESS, USER_AGENT, TRENDS_DIR
 )
 from config.utils import save_trends_manifest
+from .llm_gateway import get_llm_gateway
 
 llm = None
 
@@ -36,9 +37,6 @@ class TrendHunterAgent:
     
     async def brainstorm(self, prompt: str) -> str:
         """Interactive brainstorm using Google Gemini about trends and opportunities."""
-        from google import genai
-        from config.settings import GOOGLE_VEO_API_KEY
-        
         system_context = (
             "You are Agent Alpha, a Senior Data Engineer & Trend Analyst "
             "specializing in TikTok and YouTube viral mechanics. You understand "
@@ -48,15 +46,11 @@ class TrendHunterAgent:
         full_prompt = f"{system_context}\n\nUser question: {prompt}\n\nProvide actionable insights:"
         
         try:
-            if not GOOGLE_VEO_API_KEY:
+            gateway = get_llm_gateway()
+            if not gateway.gemini_available():
                 raise ValueError("API Key missing")
-            
-            client = genai.Client(api_key=GOOGLE_VEO_API_KEY)
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=full_prompt
-            )
-            return response.text
+
+            return await gateway.gemini_generate(full_prompt, model="gemini-2.0-flash")
         except Exception as e:
             self.logger.warning(f"Gemini brainstorm failed: {e}")
             return (
@@ -7,23 +7,33 @@ from __future__ import annotations
 
 import random
 import re
+import time
 try:
     from crewai import Agent, Task
 except ImportError:
     Agent = None
     Task = None
-from typing import Dict, List, Any, Optional
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple
 import json
 from datetime import datetime
+from functools import lru_cache
+from string import Formatter
 from pathlib import Path
 from loguru import logger
 from config.settings import (
     ASSETS_DIR, CONTENT_LENGTH_SECONDS,
-    BAIDU_AI_API_KEY, BAIDU_AI_BASE_URL, BAIDU_AI_MODEL, BAIDU_AI_FALLBACK_MODEL,
-    GOOGLE_VEO_API_KEY,
+    BAIDU_AI_API_KEY, BAIDU_AI_MODEL, BAIDU_AI_FALLBACK_MODEL,
+    LLM_HEDGE_ENABLED, LLM_HEDGE_DELAY, LLM_STREAMING_ENABLED,
+    LLM_STRUCTURED_OUTPUT, LLM_BATCH_VARIATIONS, SCRIPT_REUSE_ENABLED,
+)
+from .topic_classifier import classify_topic
+from .llm_gateway import get_llm_gateway
+from .script_index import adapt_columns, covers_topic, get_script_index
+from .script_schema import (
+    SCENE_SCHEMA, JsonSceneStreamParser, extract_json, json_format_block,
+    repair_prompt, validate_scenes, validate_variations, variations_format_block,
+    variations_schema,
 )
-from openai import AsyncOpenAI
-from google import genai
 import asyncio
 
 llm = None
@@ -216,42 +226,7 @@ _COMMON_MISTAKES: Dict[str, str] = {
 
 def _classify_topic(topic: str) -> str:
     """Map a user topic to a category for template selection."""
-    topic_lower = topic.lower()
-
-    math_words = [
-        "math", "circle", "triangle", "geometry", "algebra", "calculus",
-        "equation", "formula", "circumference", "radius", "diameter",
-        "angle", "fraction", "pi", "area", "volume", "arithmetic",
-        "percentage", "quadratic", "polynomial", "number",
-    ]
-    if any(w in topic_lower for w in math_words):
-        return "education"
-
-    science_words = [
-        "physics", "chemistry", "biology", "atom", "molecule",
-        "experiment", "gravity", "energy", "cell", "dna",
-        "evolution", "quantum", "electron", "force", "science",
-    ]
-    if any(w in topic_lower for w in science_words):
-        return "education"
-
-    for key in _TOPIC_TIPS:
-        if key != "default" and key in topic_lower:
-            return key
-
-    mapping = {
-        "productivity": ["productive", "habit", "routine", "morning", "study", "student", "work", "focus"],
-        "fitness": ["gym", "exercise", "workout", "muscle", "weight", "body", "health", "wellness"],
-        "money": ["finance", "invest", "saving", "budget", "hustle", "income", "earn", "rich"],
-        "cooking": ["recipe", "food", "cook", "meal", "kitchen", "eat", "diet", "nutrition"],
-        "travel": ["trip", "flight", "backpack", "adventure", "destination", "vacation", "explore"],
-        "ai": ["artificial", "machine", "learning", "chatgpt", "automation", "tools", "tech"],
-        "philosophy": ["stoic", "existential", "ethics", "philosophy", "plato", "socrates"],
-    }
-    for cat, keywords in mapping.items():
-        if any(kw in topic_lower for kw in keywords):
-            return cat
-    return "default"
+    return classify_topic(topic)
 
 
 def _pick_visual(topic: str) -> str:
@@ -271,6 +246,125 @@ def _pick_visual(topic: str) -> str:
     return visuals.get(cat, visuals["default"])
 
 
+def _parse_script_line(line: str) -> Optional[Dict[str, str]]:
+    """One "timecode | visual | audio" row, or None for prose / headings / fences."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    # Format: "0-2s | visual | audio" or "0-2s: visual | audio" or "0-2s - visual - audio"
+    parts = None
+    if "|" in line:
+        parts = [p.strip().strip('"\'') for p in line.split("|")]
+    elif " - " in line:
+        parts = [p.strip().strip('"\'') for p in line.split(" - ", 2)]
+    elif ":" in line and len(line.split(":", 2)) >= 3:
+        parts = [p.strip().strip('"\'') for p in line.split(":", 2)]
+    if parts and len(parts) >= 3 and re.match(r"^\d", parts[0]):
+        return {
+            "timecode": parts[0],
+            "visual_cue": parts[1],
+            "audio": parts[2].strip('"\'') or parts[2],
+        }
+    return None
+
+
+# Template strings split once into (literal, field) parts, so rendering a
+# script is a join instead of re-parsing every str.format call.
+_Compiled = Tuple[Tuple[str, Optional[str]], ...]
+
+
+def _compile_template(text: str) -> _Compiled:
+    return tuple((literal, field) for literal, field, _, _ in Formatter().parse(text))
+
+
+def _render_compiled(parts: _Compiled, values: Dict[str, str]) -> str:
+    return "".join(literal + (values[field] if field is not None else "") for literal, field in parts)
+
+
+@lru_cache(maxsize=None)
+def _compiled_templates(language: str) -> Tuple[Tuple[str, Tuple[Tuple[str, _Compiled, _Compiled], ...]], ...]:
+    """(pattern, ((timecode, visual, audio), ...)) per hook template, compiled."""
+    pool = _HOOK_TEMPLATES_AR if language == "ar" else _HOOK_TEMPLATES
+    return tuple(
+        (
+            template["pattern"],
+            tuple(
+                (tc, _compile_template(vis), _compile_template(aud))
+                for tc, vis, aud in template["structure"]
+            ),
+        )
+        for template in pool
+    )
+
+
+def render_template_script(
+    topic: str, language: str = "en", seo_keywords: Optional[List[str]] = None,
+    rng: Any = random,
+) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    (hook pattern, columns) from the topic-aware template engine, no network.
+    rng is anything with choice() — a seeded random.Random gives a
+    reproducible script for the same topic.
+    """
+    cat = _classify_topic(topic)
+
+    if language == "ar":
+        tips_pool = _TOPIC_TIPS_AR.get(cat, _TOPIC_TIPS_AR["default"])
+        mistakes_pool = _COMMON_MISTAKES_AR
+    else:
+        tips_pool = _TOPIC_TIPS.get(cat, _TOPIC_TIPS["default"])
+        mistakes_pool = _COMMON_MISTAKES
+
+    values = {
+        "topic": topic,
+        "topic_visual": _pick_visual(topic),
+        "tip": rng.choice(tips_pool),
+        "common_mistake": mistakes_pool.get(cat, mistakes_pool["default"]),
+    }
+    pattern, structure = rng.choice(_compiled_templates(language))
+    columns = [
+        {
+            "timecode": tc,
+            "visual_cue": _render_compiled(vis, values),
+            "audio": _render_compiled(aud, values),
+        }
+        for tc, vis, aud in structure
+    ]
+
+    seo_str = ", ".join(seo_keywords[:3]) if seo_keywords else ""
+    if seo_str and columns:
+        last = columns[-1]
+        last["audio"] = last["audio"].rstrip('"') + f' #{seo_str}"'
+
+    return pattern, columns
+
+
+class _ScriptStreamParser:
+    """Feeds streamed text and parses each script row as soon as its line is complete."""
+
+    def __init__(self):
+        self.columns: List[Dict[str, str]] = []
+        self._buffer = ""
+
+    def feed(self, delta: str) -> bool:
+        """Returns True when new rows were parsed."""
+        self._buffer += delta
+        *lines, self._buffer = self._buffer.split("\n")
+        return self._take(lines)
+
+    def close(self) -> bool:
+        lines, self._buffer = [self._buffer], ""
+        return self._take(lines)
+
+    def _take(self, lines: List[str]) -> bool:
+        before = len(self.columns)
+        for line in lines:
+            column = _parse_script_line(line)
+            if column:
+                self.columns.append(column)
+        return len(self.columns) > before
+
+
 class NarrativeArchitectAgent:
     """
     Generates viral scripts with pattern interrupts, negative frames,
@@ -287,9 +381,6 @@ class NarrativeArchitectAgent:
 
     async def brainstorm(self, prompt: str) -> str:
         """Interactive brainstorm using Google Gemini about narrative and strategy."""
-        from google import genai
-        from config.settings import GOOGLE_VEO_API_KEY
-
         system_ctx = (
             "You are Agent Beta, a Viral Psychology Expert & Copywriter "
             "with 15+ years in viral marketing. You understand psychological triggers, "
@@ -298,15 +389,11 @@ class NarrativeArchitectAgent:
         full_prompt = f"{system_ctx}\n\nUser question: {prompt}\n\nProvide creative direction:"
         
         try:
-            if not GOOGLE_VEO_API_KEY:
+            gateway = get_llm_gateway()
+            if not gateway.gemini_available():
                 raise ValueError("API Key missing")
-            
-            client = genai.Client(api_key=GOOGLE_VEO_API_KEY)
-            response = client.models.generate_content(
-                model="gemini-1.5-flash",
-                contents=full_prompt
-            )
-            return response.text
+
+            return await gateway.gemini_generate(full_prompt, model="gemini-1.5-flash")
         except Exception as e:
             self.logger.warning(f"Gemini brainstorm failed: {e}")
             return (
@@ -344,10 +431,15 @@ class NarrativeArchitectAgent:
     async def generate_script(
         self, topic: str, hook_type: str = "pattern_interrupt",
         language: str = "en",
+        on_scenes: Optional[Callable[[List[Dict[str, str]]], Awaitable[None]]] = None,
+        reuse: bool = True,
     ) -> Dict[str, Any]:
         """
-        Premium script generation: Gemini/Baidu -> Template Fallback.
+        Premium script generation: Near-duplicate reuse -> Gemini/Baidu -> Template Fallback.
         Ensures high-retention structure and viral hooks.
+        on_scenes receives the rows parsed so far while the LLM streams.
+        reuse=False forces a fresh script: no index lookup and no completion
+        cache (the result is still indexed).
         """
         self.logger.info(f"✍️ [Agent Beta] Architectural design for campaign: {topic} (lang={language})")
 
@@ -358,18 +450,56 @@ class NarrativeArchitectAgent:
             None
         )
 
-        # Multi-stage generation
-        prompt = self._build_script_prompt(topic, hook_type, seo_keywords, selected_hook, language)
-        script_content, ai_source = await self._call_llm(prompt)
-        script_columns = self._parse_script_to_columns(script_content)
-
-        # Fallback if AI fails or output is garbage
-        if not script_columns or self._is_generic(script_columns, topic):
-            self.logger.info(f"AI source {ai_source} failed/generic — using topic-aware template engine")
-            script_columns = self._generate_topic_aware_columns(topic, language)
-            ai_source = "template"
+        # A near-duplicate of a past topic reuses that script instead of a new LLM call
+        index = get_script_index() if SCRIPT_REUSE_ENABLED else None
+        query = await index.query(topic) if index else None
+        match = index.nearest(query, language) if index and reuse else None
+        reused_from = None
+        script_columns: List[Dict[str, str]] = []
+
+        if match:
+            script_columns = adapt_columns(match["script_columns"], match["topic"], topic)
+            if self._is_generic(script_columns, topic) or not covers_topic(script_columns, topic):
+                self.logger.info(
+                    f"Similar topic '{match['topic']}' ({match['method']} similarity "
+                    f"{match['similarity']}) doesn't fit '{topic}' — writing a fresh script"
+                )
+                match = None
+
+        if match:
+            ai_source = match.get("script_source", "template")
+            reused_from = {
+                "topic": match["topic"],
+                "similarity": match["similarity"],
+                "method": match["method"],
+                "generated_at": datetime.fromtimestamp(match["created"]).isoformat(),
+            }
+            self.logger.info(
+                f"♻️ Reusing script from similar topic '{match['topic']}' "
+                f"({match['method']} similarity {match['similarity']})"
+            )
         else:
-            self.logger.info(f"Using Premium {ai_source.upper()} Scripting ({len(script_columns)} scenes)")
+            # Multi-stage generation
+            structured = LLM_STRUCTURED_OUTPUT
+            prompt = self._build_script_prompt(
+                topic, hook_type, seo_keywords, selected_hook, language, structured=structured,
+            )
+            script_content, ai_source = await self._call_llm(
+                prompt, fresh=not reuse, topic=topic, on_scenes=on_scenes, structured=structured,
+            )
+            script_columns = await self._columns_for(
+                script_content, topic, language, structured, fresh=not reuse,
+            )
+
+            # Fallback if AI fails or output is garbage
+            if not script_columns or self._is_generic(script_columns, topic):
+                self.logger.info(f"AI source {ai_source} failed/generic — using topic-aware template engine")
+                script_columns = self._generate_topic_aware_columns(topic, language)
+                ai_source = "template"
+            else:
+                self.logger.info(f"Using Premium {ai_source.upper()} Scripting ({len(script_columns)} scenes)")
+                if index:
+                    await index.add(query, language, script_columns, ai_source)
 
         final_raw = "\n".join(
             f"{c['timecode']} | {c['visual_cue']} | {c['audio']}"
@@ -386,6 +516,7 @@ class NarrativeArchitectAgent:
             "script_columns": script_columns,
             "raw_content": final_raw,
             "script_source": ai_source,
+            "reused_from": reused_from,
         }
 
         ts = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -413,6 +544,47 @@ class NarrativeArchitectAgent:
         all_audio = " ".join(c.get("audio", "").lower() for c in columns)
         return not any(w in all_audio for w in topic_words)
 
+    # ------------------------------------------------------------------
+    # Structured output
+    # ------------------------------------------------------------------
+
+    def _structured_columns(self, content: str, topic: str) -> tuple:
+        """(columns, errors) for a JSON script, counting generic narration as an error."""
+        columns, errors = validate_scenes(extract_json(content), self.content_duration)
+        if not errors and topic and self._is_generic(columns, topic):
+            errors.append(f'The narration never mentions "{topic}" — make every line specific to it.')
+        return columns, errors
+
+    async def _columns_for(
+        self, content: str, topic: str, language: str, structured: bool,
+        fresh: bool = False,
+    ) -> List[Dict[str, str]]:
+        """
+        Script rows from an LLM response. In structured mode an invalid JSON
+        script gets one repair call listing its problems; if that fails too,
+        the best partial result (or the free-text parser) is used. fresh
+        skips the completion cache for the repair call too.
+        """
+        if not content or not structured:
+            return self._parse_script_to_columns(content)
+        columns, errors = self._structured_columns(content, topic)
+        if not errors:
+            return columns
+
+        self.logger.info(f"Structured script invalid ({'; '.join(errors[:3])}) — requesting repair")
+        repaired, source = await self._call_llm(
+            repair_prompt(content, errors, language), fresh=fresh, topic=topic, structured=True,
+        )
+        if repaired:
+            fixed, fixed_errors = self._structured_columns(repaired, topic)
+            if not fixed_errors:
+                self.logger.info(f"Script repaired by {source} ({len(fixed)} scenes)")
+                return fixed
+            if fixed and (not columns or len(fixed_errors) < len(errors)):
+                columns = fixed
+        # The model may have ignored the JSON format entirely
+        return columns or self._parse_script_to_columns(content)
+
     # ------------------------------------------------------------------
     # Topic-aware template engine
     # ------------------------------------------------------------------
@@ -421,42 +593,9 @@ class NarrativeArchitectAgent:
         self, topic: str, language: str = "en",
     ) -> List[Dict[str, str]]:
         """Build a script from templates, trends data, and the topic."""
-        cat = _classify_topic(topic)
-
-        if language == "ar":
-            tips_pool = _TOPIC_TIPS_AR.get(cat, _TOPIC_TIPS_AR["default"])
-            mistakes_pool = _COMMON_MISTAKES_AR
-            templates_pool = _HOOK_TEMPLATES_AR
-        else:
-            tips_pool = _TOPIC_TIPS.get(cat, _TOPIC_TIPS["default"])
-            mistakes_pool = _COMMON_MISTAKES
-            templates_pool = _HOOK_TEMPLATES
-
-        tip = random.choice(tips_pool)
-        mistake = mistakes_pool.get(cat, mistakes_pool["default"])
-        visual = _pick_visual(topic)
-
-        seo = self.trends_data.get("seo_keywords", [])
-        seo_str = ", ".join(seo[:3]) if seo else ""
-
-        template = random.choice(templates_pool)
-        columns: List[Dict[str, str]] = []
-
-        for tc, vis_tpl, aud_tpl in template["structure"]:
-            vis = vis_tpl.format(
-                topic=topic, topic_visual=visual, tip=tip,
-                common_mistake=mistake,
-            )
-            aud = aud_tpl.format(
-                topic=topic, topic_visual=visual, tip=tip,
-                common_mistake=mistake,
-            )
-            columns.append({"timecode": tc, "visual_cue": vis, "audio": aud})
-
-        if seo_str and columns:
-            last = columns[-1]
-            last["audio"] = last["audio"].rstrip('"') + f' #{seo_str}"'
-
+        _, columns = render_template_script(
+            topic, language, self.trends_data.get("seo_keywords", []),
+        )
         return columns
 
     # ------------------------------------------------------------------
@@ -466,11 +605,19 @@ class NarrativeArchitectAgent:
     def _build_script_prompt(
         self, topic: str, hook_type: str, keywords: List[str],
         hook_pattern: Optional[Dict], language: str = "en",
+        structured: bool = False,
     ) -> str:
+        """Script prompt; structured=True asks for SCENE_SCHEMA JSON instead of pipe-separated lines."""
         kw = ", ".join(keywords[:5]) if keywords else "viral, trending, must-see"
         hook_ex = hook_pattern.get("example", "") if hook_pattern else ""
 
         if language == "ar":
+            output_format = json_format_block("ar") if structured else """أنشئ سكربتاً بثلاث أعمدة بالصيغة:
+[TIME CODE] | [وصف المشهد البصري] | [النص المنطوق]
+
+مثال:
+0-2s | شخص متفاجئ ينظر للكاميرا | "توقف — هذا يغير كل شيء"
+2-5s | لقطات توضيحية | "أغلب الناس يفهمون الموضوع غلط\""""
             return f"""أنت كاتب سكربتات فيرال محترف. اكتب سكربت تيك توك بالعربية:
 
 الموضوع: {topic}
@@ -478,8 +625,7 @@ class NarrativeArchitectAgent:
 المدة: {self.content_duration} ثانية
 الكلمات المفتاحية (أدخلها بشكل طبيعي): {kw}
 
-أنشئ سكربتاً بثلاث أعمدة بالصيغة:
-[TIME CODE] | [وصف المشهد البصري] | [النص المنطوق]
+{output_format}
 
 القواعد:
 1. ابدأ بـ pattern interrupt في أول ثانيتين
@@ -488,12 +634,21 @@ class NarrativeArchitectAgent:
 4. 100% أصلي وطبيعي عن "{topic}"
 5. اكتب كل شيء بالعربية الفصحى أو العامية حسب السياق
 
-مثال:
-0-2s | شخص متفاجئ ينظر للكاميرا | "توقف — هذا يغير كل شيء"
-2-5s | لقطات توضيحية | "أغلب الناس يفهمون الموضوع غلط"
-
 اكتب السكربت الآن:"""
 
+        if structured:
+            output_format = json_format_block("en")
+            output_rule = "Output ONLY the JSON object, no preamble or explanation"
+        else:
+            output_format = """OUTPUT FORMAT - Use EXACTLY this format, one scene per line:
+[TIME CODE] | [VISUAL CUE] | [SPOKEN AUDIO]
+
+Example:
+0-2s | Jump-cut to shocked face | "Wait... this is actually genius..."
+2-5s | B-roll footage | "Most people don't know this trick..."
+5-8s | Person demonstrating | "Here's exactly what to do\""""
+            output_rule = "Output ONLY the script lines in the format above, no preamble or explanation"
+
         return f"""
 You are a world-class viral script writer. Generate a TikTok script.
 
@@ -503,13 +658,7 @@ HOOK EXAMPLE: {hook_ex}
 DURATION: {self.content_duration} seconds
 SEO KEYWORDS (integrate naturally): {kw}
 
-OUTPUT FORMAT - Use EXACTLY this format, one scene per line:
-[TIME CODE] | [VISUAL CUE] | [SPOKEN AUDIO]
-
-Example:
-0-2s | Jump-cut to shocked face | "Wait... this is actually genius..."
-2-5s | B-roll footage | "Most people don't know this trick..."
-5-8s | Person demonstrating | "Here's exactly what to do"
+{output_format}
 
 Rules:
 1. Start with a PATTERN INTERRUPT in the first 2 seconds
@@ -517,116 +666,246 @@ Rules:
 3. Short punchy sentences (under 8 words each)
 4. End with CTA or curiosity hook
 5. 100% original about "{topic}" - no generic filler
-6. Output ONLY the script lines in the format above, no preamble or explanation
+6. {output_rule}
 
 Generate the script now:
 """
 
-    async def _call_baidu_ai(self, prompt: str) -> str:
+    async def _call_baidu_ai(
+        self, prompt: str, fresh: bool = False, structured: bool = False,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
         """Call Baidu AI Studio (Ernie) for dynamic script generation."""
         if not BAIDU_AI_API_KEY:
             return ""
-        
-        client = AsyncOpenAI(api_key=BAIDU_AI_API_KEY, base_url=BAIDU_AI_BASE_URL)
-
-        async def _extract_content(completion) -> str:
-            if not completion.choices:
-                return ""
-            msg = completion.choices[0].message
-            content = getattr(msg, "content", None) or ""
-            if not content and hasattr(msg, "reasoning_content") and msg.reasoning_content:
-                content = msg.reasoning_content
-            return content or ""
 
         for model in [BAIDU_AI_MODEL, BAIDU_AI_FALLBACK_MODEL]:
-            try:
-                self.logger.info(f"Calling Baidu AI ({model})...")
-                completion = await client.chat.completions.create(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}],
-                    stream=False,
-                    extra_body={"web_search": {"enable": False}},
-                    max_completion_tokens=4096,
-                )
-                content = await _extract_content(completion)
-                if content and len(content) > 20:
-                    self.logger.info("Baidu AI script generated successfully")
-                    return content
-            except Exception as e:
-                self.logger.warning(f"Baidu AI ({model}) failed: {e}. Trying fallback.")
+            content = await self._call_baidu_model(prompt, model, fresh, structured, validate)
+            if content:
+                return content
+        return ""
+
+    async def _call_baidu_model(
+        self, prompt: str, model: str, fresh: bool = False, structured: bool = False,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        try:
+            self.logger.info(f"Calling Baidu AI ({model})...")
+            content = await get_llm_gateway().baidu_chat(
+                prompt, model, fresh=fresh, json_mode=structured, validate=validate,
+            )
+            if content and len(content) > 20:
+                self.logger.info("Baidu AI script generated successfully")
+                return content
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"Baidu AI ({model}) failed: {e}. Trying fallback.")
         return ""
 
-    async def call_gemini(self, prompt: str) -> Optional[str]:
-        """Call Google Gemini 1.5 for premium scripting."""
+    async def call_gemini(
+        self, prompt: str, fresh: bool = False, structured: bool = False,
+        schema: Optional[Dict[str, Any]] = None,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> Optional[str]:
+        """
+        Call Google Gemini 1.5 for premium scripting (SCENE_SCHEMA JSON when
+        structured, or the given schema). Only answers passing validate are cached.
+        """
         try:
-            if not GOOGLE_VEO_API_KEY:
+            gateway = get_llm_gateway()
+            if not gateway.gemini_available():
                 self.logger.warning("GOOGLE_VEO_API_KEY missing - skipping Gemini scripting")
                 return None
             
             self.logger.info("Calling Google Gemini 2.0-Flash for script...")
-            client = genai.Client(api_key=GOOGLE_VEO_API_KEY)
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt
+            text = await gateway.gemini_generate(
+                prompt, model="gemini-2.0-flash", fresh=fresh,
+                schema=schema or (SCENE_SCHEMA if structured else None),
+                validate=validate,
             )
-            if response.text:
+            if text:
                 self.logger.success("Gemini script generated successfully")
-                return response.text
+                return text
             return None
         except Exception as e:
             self.logger.warning(f"Gemini scripting failed: {e}")
             return None
 
-    async def _call_llm(self, prompt: str) -> tuple:
-        """Returns (content, source) where source is 'gemini|baidu'. Fallback to template."""
+    async def _call_llm(
+        self, prompt: str, fresh: bool = False, topic: str = "",
+        on_scenes: Optional[Callable[[List[Dict[str, str]]], Awaitable[None]]] = None,
+        structured: bool = False,
+    ) -> tuple:
+        """
+        Returns (content, source) where source is 'gemini|baidu'. Fallback to template.
+        fresh=True bypasses the completion cache (distinct creative output).
+        structured=True requests SCENE_SCHEMA JSON from both providers.
+        With an on_scenes listener (and LLM_STREAMING_ENABLED) the script is
+        streamed (see _stream_llm) — providers are tried in turn, so hedging
+        doesn't apply; otherwise with LLM_HEDGE_ENABLED the providers race
+        (see _hedged_llm). Both use topic to reject generic output.
+        Only answers that pass _usable_script are written to the completion cache.
+        """
+        def validate(text: str) -> bool:
+            return self._usable_script(text, topic, structured)
+
+        if on_scenes is not None and LLM_STREAMING_ENABLED:
+            if LLM_HEDGE_ENABLED:
+                self.logger.debug("Streaming script — providers tried in turn, hedging skipped")
+            return await self._stream_llm(prompt, fresh, on_scenes, structured, validate)
+        if LLM_HEDGE_ENABLED:
+            return await self._hedged_llm(prompt, fresh, topic, structured, validate)
+
         # 1. Try Gemini (Primary per updated request)
-        gemini_out = await self.call_gemini(prompt)
+        gemini_out = await self.call_gemini(prompt, fresh, structured, validate=validate)
         if gemini_out:
             return (gemini_out, "gemini")
 
         # 2. Try Baidu (Secondary Fallback)
         if BAIDU_AI_API_KEY:
-            out = await self._call_baidu_ai(prompt)
+            out = await self._call_baidu_ai(prompt, fresh, structured, validate)
             if out:
                 return (out, "baidu")
 
         self.logger.info("Premium LLMs unavailable — using template engine.")
         return ("", "")
 
+    async def _stream_llm(
+        self, prompt: str, fresh: bool,
+        on_scenes: Callable[[List[Dict[str, str]]], Awaitable[None]],
+        structured: bool = False,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> tuple:
+        """
+        Stream from Gemini, then each Baidu model, calling on_scenes with all
+        rows parsed so far whenever a line completes. A finished stream only
+        wins if it passes validate (parses and isn't generic); if a provider
+        fails mid-stream or its script is rejected, on_scenes([]) resets the
+        preview before the next one. The first rejected script is returned if
+        no provider does better.
+        """
+        gateway = get_llm_gateway()
+        legs = []
+        if gateway.gemini_available():
+            legs.append(("gemini", "gemini-2.0-flash",
+                         lambda: gateway.gemini_stream(
+                             prompt, "gemini-2.0-flash", fresh=fresh,
+                             schema=SCENE_SCHEMA if structured else None, validate=validate,
+                         )))
+        if gateway.baidu_available():
+            for model in (BAIDU_AI_MODEL, BAIDU_AI_FALLBACK_MODEL):
+                legs.append(("baidu", model,
+                             lambda m=model: gateway.baidu_stream(
+                                 prompt, m, fresh=fresh, json_mode=structured, validate=validate,
+                             )))
+
+        fallback = ("", "")
+        for source, model, open_stream in legs:
+            parser = JsonSceneStreamParser() if structured else _ScriptStreamParser()
+            parts: List[str] = []
+            self.logger.info(f"Streaming script from {source} ({model})...")
+            try:
+                async for delta in open_stream():
+                    parts.append(delta)
+                    if parser.feed(delta):
+                        await on_scenes(list(parser.columns))
+                if parser.close():
+                    await on_scenes(list(parser.columns))
+            except Exception as e:
+                self.logger.warning(f"{source} ({model}) stream failed: {e}")
+                parts = []
+            content = "".join(parts)
+            if len(content) > 20:
+                if validate is None or validate(content):
+                    self.logger.success(f"{source} script streamed ({len(parser.columns)} scenes)")
+                    return (content, source)
+                self.logger.info(f"{source} ({model}) streamed an unusable script — trying next provider")
+                if not fallback[0]:
+                    fallback = (content, source)
+            if parser.columns:
+                await on_scenes([])
+
+        if not fallback[0]:
+            self.logger.info("Premium LLMs unavailable — using template engine.")
+        return fallback
+
+    def _usable_script(self, content: str, topic: str, structured: bool = False) -> bool:
+        if structured:
+            return not self._structured_columns(content, topic)[1]
+        columns = self._parse_script_to_columns(content)
+        return bool(columns) and not (topic and self._is_generic(columns, topic))
+
+    async def _hedged_llm(
+        self, prompt: str, fresh: bool, topic: str, structured: bool = False,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> tuple:
+        """
+        Hedged requests: Gemini starts first, and each further provider
+        (Baidu primary, then Baidu fallback model) starts after
+        LLM_HEDGE_DELAY seconds, or immediately once every running call has
+        failed. The first response that parses and isn't generic wins; the
+        rest are cancelled.
+        """
+        legs = []
+        if get_llm_gateway().gemini_available():
+            legs.append(("gemini", lambda: self.call_gemini(prompt, fresh, structured, validate=validate)))
+        if BAIDU_AI_API_KEY:
+            for model in (BAIDU_AI_MODEL, BAIDU_AI_FALLBACK_MODEL):
+                legs.append(("baidu", lambda m=model: self._call_baidu_model(
+                    prompt, m, fresh, structured, validate,
+                )))
+
+        running: Dict[asyncio.Task, str] = {}
+        fallback = ("", "")
+        started = time.monotonic()
+        next_leg = 0
+        try:
+            while running or next_leg < len(legs):
+                if running:
+                    # Wait for a result; hedge with the next leg if none comes in time
+                    hedge = next_leg < len(legs)
+                    done, _ = await asyncio.wait(
+                        running, timeout=LLM_HEDGE_DELAY if hedge else None,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                if not running or (hedge and not done):
+                    source, call = legs[next_leg]
+                    running[asyncio.create_task(call())] = source
+                    next_leg += 1
+                    continue
+                for task in [t for t in running if t.done()]:
+                    source = running.pop(task)
+                    content = task.result() if not task.cancelled() else None
+                    if not content:
+                        continue
+                    if self._usable_script(content, topic, structured):
+                        self.logger.info(
+                            f"Hedged LLM: {source} won after {time.monotonic() - started:.1f}s"
+                        )
+                        return (content, source)
+                    if not fallback[0]:
+                        fallback = (content, source)
+        finally:
+            for task in running:
+                task.cancel()
+
+        if not fallback[0]:
+            self.logger.info("Premium LLMs unavailable — using template engine.")
+        return fallback
+
     def _parse_script_to_columns(self, content: str) -> List[Dict[str, str]]:
         """Parse script text into columns. Handles markdown, multiple formats."""
-        columns = []
         raw = content.strip()
         # Extract from markdown code block if present
         code_match = re.search(r"```[\w]*\n?(.*?)```", raw, re.DOTALL | re.IGNORECASE)
         if code_match:
             raw = code_match.group(1).strip()
+        columns = []
         for line in raw.split("\n"):
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            # Format: "0-2s | visual | audio" or "0-2s: visual | audio" or "0-2s - visual - audio"
-            parts = None
-            if "|" in line:
-                parts = [p.strip().strip('"\'') for p in line.split("|")]
-            elif " - " in line:
-                parts = [p.strip().strip('"\'') for p in line.split(" - ", 2)]
-            elif ":" in line and len(line.split(":", 2)) >= 3:
-                parts = [p.strip().strip('"\'') for p in line.split(":", 2)]
-            if parts and len(parts) >= 3:
-                tc = parts[0]
-                if re.match(r"^\d+s?-\d+s?$|^\d+-\d+s?$", tc.replace(" ", "")):
-                    columns.append({
-                        "timecode": tc,
-                        "visual_cue": parts[1],
-                        "audio": parts[2].strip('"\'') or parts[2],
-                    })
-                elif re.match(r"^\d", tc):
-                    columns.append({
-                        "timecode": tc,
-                        "visual_cue": parts[1],
-                        "audio": parts[2].strip('"\'') or parts[2],
-                    })
+            column = _parse_script_line(line)
+            if column:
+                columns.append(column)
         return columns
 
     # ------------------------------------------------------------------
@@ -634,28 +913,144 @@ Generate the script now:
     # ------------------------------------------------------------------
 
     async def generate_variations(self, base_script: Dict[str, Any], num_variations: int = 2) -> List[Dict[str, Any]]:
-        self.logger.info(f"Generating {num_variations} script variations in parallel...")
+        """
+        A/B hook variations. With LLM_BATCH_VARIATIONS all of them are asked
+        for in one structured request; any the batch doesn't deliver (or the
+        whole set, if it fails to parse) are generated by parallel calls.
+        """
         topic = base_script.get("topic", "viral content")
         lang = base_script.get("language", "en")
         seo = base_script.get("seo_keywords", [])
+        templates = _HOOK_TEMPLATES_AR if lang == "ar" else _HOOK_TEMPLATES
+        hook_types = [templates[i % len(templates)]["pattern"] for i in range(num_variations)]
+
+        scripts: Dict[int, List[Dict[str, str]]] = {}
+        if LLM_BATCH_VARIATIONS and num_variations > 1:
+            scripts = await self._batched_variations(topic, lang, seo, hook_types)
 
         async def _gen_one(i):
-            prompt = self._build_script_prompt(topic, "pattern_interrupt", seo, None, lang)
-            content, source = await self._call_llm(prompt)
-            columns = self._parse_script_to_columns(content)
+            structured = LLM_STRUCTURED_OUTPUT
+            prompt = self._build_script_prompt(
+                topic, "pattern_interrupt", seo, None, lang, structured=structured,
+            )
+            # Variations share one prompt, so each needs its own completion
+            content, source = await self._call_llm(prompt, fresh=True, topic=topic, structured=structured)
+            columns = await self._columns_for(content, topic, lang, structured, fresh=True)
             if not columns:
                 columns = self._generate_topic_aware_columns(topic, lang)
-            raw = "\n".join(f"{c['timecode']} | {c['visual_cue']} | {c['audio']}" for c in columns)
-            templates = _HOOK_TEMPLATES_AR if lang == "ar" else _HOOK_TEMPLATES
-            return {
+            return columns
+
+        missing = [i for i in range(num_variations) if i not in scripts]
+        if missing:
+            self.logger.info(f"Generating {len(missing)} script variations in parallel...")
+            scripts.update(zip(missing, await asyncio.gather(*(_gen_one(i) for i in missing))))
+
+        return [
+            {
                 "variation_number": i + 1,
-                "hook_type": templates[i % len(templates)]["pattern"],
+                "hook_type": hook_types[i],
                 "script_columns": columns,
-                "raw_content": raw,
+                "raw_content": "\n".join(
+                    f"{c['timecode']} | {c['visual_cue']} | {c['audio']}" for c in columns
+                ),
             }
+            for i, columns in sorted(scripts.items())
+        ]
+
+    async def _batched_variations(
+        self, topic: str, language: str, keywords: List[str], hook_types: List[str],
+    ) -> Dict[int, List[Dict[str, str]]]:
+        """
+        One request for len(hook_types) scripts. Returns the valid, distinct,
+        on-topic ones keyed by hook index ({} when the providers fail or the
+        batch doesn't parse).
+        """
+        count = len(hook_types)
+        self.logger.info(f"Generating {count} script variations in one batched call...")
+        prompt = self._build_variations_prompt(topic, keywords, language, hook_types)
+        content = await self.call_gemini(prompt, fresh=True, schema=variations_schema(count))
+        if not content:
+            content = await self._call_baidu_ai(prompt, fresh=True, structured=True)
+        if not content:
+            return {}
+
+        scripts, errors = validate_variations(extract_json(content), count, self.content_duration)
+        distinct: Dict[int, List[Dict[str, str]]] = {}
+        openers = set()
+        for i, columns in scripts.items():
+            opener = columns[0]["audio"].strip().lower()
+            if opener in openers or self._is_generic(columns, topic):
+                continue
+            openers.add(opener)
+            distinct[i] = columns
+        if errors or len(distinct) < len(scripts):
+            self.logger.info(
+                f"Batched variations: {len(distinct)}/{count} usable"
+                + (f" ({'; '.join(errors[:3])})" if errors else "")
+            )
+        return distinct
+
+    def _build_variations_prompt(
+        self, topic: str, keywords: List[str], language: str, hook_types: List[str],
+    ) -> str:
+        kw = ", ".join(keywords[:5]) if keywords else "viral, trending, must-see"
+        hooks = "\n".join(f"{i}. {hook}" for i, hook in enumerate(hook_types, 1))
+        language_rule = (
+            "\n6. Write visual_cue and audio in Arabic; keep the JSON keys and timecodes in English"
+            if language == "ar" else ""
+        )
+        return f"""
+You are a world-class viral script writer. Write {len(hook_types)} DISTINCT TikTok scripts
+about the same topic for an A/B hook test.
+
+TOPIC: {topic}
+DURATION: {self.content_duration} seconds each
+SEO KEYWORDS (integrate naturally): {kw}
 
-        tasks = [_gen_one(i) for i in range(num_variations)]
-        return await asyncio.gather(*tasks)
+HOOK TYPE per variation, in order:
+{hooks}
+
+Rules:
+1. Each variation opens with its own hook type in the first 2 seconds - no two openings alike
+2. Integrate 2-3 SEO keywords naturally
+3. Short punchy sentences (under 8 words each)
+4. End with CTA or curiosity hook
+5. 100% original about "{topic}" - no generic filler{language_rule}
+
+{variations_format_block(len(hook_types))}
+
+Generate the scripts now:
+"""
+
+    def splice_hook_variants(
+        self, base_script: Dict[str, Any], variations: List[Dict[str, Any]],
+        hook_scenes: int = 1,
+    ) -> List[Dict[str, Any]]:
+        """
+        Build hook A/B render variants: each keeps the base script's body and
+        swaps in the first `hook_scenes` scenes of one variation (retimed to
+        the base timecodes). The base script itself is variant 0 (control).
+        """
+        base_columns = base_script.get("script_columns", [])
+        variants = [{
+            "hook_type": base_script.get("hook_type", ""),
+            "script_columns": base_columns,
+            "captions": self.generate_captions(base_columns),
+        }]
+        for var in variations:
+            hook = var.get("script_columns", [])[:hook_scenes]
+            if not hook or len(base_columns) <= len(hook):
+                continue
+            columns = [
+                {**col, "timecode": base_columns[i].get("timecode", col.get("timecode", ""))}
+                for i, col in enumerate(hook)
+            ] + base_columns[len(hook):]
+            variants.append({
+                "hook_type": var.get("hook_type", ""),
+                "script_columns": columns,
+                "captions": self.generate_captions(columns),
+            })
+        return variants
 
     # ------------------------------------------------------------------
     # Captions
@@ -681,19 +1076,29 @@ Generate the script now:
 
 async def run_narrative_architect(
     trends_data: Dict[str, Any], topic: str = "lifestyle_hack",
-    language: str = "en",
+    language: str = "en", num_variations: int = 0,
+    on_scenes: Optional[Callable[[List[Dict[str, str]]], Awaitable[None]]] = None,
+    reuse: bool = True,
 ) -> Dict[str, Any]:
     architect = NarrativeArchitectAgent(trends_data)
     
     # Generate single script
-    script = await architect.generate_script(topic, hook_type="pattern_interrupt", language=language)
+    script = await architect.generate_script(
+        topic, hook_type="pattern_interrupt", language=language, on_scenes=on_scenes,
+        reuse=reuse,
+    )
     
     # Generate captions from the script
     captions = await asyncio.to_thread(architect.generate_captions, script.get("script_columns", []))
 
+    # Optional hook variations for A/B renders
+    variations: List[Dict[str, Any]] = []
+    if num_variations > 0:
+        variations = await architect.generate_variations(script, num_variations)
+
     return {
         "main_script": script,
-        "variations": [],  # Simplified: no variations
+        "variations": variations,
         "captions": captions,
-        "scripts_ready_for_production": 1,
+        "scripts_ready_for_production": 1 + len(variations),
     }
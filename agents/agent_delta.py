@@ -18,6 +18,7 @@ import requests
 from config.settings import (
     ASSETS_DIR, MONETIZATION_FOCUS
 )
+from .llm_gateway import get_llm_gateway
 
 llm = None
 
@@ -38,9 +39,6 @@ class ProfitOracleAgent:
     
     async def brainstorm(self, prompt: str) -> str:
         """Interactive brainstorm using Google Gemini about monetization strategies."""
-        from google import genai
-        from config.settings import GOOGLE_VEO_API_KEY
-        
         system_context = (
             "You are Agent Delta, an E-commerce Strategist & Monetization Expert "
             "with 8+ years in affiliate marketing, TikTok Shop optimization, and "
@@ -50,15 +48,11 @@ class ProfitOracleAgent:
         full_prompt = f"{system_context}\n\nUser question: {prompt}\n\nProvide monetization strategy:"
         
         try:
-            if not GOOGLE_VEO_API_KEY:
+            gateway = get_llm_gateway()
+            if not gateway.gemini_available():
                 raise ValueError("API Key missing")
-            
-            client = genai.Client(api_key=GOOGLE_VEO_API_KEY)
-            response = client.models.generate_content(
-                model="gemini-1.5-flash",
-                contents=full_prompt
-            )
-            return response.text
+
+            return await gateway.gemini_generate(full_prompt, model="gemini-1.5-flash")
         except Exception as e:
             self.logger.warning(f"Gemini brainstorm failed: {e}")
             return (
@@ -120,19 +114,12 @@ Respond in JSON format.
 """
         
         try:
-            from google import genai
-            from config.settings import GOOGLE_VEO_API_KEY
-            
-            if not GOOGLE_VEO_API_KEY:
+            gateway = get_llm_gateway()
+            if not gateway.gemini_available():
                 return self._get_fallback_analysis()
-                
-            client = genai.Client(api_key=GOOGLE_VEO_API_KEY)
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt,
-                config={"response_mime_type": "application/json"}
-            )
-            analysis = json.loads(response.text)
+
+            text = await gateway.gemini_generate(prompt, model="gemini-2.0-flash", json_mode=True)
+            analysis = json.loads(text)
             return analysis
         except Exception as e:
             self.logger.warning(f"Gemini analysis failed: {e}")
@@ -263,10 +250,8 @@ Respond in JSON format.
         self.logger.info("Generating CTA strategies...")
         
         strategies = []
-        
-        from google import genai
-        from config.settings import GOOGLE_VEO_API_KEY
-        
+        gateway = get_llm_gateway()
+
         for product in products:
             prompt = f"""
 Create 3 unique, native TikTok CTAs for this product without being salesy:
@@ -278,17 +263,12 @@ Respond ONLY in JSON format with: cta_text, placement_timing, delivery_tone
 """
             
             try:
-                if not GOOGLE_VEO_API_KEY:
+                if not gateway.gemini_available():
                     strategies.append(self._get_fallback_cta(product))
                     continue
-                    
-                client = genai.Client(api_key=GOOGLE_VEO_API_KEY)
-                response = client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=prompt,
-                    config={"response_mime_type": "application/json"}
-                )
-                strategy = json.loads(response.text)
+
+                text = await gateway.gemini_generate(prompt, model="gemini-2.0-flash", json_mode=True)
+                strategy = json.loads(text)
                 strategies.append(strategy)
             except Exception as e:
                 self.logger.warning(f"Gemini CTA generation failed: {e}")
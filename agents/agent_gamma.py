@@ -12,12 +12,16 @@ Pipeline:
 """
 from __future__ import annotations
 
+import os
 import re
 import wave
 import json
+import shutil
+import hashlib
 import subprocess
 import asyncio
-from typing import Dict, List, Any, Optional
+import uuid
+from typing import Dict, List, Any, Optional, Set
 from pathlib import Path
 from datetime import datetime
 from loguru import logger
@@ -30,12 +34,24 @@ except ImportError:
     Task = None
 
 from config.settings import (
-    COMFYUI_BASE_URL, COMFYUI_WEBSOCKET_URL, ASSETS_DIR,
+    COMFYUI_BASE_URL, COMFYUI_WEBSOCKET_URL, COMFYUI_ENABLED,
     RENDER_DIR, VIDEO_RESOLUTION, VIDEO_FPS, AUDIO_BITRATE,
     FFMPEG_BIN, PEXELS_API_KEY, PIXABAY_API_KEY,
-    GOOGLE_VEO_API_KEY, GOOGLE_VEO_MODEL,
+    GOOGLE_VEO_API_KEY, GOOGLE_VEO_MODEL, VEO_SPLIT_MODE, VEO_MAX_CLIP_SECONDS,
+    CLIP_QC_ENABLED, STOCK_STREAM_TRIM, STOCK_MAX_CONCURRENCY,
     REPLICATE_API_TOKEN, REPLICATE_VIDEO_MODEL,
+    HLS_ENABLED, HLS_DIR, HLS_SEGMENT_SECONDS, HLS_LOW_BITRATE,
+    PLATFORM_EXPORTS, EXPORT_MAX_MB, EXPORT_TWO_PASS, EXPORT_SIZE_MARGIN,
 )
+from config.utils import scratch_path, scratch_namespace, is_scratch
+from .comfyui_client import get_comfyui_client
+from .encoder_calibration import choose_x264_settings
+from .veo_scheduler import get_veo_scheduler
+from .veo_journal import get_veo_journal, prompt_hash
+from .clip_quality import inspect_clip, summarize
+from .topic_classifier import detect_domain
+from .circuit_breaker import get_breaker
+from .adaptive_limiter import get_limiter, overload_signal, parse_retry_after
 
 logger_gamma = logger.bind(name="MediaForge")
 
@@ -44,8 +60,44 @@ SCENE_COLORS = [
     "#A04000", "#1B4F72", "#7D3C98", "#2E86C1",
 ]
 
-_DOWNLOAD_SEM = asyncio.Semaphore(3)
-_VEO_SEM = asyncio.Semaphore(1) # Veo 3.1 is heavy; generate 1 at a time for stability
+_EXPORT_SEM = asyncio.Semaphore(2)  # platform variants are light remuxes/transcodes
+
+
+def _stock_limiter():
+    """Adaptive limit on concurrent stock fetches (starts at the old fixed 3)."""
+    return get_limiter("stock", 3, STOCK_MAX_CONCURRENCY)
+
+
+# Clip lengths Veo accepts per generation (split mode picks the shortest that fits)
+_VEO_DURATIONS = (4, 6, 8)
+
+# Rough intermediate sizes for the scratch-space guard
+_SCRATCH_CLIP_BYTES = 32 * 1024 * 1024
+_SCRATCH_ASSEMBLY_BYTES = 160 * 1024 * 1024
+
+# Delivery limits per platform; variants are derived from the mezzanine render
+PLATFORM_EXPORT_SPECS: Dict[str, Dict[str, Any]] = {
+    "tiktok": {
+        "max_height": 1920, "max_duration": 600,
+        "max_video_kbps": 8000, "audio_kbps": 128,
+        "max_bytes": 287 * 1024 * 1024,
+    },
+    "youtube": {
+        "max_height": 1920, "max_duration": 180,
+        "max_video_kbps": 12000, "audio_kbps": 192,
+        "max_bytes": 1024 * 1024 * 1024,
+    },
+    "instagram": {
+        "max_height": 1920, "max_duration": 90,
+        "max_video_kbps": 5000, "audio_kbps": 128,
+        "max_bytes": 100 * 1024 * 1024,
+    },
+    "twitter": {
+        "max_height": 1280, "max_duration": 140,
+        "max_video_kbps": 5000, "audio_kbps": 128,
+        "max_bytes": 512 * 1024 * 1024,
+    },
+}
 
 _NOISE_WORDS = frozenset({
     "jump-cut", "jump", "cut", "to", "transition", "overlay", "effect",
@@ -79,12 +131,25 @@ class MediaForgeAgent:
     Falls back gracefully: stock video → ComfyUI image → Pillow placeholder.
     """
 
-    def __init__(self, script_data: Optional[Dict[str, Any]] = None):
+    def __init__(
+        self, script_data: Optional[Dict[str, Any]] = None,
+        generation_id: Optional[str] = None,
+    ):
         self.logger = logger_gamma
         self.script_data = script_data or {}
+        # Flow id for fair Veo scheduling across concurrent generations
+        self.generation_id = generation_id or f"forge-{uuid.uuid4().hex[:8]}"
         self.comfyui_url = COMFYUI_BASE_URL
         self.ws_url = COMFYUI_WEBSOCKET_URL
         self.ffmpeg = FFMPEG_BIN
+        self.hls_enabled = HLS_ENABLED
+        # Content-keyed asset caches shared across renders on this instance
+        self._clip_cache: Dict[str, Path] = {}
+        self._tts_cache: Dict[str, Path] = {}
+        self._scratch_files: List[Path] = []
+        # Paths of clips that are stills by design (placeholders, ComfyUI
+        # images) — exempt from the frozen check
+        self._static_clips: Set[Path] = set()
 
     def brainstorm(self, prompt: str) -> str:
         return (
@@ -126,14 +191,18 @@ class MediaForgeAgent:
     ) -> List[Path]:
         """
         For every scene, acquire a trimmed video clip via Veo.
-        Scenes are merged to max 3 to keep Veo calls efficient.
+        Scenes are merged to max 5 to keep Veo calls efficient — except in
+        split mode, where runs of the original scenes share one generation
+        and are cut apart again, so merging would only make the groups too
+        long to fit one Veo clip.
         """
         # Merge scenes into max 5 for Veo
         MAX_SCENES = 5
         columns = self.script_data.get("script_columns", [])
         topic = self.script_data.get("topic", "")
+        split_mode = bool(VEO_SPLIT_MODE and GOOGLE_VEO_API_KEY and len(GOOGLE_VEO_API_KEY) > 5)
 
-        if len(scene_descriptions) > MAX_SCENES:
+        if len(scene_descriptions) > MAX_SCENES and not split_mode:
             merged_descs = []
             merged_audio = []
             chunk_size = len(scene_descriptions) / MAX_SCENES
@@ -157,17 +226,182 @@ class MediaForgeAgent:
             f"({dur_per:.1f}s each, topic='{topic}')..."
         )
 
-        # Generate scenes sequentially to avoid API rate limits
-        clips = []
+        audios = [
+            columns[idx].get("audio", "") if idx < len(columns) else ""
+            for idx in range(len(scene_descriptions))
+        ]
+        keys = [
+            self._asset_key(topic, idx, desc, audios[idx], f"{dur_per:.3f}")
+            for idx, desc in enumerate(scene_descriptions)
+        ]
+
+        clips: List[Optional[Path]] = []
+        for idx, key in enumerate(keys):
+            cached = self._clip_cache.get(key)
+            if cached and cached.exists() and cached.stat().st_size > 0:
+                self.logger.info(f"Scene {idx}: reusing shared clip")
+                clips.append(cached)
+            else:
+                clips.append(None)
+
+        # Optional: fewer, longer Veo generations split locally per scene
+        veo_attempted: set = set()
+        if split_mode:
+            pending = [idx for idx, clip in enumerate(clips) if clip is None]
+            for group in self._plan_veo_groups(pending, dur_per):
+                split = await self._generate_veo_group(
+                    group, scene_descriptions, audios, topic, dur_per,
+                )
+                veo_attempted.update(group)
+                for idx, clip in split.items():
+                    clips[idx] = self._remember_clip(keys[idx], clip)
+
+        # Generate remaining scenes sequentially to avoid API rate limits
         for idx, desc in enumerate(scene_descriptions):
-            audio = ""
-            if idx < len(columns):
-                audio = columns[idx].get("audio", "")
-            clip = await self._get_scene_clip(desc, audio, topic, idx, dur_per)
-            clips.append(clip)
+            if clips[idx] is not None:
+                continue
+            if idx in veo_attempted:
+                clip = await self._fallback_scene_clip(desc, audios[idx], idx, dur_per)
+            else:
+                clip = await self._get_scene_clip(desc, audios[idx], topic, idx, dur_per)
+            clips[idx] = self._remember_clip(keys[idx], clip)
 
+        if CLIP_QC_ENABLED:
+            clips = await self._quality_gate(clips, scene_descriptions, audios, keys, dur_per)
         return clips
 
+    async def _quality_gate(
+        self, clips: List[Path], descs: List[str], audios: List[str],
+        keys: List[str], duration: float,
+    ) -> List[Path]:
+        """Sample every clip before assembly; replace black/frozen/corrupt/short ones."""
+        reports = await asyncio.gather(*(
+            asyncio.to_thread(inspect_clip, clip, duration, clip in self._static_clips)
+            for clip in clips
+        ))
+        summary = summarize(reports)
+        if not summary:
+            self.logger.info(f"Clip QC: all {len(clips)} scene clip(s) passed")
+            return clips
+
+        self.logger.warning(f"Clip QC flagged: {summary}")
+        for idx, report in enumerate(reports):
+            if report["ok"]:
+                continue
+            self._clip_cache.pop(keys[idx], None)
+            replacement = await self._fallback_scene_clip(descs[idx], audios[idx], idx, duration)
+            recheck = await asyncio.to_thread(inspect_clip, replacement, duration, True)
+            if recheck["ok"]:
+                clips[idx] = self._remember_clip(keys[idx], replacement)
+                self.logger.info(f"Scene {idx}: replaced flagged clip")
+            else:
+                self.logger.error(f"Scene {idx}: replacement also failed QC ({', '.join(recheck['issues'])})")
+        return clips
+
+    def _scratch(self, name: str, expected_bytes: int = 0) -> Path:
+        """Intermediate path (scratch when it has room), remembered for release_scratch()."""
+        path = scratch_path(name, expected_bytes, self.generation_id)
+        self._scratch_files.append(path)
+        self._static_clips.discard(path)  # about to be overwritten with new content
+        return path
+
+    def release_scratch(self) -> None:
+        """Free scratch-space intermediates once final outputs exist (disk fallbacks are left to cleanup)."""
+        namespace = scratch_namespace(self.generation_id)
+        own_dirs = set()
+        for path in [*self._scratch_files, *self._clip_cache.values()]:
+            if not is_scratch(path):
+                continue
+            if path.parent.name == namespace:
+                own_dirs.add(path.parent)
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+        for folder in own_dirs:
+            try:
+                folder.rmdir()
+            except OSError:
+                pass  # something else still lives there
+        self._scratch_files.clear()
+        self._clip_cache.clear()
+        self._tts_cache.clear()
+        self._static_clips.clear()
+
+    @staticmethod
+    def _asset_key(*parts: Any) -> str:
+        return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    def _remember_clip(self, key: str, clip: Path) -> Path:
+        """Move a finished clip to a content-keyed name so later scenes can't overwrite it."""
+        if not clip.exists() or clip.stat().st_size == 0:
+            return clip
+        target = clip.with_name(f"scene_{key[:16]}{clip.suffix}")
+        try:
+            clip.replace(target)
+        except OSError:
+            return clip
+        if clip in self._static_clips:
+            # The per-scene name gets reused by later scenes; the mark follows the file
+            self._static_clips.discard(clip)
+            self._static_clips.add(target)
+        self._clip_cache[key] = target
+        return target
+
+    @staticmethod
+    def _plan_veo_groups(pending: List[int], dur_per: float) -> List[List[int]]:
+        """Pack consecutive pending scenes into runs that fit one Veo generation."""
+        groups: List[List[int]] = []
+        current: List[int] = []
+        for idx in pending:
+            contiguous = current and idx == current[-1] + 1
+            fits = (len(current) + 1) * dur_per <= VEO_MAX_CLIP_SECONDS
+            if current and not (contiguous and fits):
+                groups.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _generate_veo_group(
+        self, group: List[int], descs: List[str], audios: List[str],
+        topic: str, dur_per: float,
+    ) -> Dict[int, Path]:
+        """One Veo generation covering consecutive scenes, cut locally at the planned timecodes."""
+        span = dur_per * len(group)
+        veo_seconds = next((d for d in _VEO_DURATIONS if d >= span), _VEO_DURATIONS[-1])
+        shots = []
+        for j, idx in enumerate(group):
+            shots.append(
+                f"Shot {j + 1} ({j * dur_per:.1f}-{(j + 1) * dur_per:.1f}s): {descs[idx]}. "
+                f"Voiceover: {audios[idx]}"
+            )
+        prompt = (
+            f"Cinematic vertical TikTok video for {topic}. "
+            f"One continuous {veo_seconds}s sequence of {len(group)} shots in this order, "
+            f"hard cut between shots: " + " | ".join(shots) + ". "
+            f"High-energy, professional, realistic, 9:16 aspect ratio."
+        )
+        first = group[0]
+        self.logger.info(
+            f"Scenes {group[0]}-{group[-1]}: [Veo 3.1] one {veo_seconds}s generation for {len(group)} scene(s)"
+        )
+        raw = await self._generate_video_via_veo(
+            descs[first], audios[first], topic, first,
+            prompt_override=prompt, duration_seconds=veo_seconds,
+        )
+        if not raw:
+            return {}
+
+        split: Dict[int, Path] = {}
+        for j, idx in enumerate(group):
+            clip = await self._prepare_clip(raw, idx, dur_per, start=j * dur_per)
+            if clip:
+                split[idx] = clip
+        self.logger.info(f"Scenes {group[0]}-{group[-1]}: split into {len(split)} clip(s)")
+        return split
+
     async def _get_scene_clip(
         self, visual_cue: str, narration: str, topic: str,
         idx: int, duration: float,
@@ -187,6 +421,28 @@ class MediaForgeAgent:
         else:
             self.logger.warning(f"Scene {idx}: No Veo API key found. Skipping AI generation.")
 
+        return await self._fallback_scene_clip(visual_cue, narration, idx, duration)
+
+    async def _fallback_scene_clip(
+        self, visual_cue: str, narration: str, idx: int, duration: float,
+    ) -> Path:
+        """Non-Veo sources for a scene: stock footage → ComfyUI still (if enabled) → placeholder."""
+        if PEXELS_API_KEY or PIXABAY_API_KEY:
+            topic = self.script_data.get("topic", "")
+            clip = await self._stock_scene_clip(visual_cue, narration, topic, idx, duration)
+            if clip:
+                return clip
+
+        if COMFYUI_ENABLED:
+            try:
+                img_path = await self._generate_image_via_comfyui(visual_cue or narration, idx)
+                clip = await self._image_to_clip(img_path, idx, duration)
+                if clip:
+                    self.logger.info(f"Scene {idx}: [ComfyUI] still image clip ready")
+                    return clip
+            except Exception as e:
+                self.logger.warning(f"Scene {idx}: ComfyUI failed: {e}")
+
         self.logger.warning(f"Scene {idx}: Veo failed — using placeholder")
         return await self._create_placeholder_clip(visual_cue, idx, duration)
 
@@ -194,37 +450,6 @@ class MediaForgeAgent:
     # AI visual concept mapper — translates script into stock queries
     # ==================================================================
 
-    _DOMAIN_KEYWORDS = {
-        "math": ["math", "circle", "triangle", "geometry", "algebra", "calculus",
-                 "equation", "formula", "circumference", "radius", "diameter",
-                 "angle", "fraction", "number", "pi", "area", "volume",
-                 "arithmetic", "percentage", "quadratic", "polynomial"],
-        "science": ["physics", "chemistry", "biology", "atom", "molecule",
-                    "experiment", "lab", "gravity", "energy", "cell",
-                    "dna", "evolution", "quantum", "electron", "force"],
-        "education": ["study", "learn", "school", "class", "student", "teacher",
-                      "exam", "homework", "lesson", "tutorial", "course"],
-        "technology": ["code", "programming", "software", "computer", "app",
-                       "ai", "artificial", "machine", "robot", "digital",
-                       "internet", "data", "algorithm", "tech", "cyber"],
-        "fitness": ["gym", "exercise", "workout", "muscle", "weight",
-                    "running", "yoga", "health", "training", "body"],
-        "cooking": ["recipe", "food", "cook", "meal", "kitchen",
-                    "chef", "ingredient", "bake", "grill", "dish"],
-        "finance": ["money", "invest", "stock", "bank", "budget",
-                    "finance", "crypto", "trading", "wealth", "save"],
-        "travel": ["travel", "trip", "flight", "destination", "explore",
-                   "adventure", "tourist", "vacation", "city", "beach"],
-        "music": ["music", "guitar", "piano", "sing", "song", "beat",
-                  "instrument", "melody", "concert", "band"],
-        "art": ["paint", "draw", "design", "art", "sketch", "creative",
-                "illustration", "sculpture", "canvas", "color"],
-        "psychology": ["mind", "brain", "emotion", "therapy", "mental",
-                       "anxiety", "habit", "motivation", "behavior", "cognitive"],
-        "philosophy": ["philosophy", "stoic", "existential", "ethics",
-                       "wisdom", "meaning", "moral", "socrates", "plato"],
-    }
-
     _DOMAIN_VISUALS = {
         "math": [
             "mathematics equations whiteboard",
@@ -359,27 +584,8 @@ class MediaForgeAgent:
         "step": "step by step process tutorial",
     }
 
-    _ARABIC_DOMAIN_MAP = {
-        "math": ["رياضيات", "دائرة", "هندسة", "معادلة", "عدد", "حساب"],
-        "philosophy": ["فلسفة", "حكمة", "وجود", "أخلاق", "سقراط", "أفلاطون"],
-        "education": ["تعليم", "دراسة", "مدرسة", "طالب", "معلم", "درس"],
-        "science": ["علم", "فيزياء", "كيمياء", "بيولوجيا", "تجربة"],
-        "technology": ["تقنية", "ذكاء", "اصطناعي", "برمجة", "كمبيوتر"],
-    }
-
     def _detect_domain(self, topic: str) -> str:
-        topic_lower = topic.lower().strip()
-        for domain, ar_keywords in self._ARABIC_DOMAIN_MAP.items():
-            if any(kw in topic for kw in ar_keywords):
-                return domain
-        scores: Dict[str, int] = {}
-        for domain, keywords in self._DOMAIN_KEYWORDS.items():
-            score = sum(1 for kw in keywords if kw in topic_lower)
-            if score > 0:
-                scores[domain] = score
-        if scores:
-            return max(scores, key=scores.get)
-        return "general"
+        return detect_domain(topic)
 
     def _build_search_query(
         self, visual_cue: str, narration: str, topic: str, scene_idx: int
@@ -428,30 +634,77 @@ class MediaForgeAgent:
     # Stock video download
     # ==================================================================
 
-    async def _download_stock_video(
-        self, query: str, idx: int
+    async def _stock_scene_clip(
+        self, visual_cue: str, narration: str, topic: str,
+        idx: int, duration: float,
     ) -> Optional[Path]:
-        async with _DOWNLOAD_SEM:
+        """
+        Stock footage for a scene. Candidates are ranked by the bytes we
+        actually need; with STOCK_STREAM_TRIM, FFmpeg seeks into the remote
+        file over HTTP and encodes only the needed window straight to the
+        prepared clip, falling back to a full download if that fails.
+        """
+        query = self._build_search_query(visual_cue, narration, topic, idx)
+        async with _stock_limiter().slot() as permit:
+            candidates: List[Dict[str, Any]] = []
             if PEXELS_API_KEY:
-                path = await self._download_from_pexels(query, idx)
-                if path:
-                    return path
-
-            if PIXABAY_API_KEY:
-                path = await self._download_from_pixabay(query, idx)
-                if path:
-                    return path
+                candidates = await self._pexels_candidates(query)
+            if not candidates and PIXABAY_API_KEY:
+                candidates = await self._pixabay_candidates(query)
+            if not candidates:
+                self.logger.debug(f"Scene {idx}: no stock results for '{query}'")
+                return None
 
+            for cand in self._rank_stock_files(candidates, duration)[:3]:
+                if STOCK_STREAM_TRIM:
+                    clip = await self._stream_trim_clip(cand, idx, duration, permit)
+                    if clip:
+                        return clip
+                raw = await self._download_file(cand["url"], idx, permit)
+                if raw:
+                    clip = await self._prepare_clip(raw, idx, duration)
+                    if clip:
+                        return clip
         return None
 
+    @staticmethod
+    def _bytes_needed(cand: Dict[str, Any], need: float, trimmed: bool) -> float:
+        """Estimated transfer for a candidate: the trimmed window, or the whole file."""
+        src_dur = cand.get("duration") or 0
+        take = min(need, src_dur) if (trimmed and src_dur) else (src_dur or need)
+        if cand.get("size") and src_dur:
+            return cand["size"] / src_dur * take
+        # No size reported — assume ~0.1 bits per pixel per frame
+        return cand["width"] * cand["height"] * (cand.get("fps") or 30) * 0.1 / 8 * take
+
+    def _rank_stock_files(
+        self, candidates: List[Dict[str, Any]], need: float,
+    ) -> List[Dict[str, Any]]:
+        """Files with a short side >= 720 first, then fewest bytes needed."""
+        def _key(c: Dict[str, Any]):
+            low_res = min(c["width"], c["height"]) < 720
+            return (low_res, self._bytes_needed(c, need, STOCK_STREAM_TRIM))
+        return sorted(candidates, key=_key)
+
+    async def _stock_search(self, provider: str, url: str, **kwargs) -> requests.Response:
+        """GET a stock search API under its adaptive limiter; throttled responses shrink it."""
+        async with get_limiter(provider, 2, STOCK_MAX_CONCURRENCY).slot() as permit:
+            resp = await asyncio.to_thread(requests.get, url, timeout=15, **kwargs)
+            if resp.status_code in (429, 503):
+                permit.overloaded(parse_retry_after(resp.headers.get("Retry-After")))
+            else:
+                permit.observe_headers(resp.headers)
+            return resp
+
     # ---- Pexels ----
 
-    async def _download_from_pexels(
-        self, query: str, idx: int
-    ) -> Optional[Path]:
+    async def _pexels_candidates(self, query: str) -> List[Dict[str, Any]]:
+        breaker = get_breaker("pexels")
+        if not breaker.allow():
+            return []
         try:
-            resp = await asyncio.to_thread(
-                requests.get,
+            resp = await self._stock_search(
+                "pexels",
                 "https://api.pexels.com/videos/search",
                 headers={"Authorization": PEXELS_API_KEY},
                 params={
@@ -460,56 +713,44 @@ class MediaForgeAgent:
                     "per_page": 5,
                     "size": "medium",
                 },
-                timeout=15,
             )
             if resp.status_code != 200:
                 self.logger.debug(f"Pexels returned {resp.status_code}")
-                return None
+                breaker.record_failure(f"HTTP {resp.status_code}")
+                return []
+            breaker.record_success()
 
             videos = resp.json().get("videos", [])
             if not videos:
                 self.logger.debug(f"Pexels: no results for '{query}'")
-                return None
-
+            candidates = []
             for video in videos:
-                url = self._pick_pexels_file(video)
-                if url:
-                    return await self._download_file(url, idx)
-
-            return None
+                for vf in video.get("video_files", []):
+                    if vf.get("file_type") != "video/mp4" or not vf.get("link"):
+                        continue
+                    candidates.append({
+                        "url": vf["link"],
+                        "width": vf.get("width") or 0,
+                        "height": vf.get("height") or 0,
+                        "fps": vf.get("fps") or 30,
+                        "size": vf.get("size") or 0,
+                        "duration": video.get("duration") or 0,
+                    })
+            return candidates
         except Exception as e:
             self.logger.debug(f"Pexels error: {e}")
-            return None
-
-    @staticmethod
-    def _pick_pexels_file(video: dict) -> Optional[str]:
-        files = video.get("video_files", [])
-        candidates = []
-        for vf in files:
-            if vf.get("file_type") != "video/mp4":
-                continue
-            h = vf.get("height", 0)
-            w = vf.get("width", 0)
-            if h >= 720:
-                candidates.append((h * w, vf))
-
-        if candidates:
-            candidates.sort(key=lambda x: x[0])
-            return candidates[0][1].get("link")
-
-        for vf in files:
-            if vf.get("file_type") == "video/mp4":
-                return vf.get("link")
-        return None
+            breaker.record_failure(e)
+            return []
 
     # ---- Pixabay ----
 
-    async def _download_from_pixabay(
-        self, query: str, idx: int
-    ) -> Optional[Path]:
+    async def _pixabay_candidates(self, query: str) -> List[Dict[str, Any]]:
+        breaker = get_breaker("pixabay")
+        if not breaker.allow():
+            return []
         try:
-            resp = await asyncio.to_thread(
-                requests.get,
+            resp = await self._stock_search(
+                "pixabay",
                 "https://pixabay.com/api/videos/",
                 params={
                     "key": PIXABAY_API_KEY,
@@ -517,37 +758,92 @@ class MediaForgeAgent:
                     "video_type": "film",
                     "per_page": 5,
                 },
-                timeout=15,
             )
             if resp.status_code != 200:
-                return None
-
-            hits = resp.json().get("hits", [])
-            if not hits:
-                return None
+                breaker.record_failure(f"HTTP {resp.status_code}")
+                return []
+            breaker.record_success()
+
+            candidates = []
+            for hit in resp.json().get("hits", []):
+                for variant in (hit.get("videos") or {}).values():
+                    if not variant.get("url"):
+                        continue
+                    candidates.append({
+                        "url": variant["url"],
+                        "width": variant.get("width") or 0,
+                        "height": variant.get("height") or 0,
+                        "fps": 30,
+                        "size": variant.get("size") or 0,
+                        "duration": hit.get("duration") or 0,
+                    })
+            return candidates
+        except Exception as e:
+            self.logger.debug(f"Pixabay error: {e}")
+            breaker.record_failure(e)
+            return []
 
-            for hit in hits:
-                vids = hit.get("videos", {})
-                medium = vids.get("medium") or vids.get("small") or {}
-                url = medium.get("url")
-                if url:
-                    return await self._download_file(url, idx)
+    # ---- Remote stream-trim ----
 
-            return None
+    async def _stream_trim_clip(
+        self, cand: Dict[str, Any], idx: int, duration: float, permit: Optional[Any] = None,
+    ) -> Optional[Path]:
+        """
+        Encode only [start, start+duration) of a remote file into the prepared
+        clip. Throttling is reported through the stock limiter permit, if given.
+        """
+        output = self._scratch(f"clip_{idx:03d}.mp4", _SCRATCH_CLIP_BYTES)
+        w, h = VIDEO_RESOLUTION.split("x")
+        src_dur = cand.get("duration") or 0
+        # Skip a second of fade-in when the source is long enough
+        start = min(1.0, max(src_dur - duration, 0.0))
+        cmd = [
+            self.ffmpeg, "-y",
+            "-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "2",
+            "-ss", f"{start:.3f}", "-t", f"{duration:.3f}",
+            "-i", cand["url"],
+            "-vf", (
+                f"scale={w}:{h}:force_original_aspect_ratio=increase,"
+                f"crop={w}:{h},"
+                f"fps={VIDEO_FPS}"
+            ),
+            *self._x264_args("clip"),
+            "-an",
+            "-pix_fmt", "yuv420p",
+            str(output),
+        ]
+        try:
+            result = await asyncio.to_thread(
+                subprocess.run, cmd,
+                capture_output=True, timeout=120,
+                encoding="utf-8", errors="replace",
+            )
+            if result.returncode == 0 and output.exists() and output.stat().st_size > 0:
+                self.logger.info(
+                    f"Scene {idx}: [Stock] stream-trimmed {duration:.1f}s from "
+                    f"{cand['width']}x{cand['height']} source "
+                    f"(~{self._bytes_needed(cand, duration, True) / 1024:.0f} KB needed)"
+                )
+                return output
+            if permit and ("Too Many Requests" in result.stderr or "503 Service" in result.stderr):
+                permit.overloaded()
+            self.logger.debug(f"Scene {idx}: stream-trim failed: {result.stderr[-200:]}")
         except Exception as e:
-            self.logger.debug(f"Pixabay error: {e}")
-            return None
+            self.logger.debug(f"Scene {idx}: stream-trim error: {e}")
+        return None
 
     # ---- Generic downloader ----
 
-    async def _download_file(self, url: str, idx: int) -> Optional[Path]:
-        raw_path = ASSETS_DIR / f"stock_raw_{idx:03d}.mp4"
+    async def _download_file(self, url: str, idx: int, permit: Optional[Any] = None) -> Optional[Path]:
+        raw_path = self._scratch(f"stock_raw_{idx:03d}.mp4", _SCRATCH_CLIP_BYTES)
         try:
             self.logger.debug(f"Downloading clip {idx}: {url[:80]}...")
             resp = await asyncio.to_thread(
                 requests.get, url, timeout=60, stream=True,
             )
             if resp.status_code != 200:
+                if permit and resp.status_code in (429, 503):
+                    permit.overloaded(parse_retry_after(resp.headers.get("Retry-After")))
                 return None
 
             with open(raw_path, "wb") as f:
@@ -583,43 +879,58 @@ class MediaForgeAgent:
         return prompt[:500]
 
     async def _generate_video_via_veo(
-        self, visual_cue: str, narration: str, topic: str, idx: int
+        self, visual_cue: str, narration: str, topic: str, idx: int,
+        prompt_override: Optional[str] = None,
+        duration_seconds: Optional[int] = None,
     ) -> Optional[Path]:
         """Generate video from text using Google Veo 3.1.
         Implementation follows official docs: https://ai.google.dev/gemini-api/docs/video
+        Operations are journaled, so a finished result for this exact scene
+        is reused and an in-flight one is resumed rather than paid for twice.
         """
         if not GOOGLE_VEO_API_KEY:
             return None
         try:
             from google import genai
-            from google.genai import types
-            import time
-            import os
 
-            def _run_veo() -> Optional[Path]:
+            # Build a descriptive prompt
+            prompt = prompt_override or (
+                f"Cinematic vertical TikTok video for {topic}. "
+                f"Visual: {visual_cue}. "
+                f"Voiceover context: {narration}. "
+                f"High-energy, professional, realistic, 9:16 aspect ratio."
+            )
+
+            # Config: use dictionary for robustness in case types.GenerateVideosConfig is missing
+            config = {
+                "aspect_ratio": "9:16",
+                "negative_prompt": "cartoon, drawing, low quality, blurry",
+                "person_generation": "allow_all",
+            }
+            if duration_seconds:
+                config["duration_seconds"] = duration_seconds
+
+            journal = get_veo_journal()
+            p_hash = prompt_hash(GOOGLE_VEO_MODEL, prompt, json.dumps(config, sort_keys=True))
+            reused = journal.find_result(self.generation_id, idx, p_hash)
+            if reused:
+                self.logger.info(f"Scene {idx} Veo: reusing journaled result {reused.name}")
+                return reused
+            out_path = journal.result_path(self.generation_id, idx, p_hash)
+            breaker = get_breaker("veo")
+
+            def _run_veo(op_name: Optional[str] = None) -> Optional[Path]:
                 self.logger.info(f"Scene {idx} Veo thread started...")
 
                 # Set the API key as env var (official docs pattern)
                 os.environ["GOOGLE_API_KEY"] = GOOGLE_VEO_API_KEY
                 client = genai.Client(api_key=GOOGLE_VEO_API_KEY)
 
-                # Build a descriptive prompt
-                prompt = (
-                    f"Cinematic vertical TikTok video for {topic}. "
-                    f"Visual: {visual_cue}. "
-                    f"Voiceover context: {narration}. "
-                    f"High-energy, professional, realistic, 9:16 aspect ratio."
-                )
+                if op_name:
+                    self.logger.info(f"Scene {idx} Veo: resuming journaled operation {op_name}")
+                    return _await_veo_operation(client, op_name, f"Scene {idx}", out_path)
 
                 self.logger.info(f"Scene {idx} Veo Prompt: {prompt[:100]}...")
-
-                # Config: use dictionary for robustness in case types.GenerateVideosConfig is missing
-                config = {
-                    "aspect_ratio": "9:16",
-                    "negative_prompt": "cartoon, drawing, low quality, blurry",
-                    "person_generation": "allow_all",
-                }
-
                 try:
                     operation = client.models.generate_videos(
                         model=GOOGLE_VEO_MODEL,
@@ -628,62 +939,27 @@ class MediaForgeAgent:
                     )
                 except Exception as e:
                     self.logger.error(f"Veo generate_videos call failed: {e}")
+                    overloaded, retry_after = overload_signal(e)
+                    if overloaded:
+                        get_veo_scheduler().limiter.on_overload(retry_after)
+                    breaker.record_failure(e)
                     return None
+                get_veo_scheduler().limiter.on_success()
 
                 self.logger.info(f"Scene {idx} Veo operation started: {operation.name}")
-
-                # Poll for completion — pass the operation object directly (per docs)
-                # Poll for completion
-                max_retries = 60  # ~10 mins at 10s intervals (Veo is slow on Tier 1)
-                retries = 0
-                while not operation.done and retries < max_retries:
-                    time.sleep(10)
-                    retries += 1
-                    try:
-                        # Use the operation name for safer retrieval
-                        operation = client.operations.get(name=operation.name)
-                        status = "Queued/Processing" if not operation.done else "Done"
-                        self.logger.info(f"Scene {idx} Veo: {status} (attempt {retries})")
-                    except Exception as e:
-                        self.logger.warning(f"Scene {idx} Veo poll error (retry {retries}): {e}")
-
-                if not operation.done:
-                    self.logger.error(f"Scene {idx} Veo timed out after {retries} polls")
-                    return None
-
-                # Extract and download (per official docs)
-                try:
-                    generated_video = operation.response.generated_videos[0]
-                except (AttributeError, IndexError) as e:
-                    self.logger.error(f"Scene {idx} Veo completed but no videos: {e}. Response: {operation.response}")
-                    return None
-
-                out_path = ASSETS_DIR / f"veo_raw_{idx:03d}.mp4"
-
-                self.logger.info(f"Scene {idx} Veo video ready, downloading...")
-
-                try:
-                    # Official pattern: download then save
-                    client.files.download(file=generated_video.video)
-                    generated_video.video.save(str(out_path))
-                except Exception as e:
-                    self.logger.error(f"Scene {idx} Veo download/save failed: {e}")
-                    # Try alternative save if the first method fails
-                    try:
-                        if hasattr(generated_video.video, 'save'):
-                            generated_video.video.save(str(out_path))
-                    except Exception as e2:
-                        self.logger.error(f"Scene {idx} Veo alt save also failed: {e2}")
-                        return None
-
-                if out_path.exists() and out_path.stat().st_size > 1000:
-                    self.logger.info(f"Scene {idx} Veo video saved! ({out_path.stat().st_size} bytes)")
-                    return out_path
-
-                self.logger.error(f"Scene {idx} Veo video file missing or too small")
+                journal.record_started(operation.name, self.generation_id, idx, p_hash)
+                result = _await_veo_operation(client, operation.name, f"Scene {idx}", out_path)
+                breaker.record(result is not None, "operation failed or timed out")
+                return result
+
+            inflight = journal.find_inflight(self.generation_id, idx, p_hash)
+            if inflight:
+                # Already started (and billed) before a restart — no new scheduler slot
+                return await asyncio.to_thread(_run_veo, inflight)
+            if not breaker.allow():
+                self.logger.warning(f"Scene {idx} Veo: circuit open — skipping to fallback")
                 return None
-
-            async with _VEO_SEM:
+            async with get_veo_scheduler().slot(self.generation_id):
                 return await asyncio.to_thread(_run_veo)
         except Exception as e:
             self.logger.error(f"Veo 3.1 T2V Exception: {e}")
@@ -727,24 +1003,39 @@ class MediaForgeAgent:
     # Clip preparation (trim + scale + re-encode to standard format)
     # ==================================================================
 
+    def _x264_args(self, role: str, bitrate_kbps: Optional[int] = None) -> List[str]:
+        """
+        libx264 preset/CRF/threads for an encode role, from the machine profile.
+        With bitrate_kbps the encode is bitrate-targeted instead of CRF.
+        """
+        choice = choose_x264_settings(role)
+        rate = ["-b:v", f"{bitrate_kbps}k"] if bitrate_kbps else ["-crf", str(choice["crf"])]
+        args = ["-c:v", "libx264", "-preset", choice["preset"], *rate]
+        if choice["threads"]:
+            args += ["-threads", str(choice["threads"])]
+        return args
+
     async def _prepare_clip(
-        self, raw_path: Path, idx: int, duration: float
+        self, raw_path: Path, idx: int, duration: float, start: float = 0.0,
     ) -> Optional[Path]:
         """Trim and scale a Veo clip to 1080x1920 @ 30fps h264.
-        No zoompan — Veo already generates cinematic video."""
-        output = ASSETS_DIR / f"clip_{idx:03d}.mp4"
+        No zoompan — Veo already generates cinematic video.
+        start > 0 cuts a scene out of a longer generation; the seek is placed
+        after -i so it decodes to the exact frame instead of the nearest keyframe."""
+        output = self._scratch(f"clip_{idx:03d}.mp4", _SCRATCH_CLIP_BYTES)
         w, h = VIDEO_RESOLUTION.split("x")
 
         cmd = [
             self.ffmpeg, "-y",
             "-i", str(raw_path),
+            *(["-ss", f"{start:.3f}"] if start > 0 else []),
             "-t", str(duration),
             "-vf", (
                 f"scale={w}:{h}:force_original_aspect_ratio=increase,"
                 f"crop={w}:{h},"
                 f"fps={VIDEO_FPS}"
             ),
-            "-c:v", "libx264", "-preset", "fast", "-crf", "21",
+            *self._x264_args("clip"),
             "-an",
             "-pix_fmt", "yuv420p",
             str(output),
@@ -769,7 +1060,7 @@ class MediaForgeAgent:
         self, img_path: Path, idx: int, duration: float
     ) -> Optional[Path]:
         """Convert a single image into a video clip of the given duration."""
-        output = ASSETS_DIR / f"clip_{idx:03d}.mp4"
+        output = self._scratch(f"clip_{idx:03d}.mp4", _SCRATCH_CLIP_BYTES)
         w, h = VIDEO_RESOLUTION.split("x")
         cmd = [
             self.ffmpeg, "-y",
@@ -781,7 +1072,7 @@ class MediaForgeAgent:
                 f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2:black,"
                 f"fps={VIDEO_FPS}"
             ),
-            "-c:v", "libx264", "-preset", "fast", "-crf", "23",
+            *self._x264_args("still"),
             "-pix_fmt", "yuv420p",
             str(output),
         ]
@@ -792,6 +1083,7 @@ class MediaForgeAgent:
                 encoding="utf-8", errors="replace",
             )
             if output.exists() and output.stat().st_size > 0:
+                self._static_clips.add(output)
                 return output
         except Exception:
             pass
@@ -809,7 +1101,7 @@ class MediaForgeAgent:
         if clip:
             return clip
 
-        output = ASSETS_DIR / f"clip_{idx:03d}.mp4"
+        output = self._scratch(f"clip_{idx:03d}.mp4", _SCRATCH_CLIP_BYTES)
         return await self._create_colorbar_clip(output, idx, duration)
 
     def _create_placeholder_image(self, scene_text: str, idx: int) -> Path:
@@ -838,7 +1130,7 @@ class MediaForgeAgent:
                 line, fill="#dddddd", font=font_sm,
             )
 
-        path = ASSETS_DIR / f"visual_placeholder_{idx:03d}.png"
+        path = self._scratch(f"visual_placeholder_{idx:03d}.png")
         img.save(path, "PNG")
         return path
 
@@ -851,7 +1143,7 @@ class MediaForgeAgent:
             self.ffmpeg, "-y",
             "-f", "lavfi",
             "-i", f"color=c=0x{hex_color}:s={w}x{h}:d={duration}:r={VIDEO_FPS}",
-            "-c:v", "libx264", "-preset", "fast", "-crf", "23",
+            *self._x264_args("still"),
             "-pix_fmt", "yuv420p",
             str(output),
         ]
@@ -866,6 +1158,7 @@ class MediaForgeAgent:
 
         if not output.exists() or output.stat().st_size == 0:
             output.touch()
+        self._static_clips.add(output)
         return output
 
     @staticmethod
@@ -886,24 +1179,14 @@ class MediaForgeAgent:
     # ==================================================================
 
     async def _generate_image_via_comfyui(self, prompt: str, idx: int) -> Path:
-        response = requests.get(f"{self.comfyui_url}/api/", timeout=5)
-        if response.status_code != 200:
-            raise ConnectionError("ComfyUI not responding")
-
-        payload = {
-            "prompt": {
-                "1": {"inputs": {"text": prompt}, "class_type": "CLIPTextEncode(Prompt)"},
-                "2": {"inputs": {"seed": idx, "steps": 20, "cfg": 7.5}, "class_type": "KSampler"},
-            },
-        }
-        queue_resp = requests.post(
-            f"{self.comfyui_url}/api/queue", json=payload, timeout=30,
-        )
-        if queue_resp.status_code == 200:
-            path = ASSETS_DIR / f"visual_{idx:03d}.png"
-            path.touch()
-            return path
-        raise Exception(f"ComfyUI queue failed: {queue_resp.status_code}")
+        """Render a still for the scene through the shared ComfyUI client."""
+        w, h = (int(d) for d in VIDEO_RESOLUTION.split("x"))
+        # SD works best near 1MP; _image_to_clip scales up to the video size
+        scale = 1024 / max(w, h)
+        width = max(64, int(w * scale) // 64 * 64)
+        height = max(64, int(h * scale) // 64 * 64)
+        client = get_comfyui_client()
+        return await client.generate_image(prompt, seed=idx, width=width, height=height)
 
     # ==================================================================
     # Audio / voiceover generation (edge-tts)
@@ -926,8 +1209,8 @@ class MediaForgeAgent:
         """
         self.logger.info(f"Generating voiceover via edge-tts ({self.VOICE})...")
 
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        segments_dir = ASSETS_DIR / f"tts_segments_{ts}"
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        segments_dir = self._scratch(f"tts_segments_{ts}")
         segments_dir.mkdir(exist_ok=True)
 
         lines = []
@@ -945,20 +1228,26 @@ class MediaForgeAgent:
 
             segment_paths: List[Path] = []
             for i, line in enumerate(lines):
-                seg_path = segments_dir / f"seg_{i:03d}.mp3"
+                key = self._asset_key(self.VOICE, line)
+                cached = self._tts_cache.get(key)
+                if cached and cached.exists():
+                    segment_paths.append(cached)
+                    continue
+                seg_path = segments_dir / f"seg_{i:03d}_{key[:10]}.mp3"
                 comm = edge_tts.Communicate(line, self.VOICE)
                 await comm.save(str(seg_path))
                 if seg_path.exists() and seg_path.stat().st_size > 0:
                     segment_paths.append(seg_path)
+                    self._tts_cache[key] = seg_path
                     self.logger.debug(f"TTS segment {i}: {line[:40]}...")
 
             if not segment_paths:
                 raise RuntimeError("No TTS segments produced")
 
-            final_audio = ASSETS_DIR / f"voiceover_{ts}.mp3"
+            final_audio = self._scratch(f"voiceover_{ts}.mp3")
 
             if len(segment_paths) == 1:
-                segment_paths[0].rename(final_audio)
+                shutil.copyfile(segment_paths[0], final_audio)
             else:
                 concat_file = segments_dir / "concat.txt"
                 with open(concat_file, "w") as f:
@@ -995,7 +1284,7 @@ class MediaForgeAgent:
         if duration_seconds <= 0:
             duration_seconds = self.script_data.get("duration_seconds", 30)
 
-        path = ASSETS_DIR / f"voiceover_silent_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
+        path = self._scratch(f"voiceover_silent_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav")
         sr = 44100
         n = sr * duration_seconds
 
@@ -1019,7 +1308,7 @@ class MediaForgeAgent:
         This avoids edge-tts entirely.
         """
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        out_audio = ASSETS_DIR / f"veo_audio_{ts}.aac"
+        out_audio = self._scratch(f"veo_audio_{ts}.aac")
 
         valid = [c for c in clip_paths if c.exists() and c.stat().st_size > 0]
         if not valid:
@@ -1055,7 +1344,7 @@ class MediaForgeAgent:
             ]
         else:
             # Multiple clips — concat their audio tracks
-            concat_file = ASSETS_DIR / f"audio_concat_{ts}.txt"
+            concat_file = self._scratch(f"audio_concat_{ts}.txt")
             with open(concat_file, "w") as f:
                 for c in clips_with_audio:
                     f.write(f"file '{c.absolute()}'\n")
@@ -1094,12 +1383,17 @@ class MediaForgeAgent:
         voiceover_path: Path,
         veo_audio_path: Optional[Path] = None,
         output_filename: str = "final_render.mp4",
+        intermediate: bool = False,
     ) -> Path:
         """
         Concatenate Veo clips and mix Voiceover + Native Ambient tracks.
+        intermediate=True writes to scratch (the caption pass makes the final file).
         """
         self.logger.info("🎨 [Agent Gamma] Assembling cinematic structure & mixing tracks...")
-        output = RENDER_DIR / output_filename
+        if intermediate:
+            output = self._scratch(output_filename, _SCRATCH_ASSEMBLY_BYTES)
+        else:
+            output = RENDER_DIR / output_filename
         total_dur = self.script_data.get("duration_seconds", 30)
 
         valid = [c for c in clip_paths if c.exists() and c.stat().st_size > 0]
@@ -1107,7 +1401,7 @@ class MediaForgeAgent:
             self.logger.warning("No valid clips — generating fallback video")
             return self._generate_colorbar_video(output, total_dur)
 
-        concat_file = ASSETS_DIR / "concat.txt"
+        concat_file = self._scratch("concat.txt")
         with open(concat_file, "w") as f:
             for clip in valid:
                 f.write(f"file '{clip.absolute()}'\n")
@@ -1131,10 +1425,12 @@ class MediaForgeAgent:
 
         cmd.extend([
             "-filter_complex", filter_str,
-            "-c:v", "libx264", "-preset", "fast", "-crf", "21",
+            *self._x264_args("assembly"),
+            *self._keyframe_args(),
             "-c:a", "aac", "-b:a", "192k",
             "-map", "0:v:0", "-map", "[a]",
             "-pix_fmt", "yuv420p", "-shortest",
+            "-movflags", "+faststart",
             str(output),
         ])
 
@@ -1162,10 +1458,11 @@ class MediaForgeAgent:
                 "-i", f"color=c=0x1a1a2e:s={w}x{h}:d={duration}:r={VIDEO_FPS}",
                 "-f", "lavfi",
                 "-i", "anullsrc=r=44100:cl=mono",
-                "-c:v", "libx264", "-preset", "fast", "-crf", "18",
+                *self._x264_args("master"),
                 "-c:a", "aac", "-b:a", "128k",
                 "-shortest", "-t", str(duration),
                 "-pix_fmt", "yuv420p",
+                "-movflags", "+faststart",
                 str(output),
             ]
             subprocess.run(
@@ -1284,9 +1581,11 @@ class MediaForgeAgent:
                 self.ffmpeg, "-y",
                 "-i", str(video_path),
                 "-vf", vf,
-                "-c:v", "libx264", "-preset", "fast", "-crf", "18",
+                *self._x264_args("master"),
+                *self._keyframe_args(),
                 "-c:a", "copy",
                 "-pix_fmt", "yuv420p",
+                "-movflags", "+faststart",  # moov atom first so playback starts immediately
                 str(output),
             ]
 
@@ -1309,20 +1608,392 @@ class MediaForgeAgent:
             self.logger.error(f"Caption overlay error: {e}")
             return video_path
 
+    # ==================================================================
+    # HLS packaging (stream copy of the final render)
+    # ==================================================================
+
+    def _keyframe_args(self) -> List[str]:
+        """Force keyframes on HLS segment boundaries so stream-copy cuts stay short."""
+        if not self.hls_enabled:
+            return []
+        return ["-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})"]
+
+    def _probe_media(self, path: Path) -> Dict[str, Any]:
+        """Read duration, bitrate, resolution and fps from FFmpeg's input banner."""
+        info: Dict[str, Any] = {
+            "duration": 0.0, "bitrate_kbps": 0, "width": 0, "height": 0,
+            "fps": 0.0, "has_audio": False,
+        }
+        try:
+            result = subprocess.run(
+                [self.ffmpeg, "-hide_banner", "-i", str(path)],
+                capture_output=True, timeout=10,
+                encoding="utf-8", errors="replace",
+            )
+        except Exception:
+            return info
+
+        err = result.stderr
+        m = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", err)
+        if m:
+            h, mi, sec = m.groups()
+            info["duration"] = int(h) * 3600 + int(mi) * 60 + float(sec)
+        m = re.search(r"bitrate: (\d+) kb/s", err)
+        if m:
+            info["bitrate_kbps"] = int(m.group(1))
+        m = re.search(r"Video:.*?\b(\d{2,5})x(\d{2,5})\b", err)
+        if m:
+            info["width"], info["height"] = int(m.group(1)), int(m.group(2))
+        m = re.search(r"Video:.*?(\d+(?:\.\d+)?) fps", err)
+        if m:
+            info["fps"] = float(m.group(1))
+        info["has_audio"] = "Audio:" in err
+        return info
+
+    @staticmethod
+    def _parse_kbps(bitrate: str) -> int:
+        """'600k' -> 600, '2M' -> 2000, '800000' -> 800."""
+        value = bitrate.strip().lower()
+        if value.endswith("k"):
+            return int(float(value[:-1]))
+        if value.endswith("m"):
+            return int(float(value[:-1]) * 1000)
+        return int(float(value) / 1000)
+
+    async def package_hls(self, video_path: Path) -> Optional[Path]:
+        """
+        Segment the finished render into an HLS VOD stream by stream copy,
+        optionally adding a low-bitrate rendition. Returns the master playlist.
+        """
+        if not video_path.exists() or video_path.stat().st_size == 0:
+            return None
+
+        out_dir = HLS_DIR / video_path.stem
+        shutil.rmtree(out_dir, ignore_errors=True)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self.logger.info(f"🎨 [Agent Gamma] Packaging HLS preview ({HLS_SEGMENT_SECONDS}s segments)...")
+
+        def _hls_cmd(name: str, codec_args: List[str]) -> List[str]:
+            return [
+                self.ffmpeg, "-y",
+                "-i", str(video_path),
+                *codec_args,
+                "-f", "hls",
+                "-hls_time", str(HLS_SEGMENT_SECONDS),
+                "-hls_playlist_type", "vod",
+                "-hls_segment_filename", str(out_dir / f"{name}_%03d.ts"),
+                str(out_dir / f"{name}.m3u8"),
+            ]
+
+        renditions = [("src", ["-map", "0", "-c", "copy"])]
+        if HLS_LOW_BITRATE:
+            kbps = self._parse_kbps(HLS_LOW_BITRATE)
+            gop = str(VIDEO_FPS * HLS_SEGMENT_SECONDS)
+            renditions.append(("low", [
+                "-vf", "scale=540:-2",
+                "-c:v", "libx264", "-preset", "veryfast",
+                "-b:v", f"{kbps}k", "-maxrate", f"{kbps}k", "-bufsize", f"{kbps * 2}k",
+                "-g", gop, "-keyint_min", gop, "-sc_threshold", "0",
+                "-c:a", "aac", "-b:a", "64k",
+                "-pix_fmt", "yuv420p",
+            ]))
+
+        async def _run(name: str, codec_args: List[str]) -> bool:
+            playlist = out_dir / f"{name}.m3u8"
+            try:
+                result = await asyncio.to_thread(
+                    subprocess.run, _hls_cmd(name, codec_args),
+                    capture_output=True, timeout=300,
+                    encoding="utf-8", errors="replace",
+                )
+                if playlist.exists() and playlist.stat().st_size > 0:
+                    return True
+                self.logger.warning(f"HLS {name} rendition failed: {result.stderr[-300:]}")
+            except Exception as e:
+                self.logger.warning(f"HLS {name} rendition error: {e}")
+            return False
+
+        ok = await asyncio.gather(*(_run(n, a) for n, a in renditions))
+        if not ok[0]:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            return None
+
+        src = await asyncio.to_thread(self._probe_media, video_path)
+        width = src["width"] or int(VIDEO_RESOLUTION.split("x")[0])
+        height = src["height"] or int(VIDEO_RESOLUTION.split("x")[1])
+        src_kbps = src["bitrate_kbps"] or 4000
+
+        # Weakest rendition first: players start on the first listed variant
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+        if len(ok) > 1 and ok[1]:
+            low_kbps = self._parse_kbps(HLS_LOW_BITRATE) + 64
+            low_h = round(540 * height / width / 2) * 2
+            lines += [
+                f"#EXT-X-STREAM-INF:BANDWIDTH={low_kbps * 1000},RESOLUTION=540x{low_h}",
+                "low.m3u8",
+            ]
+        lines += [
+            f"#EXT-X-STREAM-INF:BANDWIDTH={int(src_kbps * 1100)},RESOLUTION={width}x{height}",
+            "src.m3u8",
+        ]
+        master = out_dir / "master.m3u8"
+        master.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        self.logger.info(f"HLS preview ready: {master}")
+        return master
+
+    # ==================================================================
+    # Platform export fan-out (one mezzanine → per-platform variants)
+    # ==================================================================
+
+    async def export_platform_variants(
+        self, mezzanine: Path, platforms: List[str],
+    ) -> Dict[str, Path]:
+        """
+        Derive every platform variant from the finished render in parallel.
+        Variants already within a platform's limits are remuxed (stream copy);
+        the rest get a light scale/bitrate-capped transcode.
+        """
+        if not mezzanine.exists() or mezzanine.stat().st_size == 0:
+            return {}
+
+        unknown = [p for p in platforms if p not in PLATFORM_EXPORT_SPECS]
+        if unknown:
+            self.logger.warning(f"No export spec for: {', '.join(unknown)} — skipping")
+        targets = [p for p in platforms if p in PLATFORM_EXPORT_SPECS]
+        if not targets:
+            return {}
+
+        src = await asyncio.to_thread(self._probe_media, mezzanine)
+        self.logger.info(
+            f"🎨 [Agent Gamma] Deriving {len(targets)} platform export(s) from mezzanine..."
+        )
+
+        results = await asyncio.gather(
+            *(self._export_variant(mezzanine, src, p) for p in targets)
+        )
+        return {p: path for p, path in zip(targets, results) if path}
+
+    def _export_budget(self, spec: Dict[str, Any]) -> int:
+        """Byte budget for a variant: the platform limit, optionally tightened by EXPORT_MAX_MB."""
+        budget = spec["max_bytes"]
+        if EXPORT_MAX_MB > 0:
+            budget = min(budget, int(EXPORT_MAX_MB * 1024 * 1024))
+        return budget
+
+    def _export_plan(
+        self, src: Dict[str, Any], size_bytes: int, spec: Dict[str, Any], budget: int,
+    ) -> Dict[str, Any]:
+        """Decide whether a platform variant can be a remux or needs a transcode."""
+        duration = src["duration"] or float(self.script_data.get("duration_seconds", 30))
+        out_duration = min(duration, spec["max_duration"])
+        est_bytes = size_bytes * (out_duration / duration) if duration else size_bytes
+        video_kbps = max(src["bitrate_kbps"] - spec["audio_kbps"], 0)
+        return {
+            "duration": out_duration,
+            "trim": duration > spec["max_duration"],
+            "scale": src["height"] > spec["max_height"],
+            "rate": video_kbps > spec["max_video_kbps"],
+            "size": est_bytes > budget,
+        }
+
+    @staticmethod
+    def _size_target_kbps(
+        duration: float, budget_bytes: int, audio_kbps: int, max_video_kbps: int,
+    ) -> int:
+        """Video bitrate that fits duration into the byte budget (minus audio and mux overhead)."""
+        usable_bits = budget_bytes * 8 * (1 - EXPORT_SIZE_MARGIN)
+        total_kbps = usable_bits / max(duration, 0.1) / 1000
+        return max(100, min(int(total_kbps - audio_kbps), max_video_kbps))
+
+    async def _export_variant(
+        self, mezzanine: Path, src: Dict[str, Any], platform: str,
+    ) -> Optional[Path]:
+        spec = PLATFORM_EXPORT_SPECS[platform]
+        output = RENDER_DIR / f"{mezzanine.stem}_{platform}.mp4"
+        budget = self._export_budget(spec)
+        plan = self._export_plan(src, mezzanine.stat().st_size, spec, budget)
+
+        cmd = [self.ffmpeg, "-y", "-i", str(mezzanine)]
+        if plan["trim"]:
+            cmd += ["-t", f"{plan['duration']:.3f}"]
+
+        passes: List[List[str]] = []
+        if plan["scale"] or plan["rate"] or plan["size"]:
+            if plan["scale"]:
+                cmd += ["-vf", f"scale=-2:{spec['max_height']}"]
+            if plan["size"]:
+                # Size-targeted: bitrate derived from the budget so the first encode fits
+                kbps = self._size_target_kbps(
+                    plan["duration"], budget, spec["audio_kbps"], spec["max_video_kbps"],
+                )
+                video = [
+                    *self._x264_args("export", bitrate_kbps=kbps),
+                    "-maxrate", f"{kbps}k", "-bufsize", f"{kbps}k",
+                ]
+                mode = f"sized {kbps}k"
+            else:
+                video = [
+                    *self._x264_args("export"),
+                    "-maxrate", f"{spec['max_video_kbps']}k",
+                    "-bufsize", f"{spec['max_video_kbps'] * 2}k",
+                ]
+                mode = "transcode"
+            audio = ["-c:a", "aac", "-b:a", f"{spec['audio_kbps']}k"]
+
+            if plan["size"] and EXPORT_TWO_PASS:
+                mode = f"two-pass {kbps}k"
+                passlog = str(RENDER_DIR / f".{output.stem}_2pass")
+                passes.append(cmd + video + [
+                    "-pix_fmt", "yuv420p", "-pass", "1", "-passlogfile", passlog,
+                    "-an", "-f", "null", os.devnull,
+                ])
+                cmd = cmd + video + ["-pass", "2", "-passlogfile", passlog]
+            else:
+                cmd = cmd + video
+            cmd += ["-pix_fmt", "yuv420p", *audio]
+        else:
+            mode = "remux"
+            cmd += ["-c", "copy"]
+        cmd += ["-movflags", "+faststart", str(output)]
+        passes.append(cmd)
+
+        async with _EXPORT_SEM:
+            try:
+                # A leftover file from an earlier render must not pass for this export
+                output.unlink(missing_ok=True)
+                for pass_cmd in passes:
+                    result = await asyncio.to_thread(
+                        subprocess.run, pass_cmd,
+                        capture_output=True, timeout=300,
+                        encoding="utf-8", errors="replace",
+                    )
+                    if result.returncode != 0:
+                        break
+                if result.returncode == 0 and output.exists() and output.stat().st_size > 0:
+                    size = output.stat().st_size
+                    self.logger.info(f"Export {platform} ({mode}): {size / 1024:.0f} KB")
+                    if size > budget:
+                        self.logger.warning(
+                            f"Export {platform} is {size / budget:.0%} of its {budget / 1024 / 1024:.0f} MB budget"
+                        )
+                    return output
+                self.logger.warning(f"Export {platform} failed: {result.stderr[-300:]}")
+            except Exception as e:
+                self.logger.warning(f"Export {platform} error: {e}")
+            finally:
+                for log in RENDER_DIR.glob(f".{output.stem}_2pass*"):
+                    log.unlink(missing_ok=True)
+        return None
+
 
 # ======================================================================
-# Public pipeline runner
+# Veo operation polling (shared by live scenes and startup resume)
 # ======================================================================
 
-async def run_media_forge(
-    script_data: Dict[str, Any], captions: List[Dict[str, str]]
-) -> Dict[str, Any]:
+def _await_veo_operation(client: Any, operation_name: str, label: str, out_path: Path) -> Optional[Path]:
     """
-    Execute the Media Forge pipeline:
-    High-fidelity Voiceover + Veo Visuals + Mixed Audio Tracks.
+    Blocking: poll a Veo operation to completion and save its video to
+    out_path. A second caller for the same operation (startup resume and a
+    re-run) waits for the first and reuses its result.
+    """
+    journal = get_veo_journal()
+    with journal.operation_lock(operation_name):
+        done = journal.result_of(operation_name)
+        if done:
+            logger_gamma.info(f"{label} Veo: result already saved by another poller")
+            return done
+        return _poll_veo_operation(client, operation_name, label, out_path)
+
+
+def _poll_veo_operation(client: Any, operation_name: str, label: str, out_path: Path) -> Optional[Path]:
+    from google.genai import types
+    import time
+
+    journal = get_veo_journal()
+    operation = types.GenerateVideosOperation(name=operation_name)
+
+    # Poll for completion
+    max_retries = 60  # ~10 mins at 10s intervals (Veo is slow on Tier 1)
+    retries = 0
+    while not operation.done and retries < max_retries:
+        time.sleep(10)
+        retries += 1
+        try:
+            operation = client.operations.get(operation)
+            status = "Queued/Processing" if not operation.done else "Done"
+            logger_gamma.info(f"{label} Veo: {status} (attempt {retries})")
+        except Exception as e:
+            logger_gamma.warning(f"{label} Veo poll error (retry {retries}): {e}")
+
+    if not operation.done:
+        logger_gamma.error(f"{label} Veo timed out after {retries} polls")
+        journal.record_failed(operation_name, f"timed out after {retries} polls")
+        return None
+
+    # Extract and download (per official docs)
+    try:
+        generated_video = operation.response.generated_videos[0]
+    except (AttributeError, IndexError, TypeError) as e:
+        logger_gamma.error(f"{label} Veo completed but no videos: {e}. Error: {operation.error}")
+        journal.record_failed(operation_name, str(operation.error or e))
+        return None
+
+    logger_gamma.info(f"{label} Veo video ready, downloading...")
+    partial = out_path.with_name(f"{out_path.stem}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        # Official pattern: download then save
+        client.files.download(file=generated_video.video)
+        generated_video.video.save(str(partial))
+        partial.replace(out_path)
+    except Exception as e:
+        logger_gamma.error(f"{label} Veo download/save failed: {e}")
+        partial.unlink(missing_ok=True)
+        return None
+
+    if out_path.exists() and out_path.stat().st_size > 1000:
+        logger_gamma.info(f"{label} Veo video saved! ({out_path.stat().st_size} bytes)")
+        journal.record_finished(operation_name, out_path)
+        return out_path
+
+    logger_gamma.error(f"{label} Veo video file missing or too small")
+    return None
+
+
+async def resume_pending_veo_operations() -> int:
+    """
+    Startup hook: finish Veo operations that were in flight when the process
+    stopped, saving each result into its (generation, scene) slot in the journal.
     """
-    forge = MediaForgeAgent(script_data)
+    pending = get_veo_journal().pending()
+    if not pending or not GOOGLE_VEO_API_KEY:
+        return 0
+    from google import genai
+
+    logger_gamma.info(f"Resuming {len(pending)} journaled Veo operation(s)...")
+    client = genai.Client(api_key=GOOGLE_VEO_API_KEY)
+    journal = get_veo_journal()
+
+    async def _resume(name: str, entry: Dict[str, Any]) -> Optional[Path]:
+        out_path = journal.result_path(entry["generation_id"], entry["scene_idx"], entry["prompt_hash"])
+        label = f"[{entry['generation_id']}] Scene {entry['scene_idx']}"
+        return await asyncio.to_thread(_await_veo_operation, client, name, label, out_path)
+
+    results = await asyncio.gather(
+        *(_resume(name, entry) for name, entry in pending.items()),
+        return_exceptions=True,
+    )
+    return sum(1 for r in results if isinstance(r, Path))
+
 
+# ======================================================================
+# Public pipeline runner
+# ======================================================================
+
+async def _render_cut(
+    forge: MediaForgeAgent, captions: List[Dict[str, str]], output_stem: str,
+) -> Dict[str, Any]:
+    """Voiceover → scene clips → ambient audio → assembly → captions for forge.script_data."""
+    script_data = forge.script_data
     total_duration = script_data.get("duration_seconds", 30)
     scene_descs = [
         col.get("visual_cue", "vibrant visual")
@@ -1341,22 +2012,133 @@ async def run_media_forge(
 
     # 4. Assemble & Mix (VO 1.0 + Veo 0.3)
     # Use a temporary name for the assembled video to avoid FFmpeg read/write conflicts
+    suffix = output_stem[len("final_render"):] if output_stem.startswith("final_render") else f"_{output_stem}"
     raw_assembly_path = await forge.assemble_video(
-        clip_paths, voiceover_path, veo_audio_path, "raw_assembly.mp4"
+        clip_paths, voiceover_path, veo_audio_path, f"raw_assembly{suffix}.mp4",
+        intermediate=True,
     )
 
     # 5. Add Premium Captions (Better Font + Style)
     # Now write to the final filename
     final_video_path = await forge.add_captions_to_video(
-        raw_assembly_path, captions, "final_render.mp4"
+        raw_assembly_path, captions, f"{output_stem}.mp4"
     )
+    if is_scratch(final_video_path):
+        # Caption pass fell back to the raw assembly — persist it under the final name
+        persisted = RENDER_DIR / f"{output_stem}.mp4"
+        await asyncio.to_thread(shutil.copyfile, final_video_path, persisted)
+        final_video_path = persisted
 
     return {
         "visuals_generated": len(clip_paths),
-        "voiceover_path": str(voiceover_path),
-        "video_path_raw": str(video_path),
+        "voiceover_path": voiceover_path,
+        "video_path_raw": raw_assembly_path,
+        "final_video_path": final_video_path,
+    }
+
+
+def _render_stem(generation_id: Optional[str]) -> str:
+    # Per-generation names: a fixed name would be overwritten by the next
+    # render while older campaigns (and the archive tier) still point at it
+    return f"final_render_{generation_id}" if generation_id else "final_render"
+
+
+async def run_media_forge(
+    script_data: Dict[str, Any], captions: List[Dict[str, str]],
+    hls: Optional[bool] = None,
+    export_platforms: Optional[List[str]] = None,
+    generation_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Execute the Media Forge pipeline:
+    High-fidelity Voiceover + Veo Visuals + Mixed Audio Tracks.
+    Pass hls=True/False to override HLS_ENABLED for this render, and
+    export_platforms to override PLATFORM_EXPORTS. generation_id keys the
+    render's flow in the shared Veo scheduler.
+    """
+    forge = MediaForgeAgent(script_data, generation_id=generation_id)
+    if hls is not None:
+        forge.hls_enabled = hls
+
+    cut = await _render_cut(forge, captions, _render_stem(generation_id))
+    final_video_path = cut["final_video_path"]
+
+    # 6. Optional HLS preview: segment the encoded render, no second full encode
+    hls_playlist = None
+    if forge.hls_enabled:
+        hls_playlist = await forge.package_hls(final_video_path)
+
+    # 7. Platform variants derived from the final render (mezzanine)
+    platforms = PLATFORM_EXPORTS if export_platforms is None else export_platforms
+    exports: Dict[str, Path] = {}
+    if platforms:
+        exports = await forge.export_platform_variants(final_video_path, platforms)
+
+    forge.release_scratch()
+
+    return {
+        "visuals_generated": cut["visuals_generated"],
+        "voiceover_path": str(cut["voiceover_path"]),
+        "video_path_raw": str(cut["video_path_raw"]),
         "final_video_path": str(final_video_path),
-        "duration": total_duration,
+        "hls_playlist": str(hls_playlist) if hls_playlist else "",
+        "platform_exports": {p: str(path) for p, path in exports.items()},
+        "duration": script_data.get("duration_seconds", 30),
+        "resolution": VIDEO_RESOLUTION,
+        "ready_for_review": True,
+    }
+
+
+async def run_media_forge_variations(
+    script_data: Dict[str, Any], variants: List[Dict[str, Any]],
+    hls: Optional[bool] = None,
+    export_platforms: Optional[List[str]] = None,
+    generation_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Render several hook variants in one job. Each variant is a dict with
+    "script_columns" and "captions"; the first is the control and gets the
+    regular final render name plus HLS/exports.
+    Scene clips and TTS segments are cached on one shared forge, so scenes
+    the variants have in common are generated once and only the differing
+    hook scenes are produced per variant.
+    """
+    forge = MediaForgeAgent(script_data, generation_id=generation_id)
+    if hls is not None:
+        forge.hls_enabled = hls
+
+    renders: List[Dict[str, Any]] = []
+    for n, variant in enumerate(variants):
+        forge.script_data = {**script_data, "script_columns": variant["script_columns"]}
+        stem = _render_stem(generation_id) if n == 0 else f"{_render_stem(generation_id)}_v{n}"
+        forge.logger.info(f"🎨 [Agent Gamma] Rendering hook variant {n + 1}/{len(variants)}...")
+        cut = await _render_cut(forge, variant.get("captions", []), stem)
+        renders.append({
+            "variation_number": n,
+            "hook_type": variant.get("hook_type", ""),
+            "final_video_path": str(cut["final_video_path"]),
+        })
+    forge.script_data = script_data
+
+    control = Path(renders[0]["final_video_path"]) if renders else Path()
+    hls_playlist = None
+    if renders and forge.hls_enabled:
+        hls_playlist = await forge.package_hls(control)
+    platforms = PLATFORM_EXPORTS if export_platforms is None else export_platforms
+    exports: Dict[str, Path] = {}
+    if renders and platforms:
+        exports = await forge.export_platform_variants(control, platforms)
+
+    visuals_generated = len(forge._clip_cache)
+    forge.release_scratch()
+
+    return {
+        "visuals_generated": visuals_generated,
+        "final_video_path": str(control) if renders else "",
+        "variant_renders": renders,
+        "hls_playlist": str(hls_playlist) if hls_playlist else "",
+        "platform_exports": {p: str(path) for p, path in exports.items()},
+        "duration": script_data.get("duration_seconds", 30),
         "resolution": VIDEO_RESOLUTION,
         "ready_for_review": True,
     }
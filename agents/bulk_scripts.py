@@ -0,0 +1,203 @@
+"""
+Offline bulk script generation.
+
+Pre-seeding a content calendar used to mean thousands of single
+generate_script calls. This runs the topic-aware template engine (no
+network) over a CSV or JSONL file of topics in a process pool and streams
+one script per line to a JSONL file, in input order.
+
+Each script is seeded from (--seed, row id, topic, language), so a rerun
+over the same input reproduces the same output regardless of worker count
+or chunking.
+
+    python -m agents.bulk_scripts topics.csv -o calendar.jsonl --workers 8
+
+CSV input needs a "topic" column (otherwise the first column is used);
+optional "id", "language" and "seo_keywords" (";"-separated) columns.
+JSONL input takes objects with the same keys, or bare strings.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from .agent_beta import render_template_script
+
+logger_bulk = logger.bind(name="BulkScripts")
+
+_ARABIC_RE = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]")
+
+
+def _detect_language(text: str) -> str:
+    # Same rule as the API's topic language detection
+    return "ar" if len(_ARABIC_RE.findall(text)) > len(text) * 0.3 else "en"
+
+
+def _keywords(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [k.strip() for k in str(value or "").split(";") if k.strip()]
+
+
+def _row(index: int, raw: Any, default_language: str) -> Optional[Dict[str, Any]]:
+    if isinstance(raw, str):
+        raw = {"topic": raw}
+    if not isinstance(raw, dict):
+        return None
+    topic = str(raw.get("topic") or "").strip()
+    if not topic:
+        return None
+    language = str(raw.get("language") or default_language).strip().lower()
+    if language == "auto":
+        language = _detect_language(topic)
+    return {
+        "id": str(raw.get("id") or index),
+        "topic": topic,
+        "language": language,
+        "seo_keywords": _keywords(raw.get("seo_keywords")),
+    }
+
+
+def read_topics(path: Path, default_language: str = "auto") -> Iterator[Dict[str, Any]]:
+    """Topic rows from a .csv or .jsonl file, streamed; blank/invalid rows are skipped."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            reader = csv.DictReader(f)
+            fields = reader.fieldnames or []
+            topic_field = "topic" if "topic" in fields else (fields[0] if fields else "topic")
+            for index, raw in enumerate(reader):
+                raw["topic"] = raw.get(topic_field)
+                row = _row(index, raw, default_language)
+                if row:
+                    yield row
+            return
+        for index, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                raw = json.loads(line)
+            except ValueError:
+                logger_bulk.warning(f"Skipping invalid JSON on line {index + 1}")
+                continue
+            row = _row(index, raw, default_language)
+            if row:
+                yield row
+
+
+def render_row(row: Dict[str, Any], seed: int) -> Dict[str, Any]:
+    """One script for a topic row, deterministic for (seed, id, topic, language)."""
+    rng = random.Random(f"{seed}:{row['id']}:{row['topic']}:{row['language']}")
+    hook_type, columns = render_template_script(
+        row["topic"], row["language"], row["seo_keywords"], rng,
+    )
+    return {
+        "id": row["id"],
+        "topic": row["topic"],
+        "language": row["language"],
+        "hook_type": hook_type,
+        "seo_keywords": row["seo_keywords"],
+        "script_columns": columns,
+        "raw_content": "\n".join(
+            f"{c['timecode']} | {c['visual_cue']} | {c['audio']}" for c in columns
+        ),
+        "script_source": "template",
+    }
+
+
+def _render_chunk(rows: List[Dict[str, Any]], seed: int) -> List[str]:
+    # Serialize in the worker so the parent only writes
+    return [json.dumps(render_row(row, seed), ensure_ascii=False) for row in rows]
+
+
+def _chunks(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_bulk(
+    input_path: Path, output_path: Path, workers: Optional[int] = None,
+    seed: int = 0, language: str = "auto", chunk_size: int = 256,
+) -> Dict[str, Any]:
+    """
+    Render every topic in input_path to output_path (JSONL, input order).
+    workers=0 renders in-process; otherwise at most 2 chunks per worker are
+    in flight, so memory stays flat however large the input is.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    rows = read_topics(input_path, language)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    written = 0
+
+    with open(output_path, "w", encoding="utf-8") as out:
+        def _write(lines: List[str]) -> None:
+            nonlocal written
+            out.write("\n".join(lines) + "\n")
+            written += len(lines)
+            if written // 5000 != (written - len(lines)) // 5000:
+                logger_bulk.info(f"{written} scripts written...")
+
+        if workers <= 0:
+            for chunk in _chunks(rows, chunk_size):
+                _write(_render_chunk(chunk, seed))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending: Deque[Future] = deque()
+                for chunk in _chunks(rows, chunk_size):
+                    pending.append(pool.submit(_render_chunk, chunk, seed))
+                    if len(pending) >= workers * 2:
+                        _write(pending.popleft().result())
+                while pending:
+                    _write(pending.popleft().result())
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "scripts": written,
+        "seconds": round(elapsed, 2),
+        "scripts_per_second": round(written / elapsed, 1) if elapsed > 0 else None,
+        "workers": workers,
+        "output": str(output_path),
+    }
+    logger_bulk.success(
+        f"{written} scripts in {elapsed:.1f}s ({summary['scripts_per_second']}/s) -> {output_path}"
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate template scripts for many topics offline")
+    parser.add_argument("input", type=Path, help="Topics file (.csv or .jsonl)")
+    parser.add_argument("-o", "--output", type=Path, default=None,
+                        help="Output JSONL (default: <input>.scripts.jsonl)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count, 0 = in-process)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for reproducible scripts")
+    parser.add_argument("--language", default="auto", choices=["auto", "en", "ar"],
+                        help="Language for rows without one (auto = detect from topic)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Topics per worker task")
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        parser.error(f"{args.input} not found")
+    output = args.output or args.input.with_suffix(".scripts.jsonl")
+    run_bulk(args.input, output, args.workers, args.seed, args.language, max(1, args.chunk_size))
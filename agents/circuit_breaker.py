@@ -0,0 +1,219 @@
+"""
+Per-provider circuit breakers.
+
+A provider that is down or out of quota used to cost every request the full
+timeout (Veo polls, both Baidu models, Gemini) before falling back. Each
+breaker watches a sliding window of outcomes:
+
+  closed     calls flow; once the window holds CIRCUIT_MIN_CALLS outcomes and
+             the failure rate reaches CIRCUIT_FAILURE_RATE it opens. Auth
+             errors and hard (billing/daily) quota errors open it immediately;
+             plain rate limits (429) are left to the adaptive limiter.
+  open       calls are refused (callers go straight to their fallback) until
+             the recovery time passes; it doubles on each consecutive re-open.
+             Late outcomes of calls started before it opened are only tallied.
+  half_open  one probe call is let through; success closes the breaker,
+             failure re-opens it.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple, Union
+
+from loguru import logger
+
+from config.settings import (
+    CIRCUIT_BREAKER_ENABLED, CIRCUIT_FAILURE_RATE, CIRCUIT_MIN_CALLS,
+    CIRCUIT_WINDOW_SECONDS, CIRCUIT_RECOVERY_SECONDS,
+)
+
+logger_cb = logger.bind(name="CircuitBreaker")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Errors that won't clear up by retrying the next request. Per-minute
+# RESOURCE_EXHAUSTED / 429s are not among them: the limiter backs off.
+_FATAL_RE = re.compile(
+    r"PERMISSION_DENIED|API[_ ]?KEY[_ ]?INVALID|API key not valid|"
+    r"\b401\b|\b403\b|Unauthorized|Forbidden|"
+    r"insufficient|billing|PerDay|per day|daily (?:quota|limit)",
+    re.IGNORECASE,
+)
+_MAX_BACKOFF_DOUBLINGS = 4
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = CIRCUIT_FAILURE_RATE,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        window_seconds: float = CIRCUIT_WINDOW_SECONDS,
+        recovery_seconds: float = CIRCUIT_RECOVERY_SECONDS,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = max(1, min_calls)
+        self.window_seconds = window_seconds
+        self.recovery_seconds = recovery_seconds
+        self._lock = threading.Lock()  # Veo records outcomes from worker threads
+        self._state = CLOSED
+        self._window: Deque[Tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._reopens = 0
+        self._probe_started: Optional[float] = None
+        self._last_error = ""
+        self._totals = {"success": 0, "failure": 0, "rejected": 0}
+
+    # ------------------------------------------------------------------
+
+    def _recovery(self) -> float:
+        return self.recovery_seconds * 2 ** min(self._reopens, _MAX_BACKOFF_DOUBLINGS)
+
+    def _prune(self, now: float) -> None:
+        while self._window and now - self._window[0][0] > self.window_seconds:
+            self._window.popleft()
+
+    def _open(self, now: float, reason: str) -> None:
+        if self._state != CLOSED:
+            self._reopens += 1
+        self._state = OPEN
+        self._opened_at = now
+        self._probe_started = None
+        self._window.clear()
+        logger_cb.warning(
+            f"Circuit '{self.name}' OPEN for {self._recovery():.0f}s — {reason}"
+        )
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self._recovery():
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go out now. In half-open only one probe is allowed
+        at a time; a probe that never reports back expires after the recovery
+        time so the breaker can't get stuck.
+        """
+        if not CIRCUIT_BREAKER_ENABLED:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if now - self._opened_at < self._recovery():
+                    self._totals["rejected"] += 1
+                    return False
+                self._state = HALF_OPEN
+                self._probe_started = None
+            if self._probe_started is None or now - self._probe_started > self._recovery():
+                self._probe_started = now
+                logger_cb.info(f"Circuit '{self.name}' half-open — probing")
+                return True
+            self._totals["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._totals["success"] += 1
+            if self._state == OPEN:
+                return  # a call from before the breaker opened — not a probe
+            if self._state == HALF_OPEN:
+                logger_cb.info(f"Circuit '{self.name}' CLOSED — provider recovered")
+                self._state = CLOSED
+                self._reopens = 0
+                self._probe_started = None
+                self._window.clear()
+            self._window.append((now, True))
+            self._prune(now)
+
+    def record_failure(self, error: Union[BaseException, str, None] = None) -> None:
+        now = time.monotonic()
+        message = str(error or "")
+        with self._lock:
+            self._totals["failure"] += 1
+            self._last_error = message[:200]
+            if self._state == OPEN:
+                return  # stale failure from a call already in flight when it opened
+            if self._state == HALF_OPEN:
+                self._open(now, f"probe failed: {message[:120]}")
+                return
+            if message and _FATAL_RE.search(message):
+                self._open(now, f"quota/auth error: {message[:120]}")
+                return
+            self._window.append((now, False))
+            self._prune(now)
+            failures = sum(1 for _, ok in self._window if not ok)
+            if len(self._window) >= self.min_calls and failures / len(self._window) >= self.failure_rate:
+                self._open(now, f"{failures}/{len(self._window)} calls failed in {self.window_seconds:.0f}s")
+
+    def record(self, ok: bool, error: Union[BaseException, str, None] = None) -> None:
+        if ok:
+            self.record_success()
+        else:
+            self.record_failure(error)
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Refuse with CircuitOpenError when open; otherwise record the block's outcome."""
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+        try:
+            yield
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        else:
+            self.record_success()
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            failures = sum(1 for _, ok in self._window if not ok)
+            retry_in = None
+            if state == OPEN:
+                retry_in = round(max(self._recovery() - (now - self._opened_at), 0.0), 1)
+            return {
+                "state": state,
+                "window_calls": len(self._window),
+                "window_failures": failures,
+                "retry_in_seconds": retry_in,
+                "last_error": self._last_error or None,
+                **self._totals,
+            }
+
+
+_registry: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Shared breaker for a provider (e.g. "veo", "pexels", "gemini/gemini-2.0-flash")."""
+    with _registry_lock:
+        breaker = _registry.get(name)
+        if breaker is None:
+            breaker = _registry[name] = CircuitBreaker(name)
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    with _registry_lock:
+        breakers = list(_registry.values())
+    return {b.name: b.snapshot() for b in sorted(breakers, key=lambda b: b.name)}
@@ -0,0 +1,103 @@
+"""
+Pre-assembly clip quality gate.
+
+Samples a handful of downscaled frames per scene clip (OpenCV/NumPy) and
+checks decodability, duration, black footage and frozen footage, so bad
+scenes can be replaced before the expensive assembly and caption passes.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+    np = None
+
+from loguru import logger
+
+logger_qc = logger.bind(name="ClipQC")
+
+SAMPLE_FRAMES = 8
+SAMPLE_SIZE = (36, 64)          # w, h — plenty for luma/motion statistics
+BLACK_MEAN_LUMA = 14.0          # near-black: dim on average...
+BLACK_P95_LUMA = 32.0           # ...and no bright regions either
+FROZEN_MEAN_DIFF = 0.6          # mean abs luma change between samples
+LENGTH_TOLERANCE = 0.25         # fraction of expected duration
+
+
+def inspect_clip(
+    path: Path, expected_duration: float, allow_static: bool = False,
+) -> Dict[str, Any]:
+    """
+    Blocking: analyse one clip. Returns {"ok", "issues", "duration",
+    "mean_luma", "motion"}; issues is a list of "empty", "undecodable",
+    "corrupt", "wrong_length", "black", "frozen".
+    """
+    report: Dict[str, Any] = {
+        "ok": False, "issues": [], "duration": 0.0, "mean_luma": None, "motion": None,
+    }
+    if not path.exists() or path.stat().st_size == 0:
+        report["issues"].append("empty")
+        return report
+    if cv2 is None:
+        # Without OpenCV only the size check applies
+        report["ok"] = True
+        return report
+
+    cap = cv2.VideoCapture(str(path))
+    try:
+        if not cap.isOpened():
+            report["issues"].append("undecodable")
+            return report
+
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        duration = frame_count / fps if fps > 0 else 0.0
+        report["duration"] = round(duration, 3)
+
+        if expected_duration > 0:
+            slack = max(0.5, expected_duration * LENGTH_TOLERANCE)
+            if abs(duration - expected_duration) > slack:
+                report["issues"].append("wrong_length")
+
+        positions = np.linspace(0, max(frame_count - 1, 0), SAMPLE_FRAMES).astype(int)
+        samples: List[Any] = []
+        for pos in sorted(set(positions.tolist())):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+            ok, frame = cap.read()
+            if not ok or frame is None:
+                continue
+            small = cv2.resize(frame, SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+            samples.append(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32))
+    finally:
+        cap.release()
+
+    if not samples:
+        report["issues"].append("undecodable")
+        return report
+    if len(samples) < len(set(positions.tolist())) / 2:
+        report["issues"].append("corrupt")
+
+    stack = np.stack(samples)
+    report["mean_luma"] = round(float(stack.mean()), 2)
+    if stack.mean() < BLACK_MEAN_LUMA and np.percentile(stack, 95) < BLACK_P95_LUMA:
+        report["issues"].append("black")
+
+    if len(samples) >= 3:
+        motion = float(np.abs(np.diff(stack, axis=0)).mean())
+        report["motion"] = round(motion, 3)
+        if motion < FROZEN_MEAN_DIFF and not allow_static and duration > 1.0:
+            report["issues"].append("frozen")
+
+    report["ok"] = not report["issues"]
+    return report
+
+
+def summarize(reports: List[Dict[str, Any]]) -> Optional[str]:
+    """One-line summary of flagged clips, or None when all passed."""
+    bad = [f"scene {i}: {', '.join(r['issues'])}" for i, r in enumerate(reports) if r["issues"]]
+    return "; ".join(bad) if bad else None
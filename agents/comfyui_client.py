@@ -0,0 +1,327 @@
+"""
+Async ComfyUI client for the Media Forge.
+
+Submits API-format workflow graphs over HTTP, tracks completion on a single
+shared websocket (many prompts multiplexed onto one connection), and fetches
+the produced images. Submissions are throttled by the server's reported
+queue depth, and results are cached on disk by (workflow, prompt, seed).
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from loguru import logger
+
+from config.settings import (
+    ASSETS_DIR, COMFYUI_BASE_URL, COMFYUI_WEBSOCKET_URL,
+    COMFYUI_CHECKPOINT, COMFYUI_MAX_QUEUE_DEPTH, COMFYUI_TIMEOUT,
+    COMFYUI_WORKFLOW_PATH,
+)
+
+logger_comfy = logger.bind(name="ComfyUI")
+
+COMFYUI_CACHE_DIR = ASSETS_DIR / "comfyui_cache"
+
+# Minimal SD text-to-image graph in ComfyUI's API format. String/int values
+# "$PROMPT", "$NEGATIVE", "$SEED", "$WIDTH", "$HEIGHT" are substituted per call.
+DEFAULT_TXT2IMG_WORKFLOW: Dict[str, Any] = {
+    "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": COMFYUI_CHECKPOINT}},
+    "5": {"class_type": "EmptyLatentImage", "inputs": {"width": "$WIDTH", "height": "$HEIGHT", "batch_size": 1}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "$PROMPT", "clip": ["4", 1]}},
+    "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "$NEGATIVE", "clip": ["4", 1]}},
+    "3": {
+        "class_type": "KSampler",
+        "inputs": {
+            "seed": "$SEED", "steps": 20, "cfg": 7.0,
+            "sampler_name": "euler", "scheduler": "normal", "denoise": 1.0,
+            "model": ["4", 0], "positive": ["6", 0], "negative": ["7", 0],
+            "latent_image": ["5", 0],
+        },
+    },
+    "8": {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0], "vae": ["4", 2]}},
+    "9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "viral_engine", "images": ["8", 0]}},
+}
+
+
+class ComfyUIError(RuntimeError):
+    """Raised when ComfyUI rejects, fails or times out on a prompt."""
+
+
+def load_workflow_template() -> Dict[str, Any]:
+    """Return the configured workflow template (COMFYUI_WORKFLOW_PATH) or the default."""
+    if COMFYUI_WORKFLOW_PATH:
+        path = Path(COMFYUI_WORKFLOW_PATH)
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger_comfy.warning(f"Could not load workflow {path}: {e}. Using default graph.")
+    return DEFAULT_TXT2IMG_WORKFLOW
+
+
+def fill_workflow(template: Dict[str, Any], values: Dict[str, Any]) -> Dict[str, Any]:
+    """Deep-copy a template and replace "$NAME" placeholder values."""
+    def _fill(node: Any) -> Any:
+        if isinstance(node, dict):
+            return {k: _fill(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [_fill(v) for v in node]
+        if isinstance(node, str) and node.startswith("$") and node[1:] in values:
+            return values[node[1:]]
+        return node
+    return _fill(copy.deepcopy(template))
+
+
+class ComfyUIClient:
+    """
+    One HTTP session + one websocket per process. Each submitted prompt gets a
+    future that the websocket listener resolves when ComfyUI reports the
+    prompt finished (or failed).
+    """
+
+    def __init__(
+        self,
+        base_url: str = COMFYUI_BASE_URL,
+        ws_url: str = COMFYUI_WEBSOCKET_URL,
+        max_queue_depth: int = COMFYUI_MAX_QUEUE_DEPTH,
+        timeout: float = COMFYUI_TIMEOUT,
+        cache_dir: Path = COMFYUI_CACHE_DIR,
+    ):
+        self.logger = logger_comfy
+        self.base_url = base_url.rstrip("/")
+        self.ws_url = ws_url
+        self.max_queue_depth = max(1, max_queue_depth)
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.client_id = uuid.uuid4().hex
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._finished_early: Dict[str, Optional[str]] = {}
+        self._inflight_keys: Dict[str, asyncio.Future] = {}
+
+        self._queue_remaining = 0
+        self._submitted = 0
+        self._slots = asyncio.Condition()
+
+    # ------------------------------------------------------------------
+    # Connection management
+    # ------------------------------------------------------------------
+
+    async def _ensure_connected(self) -> None:
+        async with self._connect_lock:
+            if self._session is None or self._session.closed:
+                self._session = aiohttp.ClientSession(
+                    timeout=aiohttp.ClientTimeout(total=60),
+                )
+            if self._ws is None or self._ws.closed:
+                sep = "&" if "?" in self.ws_url else "?"
+                self._ws = await self._session.ws_connect(
+                    f"{self.ws_url}{sep}clientId={self.client_id}", heartbeat=30,
+                )
+                self._listener = asyncio.create_task(self._listen(self._ws))
+                self.logger.info(f"ComfyUI websocket connected ({self.ws_url})")
+
+    async def close(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _listen(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        try:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    try:
+                        await self._handle_message(json.loads(msg.data))
+                    except (ValueError, TypeError):
+                        continue
+                elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+                # Binary frames are live previews — not needed here
+        finally:
+            self._fail_pending("ComfyUI websocket closed")
+
+    async def _handle_message(self, message: Dict[str, Any]) -> None:
+        kind = message.get("type")
+        data = message.get("data") or {}
+
+        if kind == "status":
+            remaining = data.get("status", {}).get("exec_info", {}).get("queue_remaining")
+            if remaining is not None:
+                async with self._slots:
+                    self._queue_remaining = int(remaining)
+                    self._slots.notify_all()
+            return
+
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return
+        if (kind == "executing" and data.get("node") is None) or kind == "execution_success":
+            self._resolve(prompt_id, None)
+        elif kind in ("execution_error", "execution_interrupted"):
+            detail = data.get("exception_message") or kind
+            self._resolve(prompt_id, str(detail))
+
+    def _resolve(self, prompt_id: str, error: Optional[str]) -> None:
+        fut = self._pending.pop(prompt_id, None)
+        if fut is None:
+            # Finished before we registered the future (fast cached graphs)
+            self._finished_early[prompt_id] = error
+            return
+        if fut.done():
+            return
+        if error:
+            fut.set_exception(ComfyUIError(error))
+        else:
+            fut.set_result(None)
+
+    def _fail_pending(self, reason: str) -> None:
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(ComfyUIError(reason))
+        self._pending.clear()
+
+    # ------------------------------------------------------------------
+    # Queue-depth-aware admission
+    # ------------------------------------------------------------------
+
+    async def _acquire_slot(self) -> None:
+        async with self._slots:
+            await self._slots.wait_for(
+                lambda: max(self._submitted, self._queue_remaining) < self.max_queue_depth
+            )
+            self._submitted += 1
+
+    async def _release_slot(self) -> None:
+        async with self._slots:
+            self._submitted -= 1
+            self._slots.notify_all()
+
+    # ------------------------------------------------------------------
+    # Prompt execution
+    # ------------------------------------------------------------------
+
+    async def run_workflow(self, workflow: Dict[str, Any]) -> List[bytes]:
+        """Queue a workflow graph, wait for completion, and return its images."""
+        await self._ensure_connected()
+        await self._acquire_slot()
+        try:
+            async with self._session.post(
+                f"{self.base_url}/prompt",
+                json={"prompt": workflow, "client_id": self.client_id},
+            ) as resp:
+                body = await resp.json(content_type=None)
+                if resp.status != 200 or "prompt_id" not in body:
+                    raise ComfyUIError(f"Prompt rejected ({resp.status}): {body}")
+            prompt_id = body["prompt_id"]
+
+            if prompt_id in self._finished_early:
+                error = self._finished_early.pop(prompt_id)
+                if error:
+                    raise ComfyUIError(error)
+            else:
+                fut = asyncio.get_running_loop().create_future()
+                self._pending[prompt_id] = fut
+                try:
+                    await asyncio.wait_for(fut, timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    self._pending.pop(prompt_id, None)
+                    raise ComfyUIError(f"Prompt {prompt_id} timed out after {self.timeout}s")
+
+            return await self._fetch_outputs(prompt_id)
+        finally:
+            await self._release_slot()
+
+    async def _fetch_outputs(self, prompt_id: str) -> List[bytes]:
+        async with self._session.get(f"{self.base_url}/history/{prompt_id}") as resp:
+            history = await resp.json(content_type=None)
+        outputs = history.get(prompt_id, {}).get("outputs", {})
+
+        images: List[bytes] = []
+        for node_output in outputs.values():
+            for image in node_output.get("images", []):
+                params = {
+                    "filename": image.get("filename", ""),
+                    "subfolder": image.get("subfolder", ""),
+                    "type": image.get("type", "output"),
+                }
+                async with self._session.get(f"{self.base_url}/view", params=params) as resp:
+                    if resp.status == 200:
+                        images.append(await resp.read())
+        if not images:
+            raise ComfyUIError(f"Prompt {prompt_id} finished without images")
+        return images
+
+    # ------------------------------------------------------------------
+    # Cached text-to-image
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def cache_key(workflow: Dict[str, Any], prompt: str, seed: int) -> str:
+        graph = json.dumps(workflow, sort_keys=True, ensure_ascii=False)
+        raw = f"{graph}\x1f{prompt}\x1f{seed}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def generate_image(
+        self, prompt: str, seed: int, width: int = 576, height: int = 1024,
+        negative: str = "blurry, low quality, watermark, text",
+        workflow: Optional[Dict[str, Any]] = None,
+    ) -> Path:
+        """Render one image for (workflow, prompt, seed), reusing cached results."""
+        template = workflow or load_workflow_template()
+        key = self.cache_key(template, f"{prompt}\x1f{negative}\x1f{width}x{height}", seed)
+        path = self.cache_dir / f"{key[:32]}.png"
+        if path.exists() and path.stat().st_size > 0:
+            self.logger.debug(f"ComfyUI cache hit: {path.name}")
+            return path
+
+        # Identical concurrent requests share one ComfyUI run
+        existing = self._inflight_keys.get(key)
+        if existing is not None:
+            return await asyncio.shield(existing)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight_keys[key] = fut
+        try:
+            graph = fill_workflow(template, {
+                "PROMPT": prompt, "NEGATIVE": negative, "SEED": seed,
+                "WIDTH": width, "HEIGHT": height,
+            })
+            images = await self.run_workflow(graph)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(path.write_bytes, images[0])
+            fut.set_result(path)
+            return path
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight_keys.pop(key, None)
+
+
+_client: Optional[ComfyUIClient] = None
+
+
+def get_comfyui_client() -> ComfyUIClient:
+    """Process-wide client so all scenes multiplex onto one websocket."""
+    global _client
+    if _client is None:
+        _client = ComfyUIClient()
+    return _client
@@ -0,0 +1,259 @@
+"""
+Encoder calibration for the Media Forge.
+
+Encodes a standard synthetic 1080x1920 clip (lavfi testsrc2) across x264
+preset / CRF / thread combinations on the current machine, records
+throughput, file size and PSNR, and saves a per-machine profile. The forge
+reads that profile to pick the most efficient preset that still meets
+ENCODER_TARGET_SPEED without losing more than MAX_PSNR_DROP dB against the
+best quality measured at the same CRF.
+
+Usage:
+    python -m agents.encoder_calibration            # full grid
+    python -m agents.encoder_calibration --quick    # fewer presets, shorter clip
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import re
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from config.settings import (
+    WORKSPACE_DIR, FFMPEG_BIN, VIDEO_FPS, ENCODER_TARGET_SPEED,
+)
+
+logger_calib = logger.bind(name="EncoderCalibration")
+
+PROFILE_DIR = WORKSPACE_DIR / "encoder_profiles"
+CALIBRATION_RESOLUTION = "1080x1920"
+
+DEFAULT_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium"]
+DEFAULT_CRFS = [18, 21, 23]
+
+# Quality target (CRF) and fallback preset per encode role in the forge
+X264_ROLES: Dict[str, Dict[str, Any]] = {
+    "clip": {"crf": 21, "preset": "fast"},       # scene clip preparation
+    "still": {"crf": 23, "preset": "fast"},      # image / placeholder → clip
+    "assembly": {"crf": 21, "preset": "fast"},   # concat + voiceover mix
+    "master": {"crf": 18, "preset": "fast"},     # caption burn-in / final render
+    "export": {"crf": 21, "preset": "veryfast"}, # capped platform transcodes
+}
+
+# A smaller file isn't "more efficient" if it got there by looking worse
+MAX_PSNR_DROP = 1.0
+
+_PSNR_RE = re.compile(r"PSNR .*?average:([\d.]+|inf)")
+
+
+def machine_id() -> str:
+    """Stable slug for this box: hostname + CPU model + core count."""
+    cpu = platform.processor() or ""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    raw = f"{platform.node()}-{cpu or platform.machine()}-{os.cpu_count()}c"
+    return re.sub(r"[^A-Za-z0-9]+", "_", raw).strip("_").lower()[:120]
+
+
+def profile_path() -> Path:
+    return PROFILE_DIR / f"{machine_id()}.json"
+
+
+def _source_args(duration: float) -> List[str]:
+    return [
+        "-f", "lavfi",
+        "-i", f"testsrc2=s={CALIBRATION_RESOLUTION}:r={VIDEO_FPS}:d={duration}",
+    ]
+
+
+def _measure(
+    preset: str, crf: int, threads: int, duration: float, work_dir: Path,
+) -> Optional[Dict[str, Any]]:
+    """Encode the test clip once and score it."""
+    output = work_dir / f"calib_{preset}_{crf}_{threads}.mp4"
+    cmd = [
+        FFMPEG_BIN, "-y", "-hide_banner",
+        *_source_args(duration),
+        "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+        "-threads", str(threads),
+        "-pix_fmt", "yuv420p", "-an",
+        str(output),
+    ]
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(
+            cmd, capture_output=True, timeout=600,
+            encoding="utf-8", errors="replace",
+        )
+    except subprocess.TimeoutExpired:
+        logger_calib.warning(f"{preset}/crf{crf}/t{threads} timed out")
+        output.unlink(missing_ok=True)
+        return None
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0 or not output.exists():
+        logger_calib.warning(f"{preset}/crf{crf}/t{threads} failed: {result.stderr[-200:]}")
+        return None
+
+    size = output.stat().st_size
+    psnr_cmd = [
+        FFMPEG_BIN, "-hide_banner",
+        "-i", str(output),
+        *_source_args(duration),
+        "-lavfi", "[0:v]format=yuv420p[a];[1:v]format=yuv420p[b];[a][b]psnr",
+        "-f", "null", "-",
+    ]
+    psnr = None
+    try:
+        psnr_result = subprocess.run(
+            psnr_cmd, capture_output=True, timeout=600,
+            encoding="utf-8", errors="replace",
+        )
+        match = _PSNR_RE.search(psnr_result.stderr)
+        if match:
+            psnr = 99.0 if match.group(1) == "inf" else float(match.group(1))
+    except subprocess.TimeoutExpired:
+        logger_calib.warning(f"{preset}/crf{crf}/t{threads} PSNR measurement timed out")
+    output.unlink(missing_ok=True)
+
+    frames = duration * VIDEO_FPS
+    return {
+        "preset": preset,
+        "crf": crf,
+        "threads": threads,
+        "encode_seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+        "speed": round(frames / elapsed / VIDEO_FPS, 3) if elapsed > 0 else 0.0,
+        "bytes": size,
+        "kbps": round(size * 8 / 1000 / duration, 1),
+        "psnr": psnr,
+    }
+
+
+def run_calibration(
+    presets: Optional[List[str]] = None,
+    crfs: Optional[List[int]] = None,
+    threads: Optional[List[int]] = None,
+    duration: float = 4.0,
+) -> Dict[str, Any]:
+    """Run the benchmark grid and write the machine profile."""
+    presets = presets or DEFAULT_PRESETS
+    crfs = crfs or DEFAULT_CRFS
+    if threads is None:
+        cores = os.cpu_count() or 1
+        threads = sorted({0, max(1, cores // 2)})  # 0 = x264 auto
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="calib_") as tmp:
+        for preset in presets:
+            for crf in crfs:
+                for t in threads:
+                    row = _measure(preset, crf, t, duration, Path(tmp))
+                    if row:
+                        results.append(row)
+                        logger_calib.info(
+                            f"{preset:>9} crf{crf} t{t}: {row['fps']:6.1f} fps "
+                            f"({row['speed']:.2f}x) {row['kbps']:7.0f} kbps "
+                            f"PSNR {row['psnr']}"
+                        )
+
+    profile = {
+        "machine": machine_id(),
+        "cpu_count": os.cpu_count(),
+        "created_at": datetime.now().isoformat(),
+        "resolution": CALIBRATION_RESOLUTION,
+        "fps": VIDEO_FPS,
+        "clip_seconds": duration,
+        "results": results,
+    }
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = profile_path()
+    path.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+    load_encoder_profile.cache_clear()
+    logger_calib.info(f"Encoder profile saved: {path}")
+    return profile
+
+
+@lru_cache(maxsize=1)
+def load_encoder_profile() -> Optional[Dict[str, Any]]:
+    path = profile_path()
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        logger_calib.warning(f"Ignoring unreadable encoder profile {path}: {e}")
+        return None
+
+
+def choose_x264_settings(
+    role: str, target_speed: float = ENCODER_TARGET_SPEED,
+) -> Dict[str, Any]:
+    """
+    Pick preset/CRF/threads for an encode role. Among calibrated runs at the
+    role's CRF that meet the target speed (x realtime) and stay within
+    MAX_PSNR_DROP of the best PSNR at that CRF, take the smallest output; if
+    none do, take the fastest. Without a profile, use the role defaults.
+    """
+    spec = X264_ROLES.get(role, X264_ROLES["clip"])
+    chosen = {"preset": spec["preset"], "crf": spec["crf"], "threads": None}
+
+    profile = load_encoder_profile()
+    rows = (profile or {}).get("results") or []
+    if not rows:
+        return chosen
+
+    nearest_crf = min({r["crf"] for r in rows}, key=lambda c: abs(c - spec["crf"]))
+    candidates = [r for r in rows if r["crf"] == nearest_crf]
+    scored = [r["psnr"] for r in candidates if r.get("psnr") is not None]
+    floor = max(scored) - MAX_PSNR_DROP if scored else None
+    fast_enough = [
+        r for r in candidates
+        if r["speed"] >= target_speed
+        and (floor is None or r.get("psnr") is None or r["psnr"] >= floor)
+    ]
+    if fast_enough:
+        best = min(fast_enough, key=lambda r: (r["bytes"], -r["speed"]))
+    else:
+        best = max(candidates, key=lambda r: r["speed"])
+
+    chosen["preset"] = best["preset"]
+    chosen["threads"] = best["threads"] or None
+    return chosen
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calibrate x264 settings for this machine")
+    parser.add_argument("--quick", action="store_true", help="3 presets, 2s clip")
+    parser.add_argument("--duration", type=float, default=None, help="Test clip seconds")
+    parser.add_argument("--presets", default="", help="Comma list of x264 presets")
+    parser.add_argument("--crfs", default="", help="Comma list of CRF values")
+    parser.add_argument("--threads", default="", help="Comma list of thread counts (0=auto)")
+    args = parser.parse_args()
+
+    presets = [p for p in args.presets.split(",") if p] or (
+        ["ultrafast", "veryfast", "fast"] if args.quick else None
+    )
+    crfs = [int(c) for c in args.crfs.split(",") if c] or None
+    threads = [int(t) for t in args.threads.split(",") if t] or None
+    duration = args.duration or (2.0 if args.quick else 4.0)
+
+    profile = run_calibration(presets, crfs, threads, duration)
+    for role in X264_ROLES:
+        logger_calib.info(f"{role:>8}: {choose_x264_settings(role)}")
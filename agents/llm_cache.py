@@ -0,0 +1,185 @@
+"""
+Disk-backed LLM completion cache.
+
+Completions are stored in SQLite under WORKSPACE_DIR, keyed by
+(provider, model, normalized prompt, generation params). Entries expire
+after LLM_CACHE_TTL_HOURS and the least recently used ones are evicted
+once the stored text exceeds LLM_CACHE_MAX_MB. Callers that need fresh
+creative output (e.g. script variations) bypass the cache per call.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from config.settings import (
+    WORKSPACE_DIR, LLM_CACHE_ENABLED, LLM_CACHE_TTL_HOURS, LLM_CACHE_MAX_MB,
+)
+
+logger_cache = logger.bind(name="LLMCache")
+
+CACHE_FILE = WORKSPACE_DIR / "llm_cache.sqlite3"
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Whitespace-insensitive form of a prompt (indentation, blank lines, trailing spaces)."""
+    return _WS_RE.sub(" ", prompt).strip()
+
+
+def cache_key(provider: str, model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    payload = json.dumps(
+        [provider, model, normalize_prompt(prompt), params or {}],
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """Thread-safe SQLite cache; calls are sub-millisecond and run in worker threads."""
+
+    def __init__(
+        self,
+        path: Path = CACHE_FILE,
+        ttl_hours: float = LLM_CACHE_TTL_HOURS,
+        max_mb: float = LLM_CACHE_MAX_MB,
+    ):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON completions(last_access)")
+        self._db.commit()
+
+    def get(self, provider: str, model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        key = cache_key(provider, model, prompt, params)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl > 0 and now - row[1] > self.ttl):
+                if row is not None:
+                    self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._db.commit()
+                self._misses += 1
+                return None
+            self._db.execute(
+                "UPDATE completions SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            self._hits += 1
+            return row[0]
+
+    def put(
+        self, provider: str, model: str, prompt: str, response: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if not response:
+            return
+        key = cache_key(provider, model, prompt, params)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, provider, model, response, size, created, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, provider, model, response, size, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones down to 90% of the size cap."""
+        if self.ttl > 0:
+            self._evictions += self._db.execute(
+                "DELETE FROM completions WHERE created < ?", (now - self.ttl,)
+            ).rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for key, size in self._db.execute(
+            "SELECT key, size FROM completions ORDER BY last_access"
+        ).fetchall():
+            if total <= target:
+                break
+            self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+            total -= size
+            self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM completions")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total, lifetime_hits = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM completions"
+            ).fetchone()
+            by_provider = {
+                provider: {"entries": n, "hits": h}
+                for provider, n, h in self._db.execute(
+                    "SELECT provider, COUNT(*), COALESCE(SUM(hits), 0) FROM completions GROUP BY provider"
+                )
+            }
+        lookups = self._hits + self._misses
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+            "evictions": self._evictions,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl_hours": self.ttl / 3600,
+            "stored_entry_hits": lifetime_hits,
+            "providers": by_provider,
+        }
+
+
+_cache: Optional[CompletionCache] = None
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """Process-wide cache, or None when LLM_CACHE_ENABLED is off or the DB can't be opened."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        try:
+            _cache = CompletionCache()
+        except sqlite3.Error as e:
+            logger_cache.warning(f"LLM cache disabled: {e}")
+            return None
+    return _cache
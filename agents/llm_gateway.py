@@ -0,0 +1,375 @@
+"""
+Shared non-blocking LLM gateway.
+
+Every agent used to build a fresh genai.Client / AsyncOpenAI client per
+call, and the Gemini calls went through the synchronous generate_content
+inside async handlers — stalling the FastAPI event loop for the whole LLM
+round trip. The gateway keeps one long-lived async client per provider
+(Gemini via client.aio, Baidu Ernie via the OpenAI-compatible API), with
+pooled connections and a hard timeout on every call.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from loguru import logger
+
+from .llm_cache import get_completion_cache
+from .circuit_breaker import get_breaker
+from .adaptive_limiter import get_limiter, overload_signal
+
+from config.settings import (
+    GOOGLE_VEO_API_KEY, BAIDU_AI_API_KEY, BAIDU_AI_BASE_URL,
+    LLM_TIMEOUT, LLM_MAX_CONNECTIONS,
+    LLM_INITIAL_CONCURRENCY, LLM_MAX_CONCURRENCY, LLM_RATE_LIMIT_RETRIES,
+)
+
+try:
+    from google import genai
+    from google.genai import types as genai_types
+except ImportError:
+    genai = None
+    genai_types = None
+
+try:
+    import httpx
+    from openai import AsyncOpenAI
+except ImportError:
+    httpx = None
+    AsyncOpenAI = None
+
+logger_llm = logger.bind(name="LLMGateway")
+
+
+class LLMGateway:
+    """
+    Lazily-built, process-wide async clients. Clients are tied to the event
+    loop that created them and are rebuilt if a different loop (e.g. a CLI
+    run via asyncio.run) uses the gateway.
+    """
+
+    def __init__(self, timeout: float = LLM_TIMEOUT, max_connections: int = LLM_MAX_CONNECTIONS):
+        self.logger = logger_llm
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._gemini: Optional[Any] = None
+        self._baidu: Optional[Any] = None
+        self._loops: Dict[str, Any] = {}
+        self._closing: set = set()
+
+    # ------------------------------------------------------------------
+    # Clients
+    # ------------------------------------------------------------------
+
+    def _current(self, provider: str, client: Optional[Any]) -> bool:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        return client is not None and self._loops.get(provider) is loop
+
+    def _retire(self, provider: str, client: Optional[Any]) -> None:
+        """
+        Schedule the close of a client built on another event loop before it
+        is replaced: on that loop if it is still running, else on this one
+        (best effort — a finished loop's sockets can't all be shut cleanly).
+        """
+        if client is None:
+            return
+        close = client.aio.aclose if provider == "gemini" else client.close
+
+        async def _close() -> None:
+            try:
+                await close()
+            except Exception as e:
+                self.logger.debug(f"Closing stale {provider} client failed: {e}")
+
+        loop = self._loops.get(provider)
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(_close(), loop)
+        else:
+            task = asyncio.get_running_loop().create_task(_close())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    def gemini_available(self) -> bool:
+        return bool(GOOGLE_VEO_API_KEY) and genai is not None
+
+    def baidu_available(self) -> bool:
+        return bool(BAIDU_AI_API_KEY) and AsyncOpenAI is not None
+
+    def gemini(self):
+        """Async Gemini models API (client.aio) shared by all agents."""
+        if not self.gemini_available():
+            raise RuntimeError("Gemini unavailable (GOOGLE_VEO_API_KEY missing or google-genai not installed)")
+        if not self._current("gemini", self._gemini):
+            self._retire("gemini", self._gemini)
+            self._gemini = genai.Client(
+                api_key=GOOGLE_VEO_API_KEY,
+                http_options=genai_types.HttpOptions(timeout=int(self.timeout * 1000)),
+            )
+            self._loops["gemini"] = asyncio.get_running_loop()
+        return self._gemini.aio
+
+    def baidu(self):
+        """Pooled AsyncOpenAI client for the Baidu AI Studio endpoint."""
+        if not self.baidu_available():
+            raise RuntimeError("Baidu AI unavailable (BAIDU_AI_API_KEY missing or openai not installed)")
+        if not self._current("baidu", self._baidu):
+            self._retire("baidu", self._baidu)
+            self._baidu = AsyncOpenAI(
+                api_key=BAIDU_AI_API_KEY,
+                base_url=BAIDU_AI_BASE_URL,
+                timeout=self.timeout,
+                max_retries=0,  # throttling retries are handled by the adaptive limiter
+                http_client=httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    ),
+                ),
+            )
+            self._loops["baidu"] = asyncio.get_running_loop()
+        return self._baidu
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+
+    async def _cached(
+        self, provider: str, model: str, prompt: str, params: Dict[str, Any],
+        fresh: bool, call, validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        Serve from the completion cache unless fresh; store non-empty results
+        that pass validate (when given), so a bad answer isn't pinned for the
+        cache TTL. Misses go through the provider/model circuit breaker, which
+        raises CircuitOpenError at once while the provider is failing.
+        """
+        cache = None if fresh else get_completion_cache()
+        if cache is not None:
+            hit = await self._cache_get(cache, provider, model, prompt, params, validate)
+            if hit is not None:
+                self.logger.debug(f"LLM cache hit ({provider}/{model})")
+                return hit
+        async with get_breaker(f"{provider}/{model}").guard():
+            text = await self._throttled(provider, call)
+        if cache is not None:
+            await self._cache_put(cache, provider, model, prompt, text, params, validate)
+        return text
+
+    @staticmethod
+    async def _cache_get(cache, provider, model, prompt, params, validate) -> Optional[str]:
+        hit = await asyncio.to_thread(cache.get, provider, model, prompt, params)
+        if hit is not None and validate is not None and not validate(hit):
+            return None  # stored before validation existed — treat as a miss
+        return hit
+
+    @staticmethod
+    async def _cache_put(cache, provider, model, prompt, text, params, validate) -> None:
+        if text and (validate is None or validate(text)):
+            await asyncio.to_thread(cache.put, provider, model, prompt, text, params)
+
+    async def _throttled(self, provider: str, call) -> str:
+        """
+        Run a call under the provider's adaptive concurrency limit. Throttling
+        errors halve the limit and are retried once the provider's
+        Retry-After / backoff has passed; timeouts are not retried.
+        """
+        limiter = get_limiter(provider, LLM_INITIAL_CONCURRENCY, LLM_MAX_CONCURRENCY)
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            try:
+                async with limiter.slot():
+                    return await call()
+            except Exception as e:
+                timed_out = isinstance(e, (asyncio.TimeoutError, TimeoutError))
+                if attempt == LLM_RATE_LIMIT_RETRIES or timed_out or not overload_signal(e)[0]:
+                    raise
+                self.logger.info(f"{provider} throttled — retrying after backoff ({attempt + 1})")
+
+    @staticmethod
+    def _gemini_config(json_mode: bool, schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if schema is not None:
+            return {"response_mime_type": "application/json", "response_json_schema": schema}
+        return {"response_mime_type": "application/json"} if json_mode else None
+
+    @staticmethod
+    def _gemini_params(json_mode: bool, schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        # Cache-key params; plain calls keep the keys they had before schemas existed
+        if schema is not None:
+            return {"json": True, "schema": schema}
+        return {"json": json_mode}
+
+    async def gemini_generate(
+        self, prompt: str, model: str = "gemini-2.0-flash", json_mode: bool = False,
+        fresh: bool = False, schema: Optional[Dict[str, Any]] = None,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        Text (or JSON text with json_mode) from Gemini. A JSON schema makes
+        Gemini constrain its output to it. Raises on failure or timeout.
+        fresh=True skips the completion cache; validate decides what is cached.
+        """
+        config = self._gemini_config(json_mode, schema)
+
+        async def _call() -> str:
+            response = await asyncio.wait_for(
+                self.gemini().models.generate_content(model=model, contents=prompt, config=config),
+                timeout=self.timeout,
+            )
+            return response.text or ""
+
+        params = self._gemini_params(json_mode, schema)
+        return await self._cached("gemini", model, prompt, params, fresh, _call, validate)
+
+    async def baidu_chat(
+        self, prompt: str, model: str, max_tokens: int = 4096, fresh: bool = False,
+        json_mode: bool = False, validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        Chat completion from Baidu AI Studio (a JSON object with json_mode).
+        Raises on failure or timeout. fresh=True skips the completion cache;
+        validate decides what is cached.
+        """
+        return await self._cached(
+            "baidu", model, prompt, self._baidu_params(max_tokens, json_mode), fresh,
+            lambda: self._baidu_chat(prompt, model, max_tokens, json_mode), validate,
+        )
+
+    @staticmethod
+    def _baidu_params(max_tokens: int, json_mode: bool) -> Dict[str, Any]:
+        return {"max_tokens": max_tokens, "json": True} if json_mode else {"max_tokens": max_tokens}
+
+    @staticmethod
+    def _baidu_request(prompt: str, model: str, max_tokens: int, json_mode: bool) -> Dict[str, Any]:
+        request = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "extra_body": {"web_search": {"enable": False}},
+            "max_completion_tokens": max_tokens,
+        }
+        if json_mode:
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    async def _baidu_chat(self, prompt: str, model: str, max_tokens: int, json_mode: bool = False) -> str:
+        completion = await asyncio.wait_for(
+            self.baidu().chat.completions.create(
+                stream=False, **self._baidu_request(prompt, model, max_tokens, json_mode),
+            ),
+            timeout=self.timeout,
+        )
+        if not completion.choices:
+            return ""
+        msg = completion.choices[0].message
+        content = getattr(msg, "content", None) or ""
+        if not content and getattr(msg, "reasoning_content", None):
+            content = msg.reasoning_content
+        return content or ""
+
+    # ------------------------------------------------------------------
+    # Streaming
+    # ------------------------------------------------------------------
+
+    async def _stream_cached(
+        self, provider: str, model: str, prompt: str, params: Dict[str, Any],
+        fresh: bool, open_stream: Callable[[], Any],
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yield text deltas as they arrive. A cache hit is yielded as one chunk;
+        a completed stream is stored like a normal completion. The provider's
+        limiter slot and breaker cover the whole stream, and each chunk must
+        arrive within LLM_TIMEOUT.
+        """
+        cache = None if fresh else get_completion_cache()
+        if cache is not None:
+            hit = await self._cache_get(cache, provider, model, prompt, params, validate)
+            if hit is not None:
+                self.logger.debug(f"LLM cache hit ({provider}/{model}, stream)")
+                yield hit
+                return
+        parts = []
+        limiter = get_limiter(provider, LLM_INITIAL_CONCURRENCY, LLM_MAX_CONCURRENCY)
+        async with get_breaker(f"{provider}/{model}").guard():
+            async with limiter.slot():
+                stream = (await asyncio.wait_for(open_stream(), timeout=self.timeout)).__aiter__()
+                while True:
+                    try:
+                        delta = await asyncio.wait_for(stream.__anext__(), timeout=self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        if cache is not None:
+            await self._cache_put(cache, provider, model, prompt, "".join(parts), params, validate)
+
+    async def gemini_stream(
+        self, prompt: str, model: str = "gemini-2.0-flash", fresh: bool = False,
+        schema: Optional[Dict[str, Any]] = None, validate: Optional[Callable[[str], bool]] = None,
+    ) -> AsyncIterator[str]:
+        """Text deltas from Gemini's streaming API (JSON constrained to schema if given)."""
+        config = self._gemini_config(False, schema)
+
+        async def _open():
+            chunks = await self.gemini().models.generate_content_stream(
+                model=model, contents=prompt, config=config,
+            )
+
+            async def _texts():
+                async for chunk in chunks:
+                    yield chunk.text or ""
+            return _texts()
+
+        params = self._gemini_params(False, schema)
+        async for delta in self._stream_cached("gemini", model, prompt, params, fresh, _open, validate):
+            yield delta
+
+    async def baidu_stream(
+        self, prompt: str, model: str, max_tokens: int = 4096, fresh: bool = False,
+        json_mode: bool = False, validate: Optional[Callable[[str], bool]] = None,
+    ) -> AsyncIterator[str]:
+        """Answer-text deltas from Baidu's streaming chat API (reasoning deltas are skipped)."""
+        async def _open():
+            chunks = await self.baidu().chat.completions.create(
+                stream=True, **self._baidu_request(prompt, model, max_tokens, json_mode),
+            )
+
+            async def _texts():
+                async for chunk in chunks:
+                    if chunk.choices:
+                        yield getattr(chunk.choices[0].delta, "content", None) or ""
+            return _texts()
+
+        params = self._baidu_params(max_tokens, json_mode)
+        async for delta in self._stream_cached("baidu", model, prompt, params, fresh, _open, validate):
+            yield delta
+
+    async def aclose(self) -> None:
+        """Close pooled connections (FastAPI shutdown)."""
+        if self._baidu is not None:
+            try:
+                await self._baidu.close()
+            except Exception as e:
+                self.logger.debug(f"Baidu client close failed: {e}")
+            self._baidu = None
+        if self._gemini is not None:
+            try:
+                await self._gemini.aio.aclose()
+            except Exception as e:
+                self.logger.debug(f"Gemini client close failed: {e}")
+            self._gemini = None
+        self._loops.clear()
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway()
+    return _gateway
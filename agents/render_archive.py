@@ -0,0 +1,190 @@
+"""
+Archival tier for finished renders.
+
+Re-encodes completed H.264 renders to a compact CPU codec (SVT-AV1, or x265
+as fallback) at idle priority, so months of output fit on disk. Archives
+keep the original file name under ARCHIVE_DIR, which lets /video/{name}
+keep working after the H.264 original is removed — render names carry
+their generation id, so archives of different campaigns never collide.
+"""
+from __future__ import annotations
+
+import re
+import shutil
+import subprocess
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from .veo_journal import VEO_RESULTS_DIR
+
+from config.settings import (
+    FFMPEG_BIN, ASSETS_DIR, RENDER_DIR, ARCHIVE_DIR, SCRATCH_DIR,
+    ARCHIVE_CODEC, ARCHIVE_THREADS, ARCHIVE_AFTER_HOURS,
+)
+
+logger_archive = logger.bind(name="Archive")
+
+# Encoder args per codec, in preference order for each ARCHIVE_CODEC value
+_ENCODERS: Dict[str, List[str]] = {
+    "libsvtav1": ["-c:v", "libsvtav1", "-preset", "8", "-crf", "36"],
+    "libaom-av1": ["-c:v", "libaom-av1", "-cpu-used", "8", "-row-mt", "1", "-crf", "36", "-b:v", "0"],
+    "libx265": ["-c:v", "libx265", "-preset", "medium", "-crf", "26", "-tag:v", "hvc1",
+                "-x265-params", "log-level=error"],
+}
+_PREFERENCE = {
+    "av1": ["libsvtav1", "libaom-av1", "libx265"],
+    "hevc": ["libx265", "libsvtav1", "libaom-av1"],
+}
+
+# Per-render intermediates that are safe to drop once the render is archived
+INTERMEDIATE_PATTERNS = [
+    (RENDER_DIR, "raw_assembly*.mp4"),
+    (ASSETS_DIR, "clip_*.mp4"),
+    (ASSETS_DIR, "scene_*.mp4"),
+    (VEO_RESULTS_DIR, "*.mp4"),
+    (ASSETS_DIR, "stock_raw_*"),
+    (ASSETS_DIR, "tts_segments_*"),
+    (ASSETS_DIR, "voiceover_*"),
+    (ASSETS_DIR, "veo_audio_*"),
+    (ASSETS_DIR, "audio_concat_*.txt"),
+    (ASSETS_DIR, "concat.txt"),
+    (ASSETS_DIR, "visual_*.png"),
+]
+if SCRATCH_DIR:
+    # Everything on scratch is an intermediate: per-generation subdirectories
+    # left by interrupted renders, and files from before they existed
+    INTERMEDIATE_PATTERNS.append((Path(SCRATCH_DIR), "*"))
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+
+
+@lru_cache(maxsize=1)
+def pick_archive_encoder() -> Optional[str]:
+    """First encoder from the ARCHIVE_CODEC preference list that this FFmpeg build has."""
+    try:
+        result = subprocess.run(
+            [FFMPEG_BIN, "-hide_banner", "-encoders"],
+            capture_output=True, timeout=15, encoding="utf-8", errors="replace",
+        )
+    except Exception as e:
+        logger_archive.warning(f"Cannot list FFmpeg encoders: {e}")
+        return None
+    for name in _PREFERENCE.get(ARCHIVE_CODEC, _PREFERENCE["av1"]):
+        if re.search(rf"\s{re.escape(name)}\s", result.stdout):
+            return name
+    return None
+
+
+def _low_priority(cmd: List[str]) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    (cmd, subprocess kwargs) that run the encoder at idle CPU priority.
+    `nice` instead of a preexec_fn: this runs in a worker thread, where
+    preexec_fn isn't safe.
+    """
+    if sys.platform == "win32":
+        return cmd, {"creationflags": subprocess.IDLE_PRIORITY_CLASS}
+    nice = shutil.which("nice")
+    return ([nice, "-n", "19", *cmd] if nice else cmd), {}
+
+
+def _duration(path: Path) -> float:
+    result = subprocess.run(
+        [FFMPEG_BIN, "-hide_banner", "-i", str(path)],
+        capture_output=True, timeout=30, encoding="utf-8", errors="replace",
+    )
+    match = _DURATION_RE.search(result.stderr)
+    if not match:
+        return 0.0
+    h, m, s = match.groups()
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def archived_path(name: str) -> Path:
+    return ARCHIVE_DIR / Path(name).name
+
+
+def archive_render(src: Path) -> Optional[Dict[str, Any]]:
+    """
+    Blocking: transcode one render into ARCHIVE_DIR at idle priority, verify
+    it, then delete the H.264 original. Returns archive metadata or None.
+    """
+    encoder = pick_archive_encoder()
+    if encoder is None:
+        logger_archive.warning("No AV1/HEVC encoder in this FFmpeg build — archiving disabled")
+        return None
+    if not src.exists() or src.stat().st_size == 0:
+        return None
+
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    output = archived_path(src.name)
+    partial = output.with_suffix(".part.mp4")
+    cmd = [
+        FFMPEG_BIN, "-y", "-hide_banner",
+        "-i", str(src),
+        *_ENCODERS[encoder],
+        "-threads", str(ARCHIVE_THREADS),
+        "-pix_fmt", "yuv420p",
+        "-c:a", "copy",
+        "-movflags", "+faststart",
+        str(partial),
+    ]
+    started = time.time()
+    try:
+        cmd, kwargs = _low_priority(cmd)
+        result = subprocess.run(
+            cmd, capture_output=True, timeout=3600,
+            encoding="utf-8", errors="replace", **kwargs,
+        )
+    except Exception as e:
+        logger_archive.error(f"Archive encode error for {src.name}: {e}")
+        partial.unlink(missing_ok=True)
+        return None
+
+    src_duration = _duration(src)
+    if (
+        result.returncode != 0 or not partial.exists()
+        or abs(_duration(partial) - src_duration) > 0.5
+    ):
+        logger_archive.error(f"Archive of {src.name} failed: {result.stderr[-300:]}")
+        partial.unlink(missing_ok=True)
+        return None
+
+    partial.replace(output)
+    original_bytes = src.stat().st_size
+    archived_bytes = output.stat().st_size
+    src.unlink(missing_ok=True)
+    logger_archive.info(
+        f"Archived {src.name} with {encoder}: {original_bytes / 1024 / 1024:.1f} MB → "
+        f"{archived_bytes / 1024 / 1024:.1f} MB in {time.time() - started:.0f}s"
+    )
+    return {
+        "file": output.name,
+        "encoder": encoder,
+        "original_bytes": original_bytes,
+        "archived_bytes": archived_bytes,
+        "archived_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def purge_intermediates(older_than_hours: float = ARCHIVE_AFTER_HOURS) -> int:
+    """Delete render intermediates older than the archive age; returns files removed."""
+    cutoff = time.time() - older_than_hours * 3600
+    removed = 0
+    for folder, pattern in INTERMEDIATE_PATTERNS:
+        for f in folder.glob(pattern):
+            try:
+                if f.stat().st_mtime >= cutoff:
+                    continue
+                if f.is_dir():
+                    shutil.rmtree(f, ignore_errors=True)
+                else:
+                    f.unlink()
+                removed += 1
+            except OSError:
+                continue
+    return removed
@@ -0,0 +1,290 @@
+"""
+Near-duplicate script index.
+
+Topics like "morning routine hacks" and "morning productivity routine"
+each cost a full LLM call (and then a full render). Every LLM-written
+script is indexed here by its topic, next to generation_history.json;
+before calling an LLM, Beta looks for a past script on a similar topic in
+the same language and, above SCRIPT_REUSE_THRESHOLD, adapts that instead.
+
+Topics are embedded with EMBEDDING_MODEL through the local Ollama endpoint.
+When that service is down, hashed word/character n-gram vectors are used
+instead (always stored, so the index keeps working offline) with a
+stricter SCRIPT_REUSE_NGRAM_THRESHOLD, and an n-gram match must also use
+the same content words: surface overlap can't tell "lose weight fast" from
+"gain weight fast" the way an embedding can. Either way, the adapted script
+has to mention every content word of the new topic before Beta reuses it.
+Search is a NumPy cosine over the whole matrix — sub-millisecond for
+thousands of scripts.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from .circuit_breaker import CircuitOpenError, get_breaker
+
+from config.settings import (
+    WORKSPACE_DIR, EMBEDDING_MODEL, OLLAMA_BASE_URL,
+    SCRIPT_REUSE_THRESHOLD, SCRIPT_REUSE_NGRAM_THRESHOLD, SCRIPT_INDEX_MAX_ENTRIES,
+)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger_index = logger.bind(name="ScriptIndex")
+
+INDEX_FILE = WORKSPACE_DIR / "script_index.json"
+VECTORS_FILE = WORKSPACE_DIR / "script_index.npz"
+
+NGRAM_DIM = 2048
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an the and or of for to in on at with by from your my our how why what "
+    "is are be do you i it this that".split()
+)
+_EMBED_TIMEOUT = 5
+
+
+# ---------------------------------------------------------------------------
+# Vectors
+# ---------------------------------------------------------------------------
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(_WORD_RE.findall(topic.lower()))
+
+
+def content_words(text: str) -> frozenset:
+    return frozenset(w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS)
+
+
+def ngram_vector(text: str, dim: int = NGRAM_DIM) -> np.ndarray:
+    """
+    L2-normalized hashed bag of words, word bigrams and character
+    trigrams. crc32 keeps buckets stable across processes (hash() is salted).
+    """
+    words = _WORD_RE.findall(text.lower())
+    features: List[Tuple[str, float]] = [(f"w:{w}", 1.0) for w in words]
+    features += [(f"b:{a} {b}", 1.0) for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"#{w}#"
+        features += [(f"c:{padded[i:i + 3]}", 0.5) for i in range(len(padded) - 2)]
+    vec = np.zeros(dim, dtype=np.float32)
+    for feature, weight in features:
+        vec[zlib.crc32(feature.encode("utf-8")) % dim] += weight
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+async def embed(text: str) -> Optional[np.ndarray]:
+    """EMBEDDING_MODEL vector from Ollama, or None when the service isn't there."""
+    if aiohttp is None or not EMBEDDING_MODEL:
+        return None
+    try:
+        async with get_breaker("embeddings").guard():
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=_EMBED_TIMEOUT)) as session:
+                async with session.post(
+                    f"{OLLAMA_BASE_URL.rstrip('/')}/api/embed",
+                    json={"model": EMBEDDING_MODEL, "input": text},
+                ) as resp:
+                    resp.raise_for_status()
+                    data = await resp.json()
+    except CircuitOpenError:
+        return None
+    except Exception as e:
+        logger_index.debug(f"Embedding service unavailable ({e}) — using n-gram vectors")
+        return None
+    vectors = data.get("embeddings") or []
+    if not vectors or not vectors[0]:
+        return None
+    vec = np.asarray(vectors[0], dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else None
+
+
+# ---------------------------------------------------------------------------
+# Reuse
+# ---------------------------------------------------------------------------
+
+def adapt_columns(
+    columns: List[Dict[str, str]], old_topic: str, new_topic: str,
+) -> List[Dict[str, str]]:
+    """Copy of a past script with its topic phrase swapped for the new one."""
+    pattern = re.compile(re.escape(old_topic.strip()), re.IGNORECASE) if old_topic.strip() else None
+    adapted = []
+    for column in columns:
+        column = dict(column)
+        if pattern is not None and old_topic.strip().lower() != new_topic.strip().lower():
+            for key in ("visual_cue", "audio"):
+                column[key] = pattern.sub(lambda _: new_topic, column.get(key, ""))
+        adapted.append(column)
+    return adapted
+
+
+def covers_topic(columns: List[Dict[str, str]], topic: str) -> bool:
+    """Whether a (reused) script mentions every content word of the topic."""
+    text = " ".join(f"{c.get('visual_cue', '')} {c.get('audio', '')}" for c in columns)
+    return content_words(topic) <= content_words(text)
+
+
+class ScriptIndex:
+    """
+    Entries (topic, language, script) in INDEX_FILE, their vectors in
+    VECTORS_FILE: an n-gram matrix for every entry and an embedding matrix
+    whose rows are zero where no embedding was available.
+    """
+
+    def __init__(self, max_entries: int = SCRIPT_INDEX_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self.entries: List[Dict[str, Any]] = []
+        self.ngram = np.zeros((0, NGRAM_DIM), dtype=np.float32)
+        self.embeddings: Optional[np.ndarray] = None
+        self.embedding_model = EMBEDDING_MODEL
+        self._load()
+
+    def _load(self) -> None:
+        if not INDEX_FILE.exists() or not VECTORS_FILE.exists():
+            return
+        try:
+            with open(INDEX_FILE, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(VECTORS_FILE)
+            entries = meta.get("entries", [])
+            ngram = vectors["ngram"]
+            if len(entries) != len(ngram):
+                raise ValueError("entry/vector count mismatch")
+            self.entries, self.ngram = entries, ngram
+            # Vectors from another embedding model aren't comparable — drop them
+            if "embeddings" in vectors and meta.get("embedding_model") == EMBEDDING_MODEL:
+                self.embeddings = vectors["embeddings"]
+        except Exception as e:
+            logger_index.warning(f"Script index unreadable, starting fresh: {e}")
+
+    def _save(self) -> None:
+        WORKSPACE_DIR.mkdir(parents=True, exist_ok=True)
+        arrays = {"ngram": self.ngram}
+        if self.embeddings is not None:
+            arrays["embeddings"] = self.embeddings
+        tmp = VECTORS_FILE.with_suffix(".tmp.npz")
+        np.savez(tmp, **arrays)
+        tmp.replace(VECTORS_FILE)
+        with open(INDEX_FILE, "w", encoding="utf-8") as f:
+            json.dump(
+                {"embedding_model": self.embedding_model, "entries": self.entries},
+                f, ensure_ascii=False,
+            )
+
+    # ------------------------------------------------------------------
+
+    async def query(self, topic: str) -> Dict[str, Any]:
+        """Vectors for a topic; pass the result to nearest() and add()."""
+        return {
+            "topic": topic,
+            "ngram": ngram_vector(topic),
+            "embedding": await embed(topic),
+        }
+
+    def nearest(self, query: Dict[str, Any], language: str) -> Optional[Dict[str, Any]]:
+        """
+        Closest past script in the same language if it clears the threshold
+        for the vectors used (embeddings when both sides have one).
+        """
+        with self._lock:
+            if not self.entries:
+                return None
+            same_lang = np.array([e.get("language") == language for e in self.entries])
+            if not same_lang.any():
+                return None
+            q = query.get("embedding")
+            use_embedding = (
+                q is not None and self.embeddings is not None and self.embeddings.shape[1] == len(q)
+            )
+            if use_embedding:
+                mask = same_lang & (np.linalg.norm(self.embeddings, axis=1) > 0)
+                use_embedding = bool(mask.any())
+            if use_embedding:
+                scores, threshold, method = self.embeddings @ q, SCRIPT_REUSE_THRESHOLD, "embedding"
+            else:
+                mask = same_lang
+                scores, threshold, method = self.ngram @ query["ngram"], SCRIPT_REUSE_NGRAM_THRESHOLD, "ngram"
+            if method == "ngram":
+                # Near-identical spelling isn't enough without embeddings
+                words = content_words(query["topic"])
+                mask = mask & np.array([content_words(e["topic"]) == words for e in self.entries])
+            scores = np.where(mask, scores, -1.0)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < threshold:
+                return None
+            return {**self.entries[best], "similarity": round(similarity, 3), "method": method}
+
+    async def add(
+        self, query: Dict[str, Any], language: str, columns: List[Dict[str, str]], source: str,
+    ) -> None:
+        """Index an LLM-written script (replacing an earlier one for the same topic)."""
+        entry = {
+            "topic": query["topic"],
+            "language": language,
+            "script_source": source,
+            "script_columns": columns,
+            "created": time.time(),
+        }
+        await asyncio.to_thread(self._add, entry, query["ngram"], query.get("embedding"))
+
+    def _add(self, entry: Dict[str, Any], ngram: np.ndarray, embedding: Optional[np.ndarray]) -> None:
+        with self._lock:
+            key = (normalize_topic(entry["topic"]), entry["language"])
+            keep = [
+                i for i, e in enumerate(self.entries)
+                if (normalize_topic(e["topic"]), e.get("language")) != key
+            ][-(self.max_entries - 1):] if self.max_entries > 1 else []
+            self.entries = [self.entries[i] for i in keep] + [entry]
+            self.ngram = np.vstack([self.ngram[keep], ngram[None, :]])
+
+            if self.embeddings is not None:
+                self.embeddings = self.embeddings[keep]
+                if embedding is not None and self.embeddings.shape[1] != len(embedding):
+                    self.embeddings = None  # model output size changed
+            if embedding is not None and self.embeddings is None:
+                self.embeddings = np.zeros((len(keep), len(embedding)), dtype=np.float32)
+            if self.embeddings is not None:
+                row = embedding if embedding is not None else np.zeros(self.embeddings.shape[1], dtype=np.float32)
+                self.embeddings = np.vstack([self.embeddings, row[None, :]])
+            try:
+                self._save()
+            except OSError as e:
+                logger_index.warning(f"Could not save script index: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            embedded = 0
+            if self.embeddings is not None:
+                embedded = int((np.linalg.norm(self.embeddings, axis=1) > 0).sum())
+            return {
+                "entries": len(self.entries),
+                "embedded_entries": embedded,
+                "embedding_model": self.embedding_model,
+                "threshold": SCRIPT_REUSE_THRESHOLD,
+                "ngram_threshold": SCRIPT_REUSE_NGRAM_THRESHOLD,
+            }
+
+
+_index: Optional[ScriptIndex] = None
+
+
+def get_script_index() -> ScriptIndex:
+    global _index
+    if _index is None:
+        _index = ScriptIndex()
+    return _index
@@ -0,0 +1,276 @@
+"""
+Structured (JSON) script output.
+
+Free-text scripts are recovered heuristically by Beta's line parser; when
+that fails, or the result is generic, the whole LLM call is wasted. In
+structured mode the providers are asked for JSON matching SCENE_SCHEMA
+(Gemini enforces it via response_json_schema, Baidu via json_object mode),
+the result is validated here, and a failing answer gets one short repair
+call that lists exactly what was wrong. A/B hook variations use the same
+scene schema, N at a time, in a single request (variations_schema).
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+SCENE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "scenes": {
+            "type": "array",
+            "minItems": 3,
+            "maxItems": 12,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "timecode": {"type": "string", "description": 'Scene span, e.g. "0-2s"'},
+                    "visual_cue": {"type": "string", "description": "What the viewer sees"},
+                    "audio": {"type": "string", "description": "Spoken narration"},
+                },
+                "required": ["timecode", "visual_cue", "audio"],
+            },
+        },
+    },
+    "required": ["scenes"],
+}
+
+
+def variations_schema(count: int) -> Dict[str, Any]:
+    """Schema for `count` scripts returned by one request."""
+    return {
+        "type": "object",
+        "properties": {
+            "variations": {
+                "type": "array",
+                "minItems": count,
+                "maxItems": count,
+                "items": SCENE_SCHEMA,
+            },
+        },
+        "required": ["variations"],
+    }
+
+
+MIN_SCENES = SCENE_SCHEMA["properties"]["scenes"]["minItems"]
+MAX_SCENES = SCENE_SCHEMA["properties"]["scenes"]["maxItems"]
+
+_TIMECODE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*s?\s*[-–]\s*(\d+(?:\.\d+)?)\s*s?\s*$")
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+
+_EXAMPLE = (
+    '{"scenes": [\n'
+    '  {"timecode": "0-2s", "visual_cue": "Jump-cut to shocked face", "audio": "Wait... this is actually genius"},\n'
+    '  {"timecode": "2-5s", "visual_cue": "B-roll footage", "audio": "Most people don\'t know this trick"}\n'
+    "]}"
+)
+
+
+def json_format_block(language: str = "en") -> str:
+    """Output-format section for script prompts in structured mode."""
+    if language == "ar":
+        return (
+            "صيغة الإخراج: أعد JSON فقط بدون أي نص آخر، بهذا الشكل بالضبط "
+            "(المفاتيح بالإنجليزية، والقيم بالعربية ما عدا timecode):\n" + _EXAMPLE
+        )
+    return (
+        "OUTPUT FORMAT - Respond with JSON only, no prose or markdown, exactly this shape:\n"
+        + _EXAMPLE
+        + f"\nUse {MIN_SCENES}-{MAX_SCENES} scenes with consecutive timecodes."
+    )
+
+
+def variations_format_block(count: int) -> str:
+    """Output-format section for the batched variations prompt."""
+    return (
+        "OUTPUT FORMAT - Respond with JSON only, no prose or markdown, exactly this shape:\n"
+        '{"variations": [\n'
+        '  {"scenes": [{"timecode": "0-2s", "visual_cue": "...", "audio": "..."}, ...]},\n'
+        "  ...\n"
+        "]}\n"
+        f"with exactly {count} variations, in the hook order above, of "
+        f"{MIN_SCENES}-{MAX_SCENES} scenes each with consecutive timecodes."
+    )
+
+
+def extract_json(text: str) -> Optional[Any]:
+    """The JSON value in a response, tolerating code fences and surrounding prose."""
+    if not text:
+        return None
+    raw = text.strip()
+    fenced = _FENCE_RE.search(raw)
+    if fenced:
+        raw = fenced.group(1).strip()
+    try:
+        return json.loads(raw)
+    except ValueError:
+        pass
+    # Outermost object/array embedded in prose
+    for opener, closer in (("{", "}"), ("[", "]")):
+        start, end = raw.find(opener), raw.rfind(closer)
+        if 0 <= start < end:
+            try:
+                return json.loads(raw[start:end + 1])
+            except ValueError:
+                continue
+    return None
+
+
+def _parse_timecode(value: str) -> Optional[Tuple[float, float]]:
+    match = _TIMECODE_RE.match(value or "")
+    if not match:
+        return None
+    return float(match.group(1)), float(match.group(2))
+
+
+def _fmt(seconds: float) -> str:
+    return f"{seconds:g}"
+
+
+def validate_scenes(
+    data: Any, duration: Optional[float] = None,
+) -> Tuple[List[Dict[str, str]], List[str]]:
+    """
+    (columns, errors) for a decoded response. Columns are normalized to
+    Beta's {timecode, visual_cue, audio} rows ("0-2s" timecodes, no
+    wrapping quotes); errors are short, model-readable descriptions of
+    every schema or timing problem, empty when the script is valid.
+    """
+    if isinstance(data, list):
+        data = {"scenes": data}
+    if not isinstance(data, dict) or not isinstance(data.get("scenes"), list):
+        return [], ['Top level must be an object with a "scenes" array.']
+
+    scenes = data["scenes"]
+    errors: List[str] = []
+    columns: List[Dict[str, str]] = []
+    prev_end = 0.0
+    for i, scene in enumerate(scenes, 1):
+        if not isinstance(scene, dict):
+            errors.append(f"Scene {i} must be an object.")
+            continue
+        fields = {k: str(scene.get(k) or "").strip().strip('"\'') for k in ("timecode", "visual_cue", "audio")}
+        missing = [k for k, v in fields.items() if not v]
+        if missing:
+            errors.append(f"Scene {i} is missing {', '.join(missing)}.")
+            continue
+        span = _parse_timecode(fields["timecode"])
+        if span is None:
+            errors.append(f'Scene {i} timecode "{fields["timecode"]}" must look like "0-2s".')
+            continue
+        start, end = span
+        if end <= start:
+            errors.append(f'Scene {i} timecode "{fields["timecode"]}" ends before it starts.')
+            continue
+        if start < prev_end - 0.5:
+            errors.append(f"Scene {i} starts at {_fmt(start)}s, before scene {i - 1} ends.")
+        prev_end = end
+        columns.append({
+            "timecode": f"{_fmt(start)}-{_fmt(end)}s",
+            "visual_cue": fields["visual_cue"],
+            "audio": fields["audio"],
+        })
+
+    if len(scenes) < MIN_SCENES:
+        errors.append(f"Need at least {MIN_SCENES} scenes, got {len(scenes)}.")
+    elif len(scenes) > MAX_SCENES:
+        errors.append(f"Use at most {MAX_SCENES} scenes, got {len(scenes)}.")
+    if duration and columns and prev_end > duration * 1.25:
+        errors.append(f"Script runs {_fmt(prev_end)}s; keep it near {_fmt(duration)}s.")
+    return columns, errors
+
+
+def validate_variations(
+    data: Any, count: int, duration: Optional[float] = None,
+) -> Tuple[Dict[int, List[Dict[str, str]]], List[str]]:
+    """
+    (scripts, errors) for a batched response: the valid scripts keyed by
+    their 0-based position (invalid ones are skipped, extras beyond `count`
+    dropped) and the problems found, for logging.
+    """
+    if isinstance(data, dict):
+        data = data.get("variations")
+    if not isinstance(data, list):
+        return {}, ['Top level must be an object with a "variations" array.']
+    scripts: Dict[int, List[Dict[str, str]]] = {}
+    errors: List[str] = []
+    for i, item in enumerate(data[:count]):
+        columns, item_errors = validate_scenes(item, duration)
+        if item_errors:
+            errors.extend(f"Variation {i + 1}: {e}" for e in item_errors)
+        else:
+            scripts[i] = columns
+    if len(data) < count:
+        errors.append(f"Expected {count} variations, got {len(data)}.")
+    return scripts, errors
+
+
+def repair_prompt(response: str, errors: List[str], language: str = "en") -> str:
+    """Short follow-up asking the model to fix only the listed problems."""
+    problems = "\n".join(f"- {e}" for e in errors)
+    keep = "Keep the narration in Arabic. " if language == "ar" else ""
+    return (
+        "Your previous answer was a short-video script that failed validation.\n"
+        f"Problems:\n{problems}\n\n"
+        f"Previous answer:\n{response.strip()[:4000]}\n\n"
+        f"Fix only these problems and keep everything else. {keep}"
+        'Respond with JSON only: {"scenes": [{"timecode": "0-2s", "visual_cue": "...", "audio": "..."}]}'
+    )
+
+
+class JsonSceneStreamParser:
+    """
+    Incremental counterpart of validate_scenes for streamed JSON: yields each
+    scene object as soon as its closing brace arrives. Same interface as
+    Beta's line parser (feed/close/columns).
+    """
+
+    def __init__(self):
+        self.columns: List[Dict[str, str]] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._obj: List[str] = []
+
+    def feed(self, delta: str) -> bool:
+        before = len(self.columns)
+        for ch in delta:
+            if self._depth >= 2:
+                self._obj.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 2 and ch == "{":
+                    # A bare array of scenes: objects start at depth 2
+                    self._obj = [ch]
+                elif self._depth == 3 and ch == "{":
+                    self._obj = [ch]
+            elif ch in "}]":
+                if ch == "}" and self._depth in (2, 3) and self._obj:
+                    self._take("".join(self._obj))
+                    self._obj = []
+                self._depth = max(self._depth - 1, 0)
+        return len(self.columns) > before
+
+    def close(self) -> bool:
+        return False
+
+    def _take(self, text: str) -> None:
+        try:
+            scene = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(scene, dict) or "timecode" not in scene:
+            return  # the wrapping {"scenes": ...} object, or something else
+        columns, _ = validate_scenes({"scenes": [scene]})
+        self.columns.extend(columns)
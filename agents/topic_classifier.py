@@ -0,0 +1,327 @@
+"""
+Shared topic / domain classifier.
+
+One keyword table (English + Arabic) for every agent, compiled once into an
+Aho-Corasick automaton so a topic is classified in a single pass over its
+characters instead of one substring scan per keyword. Results are memoised,
+which makes repeated topics in bulk runs free.
+
+    detect_domain(topic)   -> visual domain used by the Media Forge
+                              ("math", "science", ..., or "general")
+    classify_topic(topic)  -> template category used by the Script Architect
+                              ("productivity", "fitness", ..., or "default")
+
+Benchmark against the old linear scans:
+    python -m agents.topic_classifier --bench
+"""
+from __future__ import annotations
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# English keywords match at the start of a word, so inflections still hit
+# ("cook" → "cooking") but "cell" no longer hits "excellent"; ones this
+# short must be the whole word ("pi" ≠ "pizza", "ai" ≠ "aim"). Arabic
+# keywords match anywhere, since prefixes like ال / و / ب attach to words.
+WHOLE_WORD_MAX_LEN = 3
+
+_WORD_RE = re.compile(r"\w+")
+_TOKEN_CACHE_SIZE = 50_000
+
+# ---------------------------------------------------------------------------
+# Keyword tables
+# ---------------------------------------------------------------------------
+
+DOMAIN_KEYWORDS: Dict[str, List[str]] = {
+    "math": ["math", "circle", "triangle", "geometry", "algebra", "calculus",
+             "equation", "formula", "circumference", "radius", "diameter",
+             "angle", "fraction", "number", "pi", "area", "volume",
+             "arithmetic", "percentage", "quadratic", "polynomial"],
+    "science": ["physics", "chemistry", "biology", "atom", "molecule",
+                "experiment", "lab", "gravity", "energy", "cell",
+                "dna", "evolution", "quantum", "electron", "force", "science"],
+    "education": ["study", "learn", "school", "class", "student", "teacher",
+                  "exam", "homework", "lesson", "tutorial", "course"],
+    "technology": ["code", "programming", "software", "computer", "app",
+                   "ai", "artificial", "machine", "robot", "digital",
+                   "internet", "data", "algorithm", "tech", "cyber"],
+    "fitness": ["gym", "exercise", "workout", "muscle", "weight",
+                "running", "yoga", "health", "training", "body"],
+    "cooking": ["recipe", "food", "cook", "meal", "kitchen",
+                "chef", "ingredient", "bake", "grill", "dish"],
+    "finance": ["money", "invest", "stock", "bank", "budget",
+                "finance", "crypto", "trading", "wealth", "save"],
+    "travel": ["travel", "trip", "flight", "destination", "explore",
+               "adventure", "tourist", "vacation", "city", "beach"],
+    "music": ["music", "guitar", "piano", "sing", "song", "beat",
+              "instrument", "melody", "concert", "band"],
+    "art": ["paint", "draw", "design", "art", "sketch", "creative",
+            "illustration", "sculpture", "canvas", "color"],
+    "psychology": ["mind", "brain", "emotion", "therapy", "mental",
+                   "anxiety", "habit", "motivation", "behavior", "cognitive"],
+    "philosophy": ["philosophy", "stoic", "existential", "ethics",
+                   "wisdom", "meaning", "moral", "socrates", "plato"],
+}
+
+ARABIC_DOMAIN_KEYWORDS: Dict[str, List[str]] = {
+    "math": ["رياضيات", "دائرة", "هندسة", "معادلة", "عدد", "حساب"],
+    "philosophy": ["فلسفة", "حكمة", "وجود", "أخلاق", "سقراط", "أفلاطون"],
+    "education": ["تعليم", "دراسة", "مدرسة", "طالب", "معلم", "درس"],
+    "science": ["علم", "فيزياء", "كيمياء", "بيولوجيا", "تجربة"],
+    "technology": ["تقنية", "ذكاء", "اصطناعي", "برمجة", "كمبيوتر"],
+}
+
+# Script template categories, checked tier by tier (first tier with a hit
+# wins; inside a tier the first category in table order wins).
+CATEGORY_TIERS: List[Dict[str, List[str]]] = [
+    {"education": ARABIC_DOMAIN_KEYWORDS["math"] + ARABIC_DOMAIN_KEYWORDS["science"]
+                  + ARABIC_DOMAIN_KEYWORDS["education"],
+     "philosophy": ARABIC_DOMAIN_KEYWORDS["philosophy"],
+     "ai": ARABIC_DOMAIN_KEYWORDS["technology"]},
+    {"education": DOMAIN_KEYWORDS["math"] + DOMAIN_KEYWORDS["science"]},
+    {cat: [cat] for cat in (
+        "productivity", "fitness", "money", "cooking", "travel", "ai",
+        "education", "philosophy",
+    )},
+    {
+        "productivity": ["productive", "habit", "routine", "morning", "study", "student", "work", "focus"],
+        "fitness": ["gym", "exercise", "workout", "muscle", "weight", "body", "health", "wellness"],
+        "money": ["finance", "invest", "saving", "budget", "hustle", "income", "earn", "rich"],
+        "cooking": ["recipe", "food", "cook", "meal", "kitchen", "eat", "diet", "nutrition"],
+        "travel": ["trip", "flight", "backpack", "adventure", "destination", "vacation", "explore"],
+        "ai": ["artificial", "machine", "learning", "chatgpt", "automation", "tools", "tech"],
+        "philosophy": ["stoic", "existential", "ethics", "philosophy", "plato", "socrates"],
+    },
+]
+
+
+# ---------------------------------------------------------------------------
+# Matcher
+# ---------------------------------------------------------------------------
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over single-word (keyword, label) pairs,
+    flattened into a DFA (every state has a direct transition for every
+    alphabet character) so scanning is one dict lookup per character.
+    """
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[Tuple[str, str]]] = [[]]
+        for keyword, label in pairs:
+            keyword = keyword.lower()
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            if (keyword, label) not in out[state]:
+                out[state].append((keyword, label))
+
+        alphabet = {ch for edges in goto for ch in edges}
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict() for _ in goto]
+        delta[0] = {ch: goto[0].get(ch, 0) for ch in alphabet}
+        queue = deque(goto[0].values())
+        # Breadth-first: a state's fail target is always resolved before it
+        while queue:
+            state = queue.popleft()
+            out[state] = out[state] + out[fail[state]]
+            row = dict(delta[fail[state]])
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]][ch] if state else 0
+                row[ch] = nxt
+                queue.append(nxt)
+            delta[state] = row
+
+        self._delta = delta
+        self._out = [
+            [(kw, label, len(kw), _anchoring(kw)) for kw, label in o] for o in out
+        ]
+        self._token_hits: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+
+    def _scan(self, token: str) -> Tuple[Tuple[str, str], ...]:
+        delta, outputs = self._delta, self._out
+        hits = []
+        state = 0
+        size = len(token)
+        for end, ch in enumerate(token, 1):
+            state = delta[state].get(ch, 0)
+            for kw, label, length, anchor in outputs[state]:
+                if anchor == _ANYWHERE or (
+                    length == end and (anchor == _PREFIX or length == size)
+                ):
+                    hits.append((kw, label))
+        return tuple(hits)
+
+    def matches(self, text: str) -> List[Tuple[str, str]]:
+        """
+        (keyword, label) for every occurrence in text (lower-cased by caller).
+        Keywords are single words, so the automaton runs per word token and
+        each distinct token is scanned only once per process.
+        """
+        cache = self._token_hits
+        hits: List[Tuple[str, str]] = []
+        for token in _WORD_RE.findall(text):
+            found = cache.get(token)
+            if found is None:
+                if len(cache) >= _TOKEN_CACHE_SIZE:
+                    cache.clear()
+                found = cache[token] = self._scan(token)
+            hits.extend(found)
+        return hits
+
+
+_ANYWHERE, _PREFIX, _WHOLE = 0, 1, 2
+
+
+def _anchoring(keyword: str) -> int:
+    if not keyword.isascii():
+        return _ANYWHERE
+    return _WHOLE if len(keyword) <= WHOLE_WORD_MAX_LEN else _PREFIX
+
+
+def _compile(table: Dict[str, Sequence[str]]) -> KeywordAutomaton:
+    return KeywordAutomaton((kw, label) for label, kws in table.items() for kw in kws)
+
+
+class TopicClassifier:
+    """
+    Tiered classifier. Each tier is a label → keywords table; the first tier
+    with any hit decides. Within a tier, "max" picks the label with the most
+    distinct keywords found (ties: whichever appears first in the text) and
+    "first" the earliest label in table order.
+    """
+
+    def __init__(
+        self, tiers: Sequence[Dict[str, Sequence[str]]], default: str, pick: str = "max",
+    ):
+        self.default = default
+        self.pick = pick
+        self._tiers = [(list(t), _compile(t)) for t in tiers]
+
+    def scores(self, text: str) -> List[Dict[str, int]]:
+        """Distinct keyword hits per label, one dict per tier."""
+        text = text.lower()
+        result = []
+        for _, automaton in self._tiers:
+            found: Dict[str, set] = {}
+            for kw, label in automaton.matches(text):
+                found.setdefault(label, set()).add(kw)
+            result.append({label: len(kws) for label, kws in found.items()})
+        return result
+
+    def classify(self, text: str) -> str:
+        text = text.lower().strip()
+        for order, automaton in self._tiers:
+            found: Dict[str, set] = {}
+            for kw, label in automaton.matches(text):
+                found.setdefault(label, set()).add(kw)
+            if not found:
+                continue
+            if self.pick == "first":
+                return next(label for label in order if label in found)
+            # found is in order of first appearance, so ties go to the earlier label
+            return max(found, key=lambda label: len(found[label]))
+        return self.default
+
+
+_domain_classifier = TopicClassifier(
+    [ARABIC_DOMAIN_KEYWORDS, DOMAIN_KEYWORDS], default="general", pick="max",
+)
+_category_classifier = TopicClassifier(CATEGORY_TIERS, default="default", pick="first")
+
+
+@lru_cache(maxsize=4096)
+def detect_domain(topic: str) -> str:
+    """Visual domain for stock / image queries ("general" when nothing matches)."""
+    return _domain_classifier.classify(topic)
+
+
+@lru_cache(maxsize=4096)
+def classify_topic(topic: str) -> str:
+    """Script template category ("default" when nothing matches)."""
+    return _category_classifier.classify(topic)
+
+
+# ---------------------------------------------------------------------------
+# Microbenchmark
+# ---------------------------------------------------------------------------
+
+def _linear_detect_domain(topic: str) -> str:
+    """The previous per-keyword substring scan, kept as the benchmark baseline."""
+    topic_lower = topic.lower().strip()
+    for domain, ar_keywords in ARABIC_DOMAIN_KEYWORDS.items():
+        if any(kw in topic for kw in ar_keywords):
+            return domain
+    scores: Dict[str, int] = {}
+    for domain, keywords in DOMAIN_KEYWORDS.items():
+        score = sum(1 for kw in keywords if kw in topic_lower)
+        if score > 0:
+            scores[domain] = score
+    return max(scores, key=scores.get) if scores else "general"
+
+
+_BENCH_TOPICS = [
+    "How to calculate the area of a circle",
+    "Morning routine for productive students",
+    "Stoic philosophy lessons from Marcus Aurelius",
+    "Best budget travel destinations in Europe",
+    "Machine learning explained for beginners",
+    "5 minute high protein meal prep recipes",
+    "Why quantum physics breaks your brain",
+    "شرح معادلة الدرجة الثانية في الرياضيات",
+    "ما هي الفلسفة الرواقية",
+    "Guitar chords every beginner should know",
+]
+
+
+def run_benchmark(rounds: int = 2000, unique: Optional[int] = None) -> Dict[str, float]:
+    """
+    Time µs per classification: old linear scan, compiled automaton
+    (uncached) and the memoised entry point on a repeating bulk workload.
+    """
+    import time
+
+    topics = [f"{t} #{i}" for i in range(unique or 1) for t in _BENCH_TOPICS]
+    workload = (topics * (rounds // len(topics) + 1))[:rounds]
+
+    def _time(fn) -> float:
+        started = time.perf_counter()
+        for t in workload:
+            fn(t)
+        return (time.perf_counter() - started) / len(workload) * 1e6
+
+    detect_domain.cache_clear()
+    return {
+        "linear_us": round(_time(_linear_detect_domain), 2),
+        "automaton_us": round(_time(_domain_classifier.classify), 2),
+        "cached_us": round(_time(detect_domain), 2),
+        "agreement": round(
+            sum(_linear_detect_domain(t) == _domain_classifier.classify(t) for t in topics)
+            / len(topics), 3,
+        ),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Topic classifier utilities")
+    parser.add_argument("topic", nargs="*", help="Topic(s) to classify")
+    parser.add_argument("--bench", action="store_true", help="Run the microbenchmark")
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--unique", type=int, default=50, help="Distinct topic variants")
+    args = parser.parse_args()
+
+    for t in args.topic:
+        print(f"{t!r}: domain={detect_domain(t)} category={classify_topic(t)}")
+    if args.bench:
+        print(run_benchmark(args.rounds, args.unique))
@@ -0,0 +1,168 @@
+"""
+Durable journal of Veo operations.
+
+Every started operation is written to disk with its generation id, scene
+index and prompt hash. This lets a restarted process:
+  - resume polling operations that were in flight, and download their results,
+  - reuse a finished (already paid for) result when the same scene of the
+    same generation is requested again, instead of starting a new operation.
+
+Operations that time out while polling are marked failed; ones still
+"running" after _RESUME_SECONDS (Veo keeps results for two days) are marked
+expired instead of being polled again at every startup. Pollers of the
+same operation take its lock, so a startup resume and a re-run never
+download the same result at once.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from config.settings import WORKSPACE_DIR
+
+logger_journal = logger.bind(name="VeoJournal")
+
+JOURNAL_FILE = WORKSPACE_DIR / "veo_journal.json"
+VEO_RESULTS_DIR = WORKSPACE_DIR / "veo_results"
+
+# Operations older than this are dropped from the journal on load
+_RETENTION_SECONDS = 7 * 86400
+# Running operations older than this can't be resumed any more
+_RESUME_SECONDS = 2 * 86400
+
+
+def prompt_hash(*parts: Any) -> str:
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class VeoJournal:
+    """Thread-safe (Veo runs in worker threads) JSON journal keyed by operation name."""
+
+    def __init__(self, path: Path = JOURNAL_FILE, results_dir: Path = VEO_RESULTS_DIR):
+        self.path = path
+        self.results_dir = results_dir
+        self._lock = threading.Lock()
+        self._op_locks: Dict[str, threading.Lock] = {}
+        self._ops: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        ops = {k: v for k, v in data.items() if v.get("started_ts", 0) >= now - _RETENTION_SECONDS}
+        for entry in ops.values():
+            if entry["status"] == "running" and entry.get("started_ts", 0) < now - _RESUME_SECONDS:
+                entry["status"] = "expired"
+        return ops
+
+    def _flush(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps(self._ops, indent=2), encoding="utf-8")
+            tmp.replace(self.path)
+        except OSError as e:
+            logger_journal.warning(f"Could not write Veo journal: {e}")
+
+    def result_path(self, generation_id: str, scene_idx: int, p_hash: str) -> Path:
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        safe_gen = "".join(c for c in generation_id if c.isalnum() or c in "-_")[:40]
+        return self.results_dir / f"{safe_gen}_{scene_idx:03d}_{p_hash[:12]}.mp4"
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def record_started(
+        self, operation_name: str, generation_id: str, scene_idx: int, p_hash: str,
+    ) -> None:
+        with self._lock:
+            self._ops[operation_name] = {
+                "generation_id": generation_id,
+                "scene_idx": scene_idx,
+                "prompt_hash": p_hash,
+                "status": "running",
+                "started_at": datetime.now().isoformat(),
+                "started_ts": time.time(),
+                "result_path": "",
+            }
+            self._flush()
+
+    def record_finished(self, operation_name: str, result: Path) -> None:
+        with self._lock:
+            entry = self._ops.get(operation_name)
+            if entry is not None:
+                entry.update(status="done", result_path=str(result))
+                self._flush()
+
+    def record_failed(self, operation_name: str, error: str) -> None:
+        with self._lock:
+            entry = self._ops.get(operation_name)
+            if entry is not None:
+                entry.update(status="failed", error=error[:300])
+                self._flush()
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def _matching(self, generation_id: str, scene_idx: int, p_hash: str) -> List[tuple]:
+        return [
+            (name, e) for name, e in self._ops.items()
+            if e["generation_id"] == generation_id
+            and e["scene_idx"] == scene_idx
+            and e["prompt_hash"] == p_hash
+        ]
+
+    def find_result(self, generation_id: str, scene_idx: int, p_hash: str) -> Optional[Path]:
+        """A finished result for this exact scene, if its file still exists."""
+        with self._lock:
+            for _, entry in self._matching(generation_id, scene_idx, p_hash):
+                path = Path(entry.get("result_path") or "")
+                if entry["status"] == "done" and path.is_file() and path.stat().st_size > 1000:
+                    return path
+        return None
+
+    def result_of(self, operation_name: str) -> Optional[Path]:
+        """The saved result of a finished operation, if its file still exists."""
+        with self._lock:
+            entry = self._ops.get(operation_name) or {}
+            path = Path(entry.get("result_path") or "")
+            if entry.get("status") == "done" and path.is_file() and path.stat().st_size > 1000:
+                return path
+        return None
+
+    def operation_lock(self, operation_name: str) -> threading.Lock:
+        """Held while polling/downloading an operation, so only one thread does it."""
+        with self._lock:
+            return self._op_locks.setdefault(operation_name, threading.Lock())
+
+    def find_inflight(self, generation_id: str, scene_idx: int, p_hash: str) -> Optional[str]:
+        """Name of a still-running operation for this exact scene, if any."""
+        with self._lock:
+            for name, entry in self._matching(generation_id, scene_idx, p_hash):
+                if entry["status"] == "running":
+                    return name
+        return None
+
+    def pending(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._ops.items() if v["status"] == "running"}
+
+
+_journal: Optional[VeoJournal] = None
+
+
+def get_veo_journal() -> VeoJournal:
+    global _journal
+    if _journal is None:
+        _journal = VeoJournal()
+    return _journal
@@ -0,0 +1,225 @@
+"""
+Fair, quota-aware scheduler for Veo generations.
+
+Replaces the process-wide Veo semaphore. Each generation gets its own flow.
+Requests are dispatched by weighted fair queuing: the earliest virtual
+finish tag goes first, so one large campaign cannot starve the others.
+Dispatch also respects the per-key request rate (VEO_RPM), the daily quota
+(VEO_DAILY_QUOTA, persisted across restarts) and VEO_MAX_CONCURRENCY
+in-flight operations — adaptively: the AIMD limiter halves the usable
+concurrency and pauses dispatch when Veo throttles, and grows it back on
+success.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from loguru import logger
+
+from config.settings import (
+    WORKSPACE_DIR, VEO_MAX_CONCURRENCY, VEO_RPM, VEO_DAILY_QUOTA,
+)
+from .adaptive_limiter import get_limiter
+
+logger_sched = logger.bind(name="VeoScheduler")
+
+QUOTA_FILE = WORKSPACE_DIR / "veo_quota.json"
+
+
+class VeoQuotaExceeded(RuntimeError):
+    """Raised when the daily Veo quota is used up."""
+
+
+class _Ticket:
+    __slots__ = ("generation_id", "finish", "seq")
+
+    def __init__(self, generation_id: str, finish: float, seq: int):
+        self.generation_id = generation_id
+        self.finish = finish
+        self.seq = seq
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+
+class VeoScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = VEO_MAX_CONCURRENCY,
+        rpm: int = VEO_RPM,
+        daily_quota: int = VEO_DAILY_QUOTA,
+        quota_file: Path = QUOTA_FILE,
+    ):
+        self.logger = logger_sched
+        self.max_concurrency = max(1, max_concurrency)
+        self.limiter = get_limiter("veo", self.max_concurrency, self.max_concurrency)
+        self.rpm = rpm
+        self.daily_quota = daily_quota
+        self.quota_file = quota_file
+
+        self._heap: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._weights: Dict[str, float] = {}
+        self._running: Dict[str, int] = {}
+        self._starts: Deque[float] = deque()
+        self._cond = asyncio.Condition()
+        self._quota = self._load_quota()
+
+    # ------------------------------------------------------------------
+    # Daily quota (persisted so restarts don't reset the count)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _load_quota(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.quota_file.read_text(encoding="utf-8"))
+            if data.get("date") == self._today():
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"date": self._today(), "used": 0}
+
+    def _consume_quota(self) -> None:
+        if self._quota["date"] != self._today():
+            self._quota = {"date": self._today(), "used": 0}
+        self._quota["used"] += 1
+        try:
+            self.quota_file.write_text(json.dumps(self._quota), encoding="utf-8")
+        except OSError as e:
+            self.logger.warning(f"Could not persist Veo quota: {e}")
+
+    def quota_remaining(self) -> Optional[int]:
+        if self.daily_quota <= 0:
+            return None
+        used = self._quota["used"] if self._quota["date"] == self._today() else 0
+        return max(self.daily_quota - used, 0)
+
+    # ------------------------------------------------------------------
+    # Weighted fair queuing
+    # ------------------------------------------------------------------
+
+    def set_weight(self, generation_id: str, weight: float) -> None:
+        """Relative share of Veo throughput for a generation (default 1.0)."""
+        self._weights[generation_id] = max(weight, 0.01)
+
+    def _enqueue(self, generation_id: str) -> _Ticket:
+        weight = self._weights.get(generation_id, 1.0)
+        start = max(self._virtual_time, self._last_finish.get(generation_id, 0.0))
+        finish = start + 1.0 / weight
+        self._last_finish[generation_id] = finish
+        ticket = _Ticket(generation_id, finish, next(self._seq))
+        heapq.heappush(self._heap, ticket)
+        return ticket
+
+    def _rate_wait(self) -> float:
+        """Seconds until another request fits in the per-minute window (0 = now)."""
+        if self.rpm <= 0:
+            return 0.0
+        now = time.monotonic()
+        while self._starts and now - self._starts[0] >= 60:
+            self._starts.popleft()
+        if len(self._starts) < self.rpm:
+            return 0.0
+        return 60 - (now - self._starts[0])
+
+    async def _acquire(self, ticket: _Ticket) -> None:
+        async with self._cond:
+            try:
+                while True:
+                    at_head = self._heap and self._heap[0] is ticket
+                    capacity = min(self.max_concurrency, self.limiter.capacity())
+                    if at_head and sum(self._running.values()) < capacity:
+                        remaining = self.quota_remaining()
+                        if remaining == 0:
+                            raise VeoQuotaExceeded(
+                                f"Daily Veo quota of {self.daily_quota} generations used up"
+                            )
+                        wait = max(self._rate_wait(), self.limiter.blocked_for())
+                        if wait <= 0:
+                            heapq.heappop(self._heap)
+                            self._virtual_time = max(self._virtual_time, ticket.finish)
+                            gen = ticket.generation_id
+                            self._running[gen] = self._running.get(gen, 0) + 1
+                            self._starts.append(time.monotonic())
+                            self._consume_quota()
+                            self._cond.notify_all()
+                            return
+                        try:
+                            await asyncio.wait_for(self._cond.wait(), timeout=wait)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    await self._cond.wait()
+            except BaseException:
+                if ticket in self._heap:
+                    self._heap.remove(ticket)
+                    heapq.heapify(self._heap)
+                    self._cond.notify_all()
+                raise
+
+    async def _release(self, generation_id: str) -> None:
+        async with self._cond:
+            left = self._running.get(generation_id, 1) - 1
+            if left > 0:
+                self._running[generation_id] = left
+            else:
+                self._running.pop(generation_id, None)
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self, generation_id: str) -> AsyncIterator[None]:
+        """Hold one Veo operation slot for generation_id for the duration of the block."""
+        ticket = self._enqueue(generation_id)
+        await self._acquire(ticket)
+        try:
+            yield
+        finally:
+            await self._release(generation_id)
+            if generation_id not in self._running and all(
+                t.generation_id != generation_id for t in self._heap
+            ):
+                self._last_finish.pop(generation_id, None)
+
+    # ------------------------------------------------------------------
+    # Introspection for /status
+    # ------------------------------------------------------------------
+
+    def queue_position(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        """Where a generation's next request sits in dispatch order (1 = next)."""
+        ordered = sorted(self._heap)
+        waiting = [i for i, t in enumerate(ordered) if t.generation_id == generation_id]
+        running = self._running.get(generation_id, 0)
+        if not waiting and not running:
+            return None
+        return {
+            "position": waiting[0] + 1 if waiting else 0,
+            "waiting": len(waiting),
+            "running": running,
+            "queue_length": len(ordered),
+            "quota_remaining": self.quota_remaining(),
+        }
+
+
+_scheduler: Optional[VeoScheduler] = None
+
+
+def get_veo_scheduler() -> VeoScheduler:
+    """Process-wide scheduler shared by every MediaForgeAgent."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = VeoScheduler()
+    return _scheduler
@@ -4,23 +4,28 @@ Two-phase pipeline:
   Phase 1  POST /generate       → trends + script → status "script_ready"
   Phase 2  POST /proceed/{id}   → user-edited script → video + monetization → "completed"
 """
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import asyncio
+import functools
 import re
+import time
 import uuid
 import sys
+from email.utils import formatdate
 from pathlib import Path
 
+import anyio
+
 # Force UTF-8 for Windows consoles to handle emojis/Arabic
 if sys.platform == "win32":
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 from loguru import logger
 from fastapi import WebSocket, WebSocketDisconnect
@@ -28,7 +33,11 @@ import json
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config.settings import WORKSPACE_DIR, ASSETS_DIR, RENDER_DIR, REVIEW_DIR
+from config.settings import (
+    WORKSPACE_DIR, ASSETS_DIR, RENDER_DIR, REVIEW_DIR, HLS_DIR,
+    ARCHIVE_ENABLED, ARCHIVE_DIR, ARCHIVE_AFTER_HOURS, ARCHIVE_IDLE_SECONDS,
+    SCRATCH_DIR,
+)
 from config.utils import verify_infrastructure, load_latest_trends
 
 # Dedicated output folder for final videos
@@ -65,7 +74,12 @@ def _cleanup_old_files():
     import time
     cutoff = time.time() - 86400  # 24 hours
     cleaned = 0
-    for folder in [ASSETS_DIR, RENDER_DIR]:
+    from agents.veo_journal import VEO_RESULTS_DIR
+    import shutil
+    folders = [ASSETS_DIR, RENDER_DIR, VEO_RESULTS_DIR]
+    if SCRATCH_DIR:
+        folders.append(Path(SCRATCH_DIR))  # leftovers from interrupted renders
+    for folder in folders:
         if not folder.exists():
             continue
         for f in folder.iterdir():
@@ -75,12 +89,121 @@ def _cleanup_old_files():
                     cleaned += 1
                 except Exception:
                     pass
+    # Per-generation scratch subdirectories (tmpfs holds them in RAM) and HLS packages
+    dirs = [HLS_DIR] + ([Path(SCRATCH_DIR)] if SCRATCH_DIR else [])
+    for folder in dirs:
+        if not folder.exists():
+            continue
+        for d in folder.iterdir():
+            if d.is_dir() and d.stat().st_mtime < cutoff:
+                shutil.rmtree(d, ignore_errors=True)
+                cleaned += 1
     if cleaned:
         logger.info(f"Auto-cleanup: removed {cleaned} files older than 24h")
 
 @app.on_event("startup")
 async def startup_cleanup():
     _cleanup_old_files()
+    if ARCHIVE_ENABLED:
+        _background_tasks.add(asyncio.create_task(_archive_idle_loop()))
+
+    # Finish Veo operations that were still running when the process stopped
+    from agents.agent_gamma import resume_pending_veo_operations
+    _background_tasks.add(asyncio.create_task(resume_pending_veo_operations()))
+
+
+@app.on_event("shutdown")
+async def shutdown_llm_clients():
+    from agents.llm_gateway import get_llm_gateway
+    await get_llm_gateway().aclose()
+
+
+# ---------------------------------------------------------------------------
+# Archival tier: compact old renders to AV1/HEVC while no render is running
+# ---------------------------------------------------------------------------
+
+_ARCHIVE_POLL_SECONDS = 60
+_active_renders = 0
+_last_render_activity = time.time()
+_background_tasks: set = set()
+
+
+def _tracks_render_activity(func):
+    """Count a pipeline phase as render activity so the archiver stays idle."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        global _active_renders, _last_render_activity
+        _active_renders += 1
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _active_renders -= 1
+            _last_render_activity = time.time()
+    return wrapper
+
+
+def _render_queue_idle() -> bool:
+    return _active_renders == 0 and time.time() - _last_render_activity >= ARCHIVE_IDLE_SECONDS
+
+
+def _archive_candidates() -> List[Tuple[str, List[Path]]]:
+    """
+    Completed generations whose renders are old enough and not yet archived.
+    Names shared by several generations (renders from before names carried
+    the generation id) are skipped: the file belongs to whichever ran last.
+    """
+    cutoff = time.time() - ARCHIVE_AFTER_HOURS * 3600
+    renders: Dict[str, List[str]] = {}
+    owners: Dict[str, int] = {}
+    for gen_id, store in generation_store.items():
+        result = store.get("result") or {}
+        urls = [result.get("video_path", "")]
+        urls += [v.get("video_path", "") for v in result.get("variation_videos", [])]
+        renders[gen_id] = [Path(u).name for u in urls if u]
+        for name in renders[gen_id]:
+            owners[name] = owners.get(name, 0) + 1
+
+    candidates = []
+    for gen_id, store in generation_store.items():
+        if store.get("status") != "completed" or store.get("archive", {}).get("complete"):
+            continue
+        files = [RENDER_DIR / name for name in renders[gen_id] if owners[name] == 1]
+        files = [f for f in files if f.is_file() and f.stat().st_mtime < cutoff]
+        if files:
+            candidates.append((gen_id, files))
+    return candidates
+
+
+async def _archive_idle_loop():
+    from agents.render_archive import archive_render, purge_intermediates
+
+    while True:
+        await asyncio.sleep(_ARCHIVE_POLL_SECONDS)
+        try:
+            for gen_id, files in _archive_candidates():
+                store = generation_store.get(gen_id)
+                if store is None:
+                    continue
+                archive = store.setdefault("archive", {"videos": {}, "complete": False})
+                for path in files:
+                    if not _render_queue_idle():
+                        break
+                    meta = await asyncio.to_thread(archive_render, path)
+                    if meta:
+                        archive["videos"][path.name] = meta
+                        _save_store()
+                else:
+                    archive["complete"] = True
+                    _save_store()
+                    continue
+                break  # a render started — resume on the next idle window
+
+            if _render_queue_idle():
+                removed = await asyncio.to_thread(purge_intermediates)
+                if removed:
+                    logger.info(f"Archive: removed {removed} render intermediates")
+        except Exception as e:
+            logger.error(f"Archive job error: {e}")
 
 
 # ---------------------------------------------------------------------------
@@ -90,6 +213,8 @@ async def startup_cleanup():
 class GenerateRequest(BaseModel):
     topic: str
     auto_post: bool = False
+    variations: int = 0  # extra hook variants for A/B renders (max 4)
+    reuse_script: bool = True  # False forces a fresh script for a near-duplicate topic
 
 
 class ScriptColumn(BaseModel):
@@ -100,6 +225,8 @@ class ScriptColumn(BaseModel):
 
 class ProceedRequest(BaseModel):
     script_columns: List[ScriptColumn]
+    export_platforms: Optional[List[str]] = None
+    render_variations: bool = False
 
 
 class BrainstormRequest(BaseModel):
@@ -167,8 +294,8 @@ generation_store: Dict[str, Dict[str, Any]] = {}
 
 def _save_store():
     try:
-        # Only save completed or failed ones to history file to keep it clean
-        history = {k: v for k, v in generation_store.items() if v.get("status") in ["completed", "failed", "script_ready"]}
+        # Only save finished, reviewable or running ones (running is restored on restart)
+        history = {k: v for k, v in generation_store.items() if v.get("status") in ["completed", "failed", "script_ready", "running"]}
         with open(STORE_FILE, "w", encoding="utf-8") as f:
             json.dump(history, f, indent=2)
     except Exception as e:
@@ -180,6 +307,16 @@ def _load_store():
         try:
             with open(STORE_FILE, "r", encoding="utf-8") as f:
                 data = json.load(f)
+                for store in data.values():
+                    if store.get("status") != "running":
+                        continue
+                    # Interrupted by a restart: scripts go back to review so Proceed
+                    # can re-run phase 2 (journaled Veo results are reused)
+                    if store.get("script_data"):
+                        store.update(status="script_ready", phase="script_ready", progress=50,
+                                     error="Interrupted by server restart — proceed again to resume")
+                    else:
+                        store.update(status="failed", phase="error", error="Interrupted by server restart")
                 generation_store.update(data)
         except Exception as e:
             logger.error(f"Failed to load store: {e}")
@@ -244,7 +381,10 @@ async def generate_campaign(request: GenerateRequest, background_tasks: Backgrou
         "started_at": datetime.now().isoformat(),
     }
 
-    background_tasks.add_task(_run_phase1, gen_id, request.topic, lang)
+    num_variations = max(0, min(request.variations, 4))
+    background_tasks.add_task(
+        _run_phase1, gen_id, request.topic, lang, num_variations, request.reuse_script,
+    )
     return {"generation_id": gen_id, "status": "running", "language": lang}
 
 
@@ -264,9 +404,16 @@ async def proceed_with_script(
             detail=f"Cannot proceed — current status is '{store['status']}'"
         )
 
+    if request.export_platforms:
+        unknown = [p for p in request.export_platforms if p not in PLATFORM_OAUTH_URLS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown platform(s): {', '.join(unknown)}")
+
     edited_columns = [col.dict() for col in request.script_columns]
     store["script_data"]["script_columns"] = edited_columns
-    store.update(status="running", phase="media_generation", progress=55)
+    store["export_platforms"] = request.export_platforms
+    store["render_variations"] = request.render_variations
+    store.update(status="running", phase="media_generation", progress=55, error=None)
 
     background_tasks.add_task(_run_phase2, gen_id)
     _save_store()
@@ -502,7 +649,8 @@ async def publish_to_social(platform: str, gen_id: str):
     if not store or "result" not in store:
         raise HTTPException(status_code=404, detail="Campaign results not found. Generate a video first.")
 
-    video_url = store["result"].get("video_path")
+    # Prefer the variant exported to this platform's limits, if one was rendered
+    video_url = store["result"].get("exports", {}).get(platform) or store["result"].get("video_path")
     if not video_url:
         raise HTTPException(status_code=400, detail="No video found in this campaign.")
 
@@ -606,6 +754,11 @@ def _status_response(store: Dict[str, Any]) -> Dict[str, Any]:
         "error": store.get("error"),
         "result": store.get("result"),
     }
+    if store.get("status") == "running" and store.get("phase") == "media_generation":
+        from agents.veo_scheduler import get_veo_scheduler
+        resp["veo_queue"] = get_veo_scheduler().queue_position(store.get("id"))
+    if store.get("phase") == "script_generation" and store.get("partial_columns"):
+        resp["partial_script_columns"] = store["partial_columns"]
     if store.get("status") == "script_ready":
         sd = store.get("script_data", {})
         resp["script_data"] = {
@@ -615,6 +768,7 @@ def _status_response(store: Dict[str, Any]) -> Dict[str, Any]:
             "language": store.get("language", "en"),
             "seo_keywords": sd.get("seo_keywords", []),
             "script_source": sd.get("script_source", "template"),
+            "reused_from": sd.get("reused_from"),
         }
     return resp
 
@@ -651,6 +805,33 @@ async def brainstorm(request: BrainstormRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/providers/status")
+async def providers_status():
+    from agents.circuit_breaker import breaker_states
+    from agents.adaptive_limiter import limiter_states
+    return {
+        "providers": breaker_states(),
+        "concurrency": limiter_states(),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@app.get("/llm/cache/stats")
+async def llm_cache_stats():
+    from agents.llm_cache import get_completion_cache
+    cache = get_completion_cache()
+    if cache is None:
+        return {"enabled": False}
+    return await asyncio.to_thread(cache.stats)
+
+
+@app.get("/scripts/index/stats")
+async def script_index_stats():
+    from agents.script_index import get_script_index
+    from config.settings import SCRIPT_REUSE_ENABLED
+    return {"enabled": SCRIPT_REUSE_ENABLED, **get_script_index().stats()}
+
+
 @app.get("/results")
 async def get_recent_results():
     results = []
@@ -662,20 +843,177 @@ async def get_recent_results():
     return {"results": results}
 
 
-@app.get("/video/{filename}")
-async def serve_video(filename: str):
+@app.api_route("/video/{filename}", methods=["GET", "HEAD"])
+async def serve_video(filename: str, request: Request):
     safe_name = Path(filename).name
     video_path = RENDER_DIR / safe_name
+    if not video_path.exists():
+        video_path = ARCHIVE_DIR / safe_name  # compacted by the archival tier
     if not video_path.exists() or video_path.stat().st_size == 0:
         raise HTTPException(status_code=404, detail="Video not found or empty")
-    return FileResponse(path=str(video_path), media_type="video/mp4", filename=safe_name)
+    return _ranged_file_response(request, video_path, "video/mp4", filename=safe_name)
+
+
+_HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+
+@app.api_route("/hls/{render}/{filename}", methods=["GET", "HEAD"])
+async def serve_hls(render: str, filename: str, request: Request):
+    """Serve HLS playlists and segments produced by the Media Forge."""
+    safe_dir = Path(render).name
+    safe_name = Path(filename).name
+    media_type = _HLS_MEDIA_TYPES.get(Path(safe_name).suffix.lower())
+    path = HLS_DIR / safe_dir / safe_name
+    if media_type is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="HLS resource not found")
+    return _ranged_file_response(request, path, media_type)
+
+
+# ---------------------------------------------------------------------------
+# Ranged / conditional file delivery (videos are our largest responses)
+# ---------------------------------------------------------------------------
+
+_FILE_CHUNK_SIZE = 256 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _file_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``Range`` header into an inclusive (start, end).
+
+    Returns None when the header is malformed, invalid (last < first) or
+    asks for several ranges — RFC 9110 §14.2: answer with the full body —
+    and raises HTTPException 416 when a valid range cannot be satisfied.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise HTTPException(416, headers={"Content-Range": f"bytes */{size}"})
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise HTTPException(416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class RangedFileResponse(Response):
+    """
+    Serve a byte range of a file.
+    Uses the ASGI path-send extension for whole files when the server offers
+    it, and threaded chunked reads otherwise.
+    """
+
+    def __init__(
+        self, path: Path, start: int, end: int, status_code: int,
+        headers: Dict[str, str], media_type: str, send_body: bool = True,
+    ):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.count = end - start + 1
+        self.send_body = send_body
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if not self.send_body or self.count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        whole_file = self.start == 0 and self.count == self.path.stat().st_size
+        if whole_file and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        remaining = self.count
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.start)
+            while remaining > 0:
+                chunk = await f.read(min(_FILE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+        if remaining > 0:
+            # File shrank underneath us; close the body cleanly
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _ranged_file_response(
+    request: Request, path: Path, media_type: str, filename: Optional[str] = None,
+) -> Response:
+    """Build a 200/206/304 response honouring Range, If-Range and If-None-Match."""
+    stat = path.stat()
+    size = stat.st_size
+    etag = _file_etag(stat)
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "cache-control": "no-cache",
+    }
+    if filename:
+        headers["content-disposition"] = f'attachment; filename="{filename}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, size)
+
+    if byte_range is None:
+        return RangedFileResponse(path, 0, size - 1, 200, headers, media_type,
+                                  send_body=request.method != "HEAD")
+
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return RangedFileResponse(path, start, end, 206, headers, media_type,
+                              send_body=request.method != "HEAD")
 
 
 # ---------------------------------------------------------------------------
 # Phase 1: Trends + Script
 # ---------------------------------------------------------------------------
 
-async def _run_phase1(gen_id: str, topic: str, language: str = "en"):
+@_tracks_render_activity
+async def _run_phase1(
+    gen_id: str, topic: str, language: str = "en", num_variations: int = 0,
+    reuse_script: bool = True,
+):
     store = generation_store[gen_id]
     try:
         store.update(phase="infrastructure_check", progress=5)
@@ -689,8 +1027,22 @@ async def _run_phase1(gen_id: str, topic: str, language: str = "en"):
         # We pass cached/minimal trends to satisfy the architect's signature
         cached_trends = load_latest_trends() or {"seo_keywords": ["viral", "trending"], "hook_patterns": []}
         
+        async def on_scenes(columns: List[Dict[str, str]]):
+            # Live preview: scenes arrive as the LLM streams them
+            store["partial_columns"] = columns
+            store["progress"] = min(40, 10 + 5 * len(columns))
+            await manager.broadcast(json.dumps({
+                "type": "script_scene",
+                "generation_id": gen_id,
+                "scenes": columns,
+            }))
+
         logger.info(f"Generating Baidu AI script for: {topic} ({language})")
-        script_result = await run_narrative_architect(cached_trends, topic, language)
+        script_result = await run_narrative_architect(
+            cached_trends, topic, language, num_variations, on_scenes=on_scenes,
+            reuse=reuse_script,
+        )
+        store.pop("partial_columns", None)
         
         store["trends"] = cached_trends
         store["progress"] = 45
@@ -705,6 +1057,7 @@ async def _run_phase1(gen_id: str, topic: str, language: str = "en"):
 
     except Exception as e:
         logger.error(f"Phase 1 failed for {gen_id}: {e}")
+        store.pop("partial_columns", None)
         store.update(status="failed", error=str(e), phase="error")
         _save_store()
 
@@ -713,6 +1066,7 @@ async def _run_phase1(gen_id: str, topic: str, language: str = "en"):
 # Phase 2: Video + Monetization (with user-edited script)
 # ---------------------------------------------------------------------------
 
+@_tracks_render_activity
 async def _run_phase2(gen_id: str):
     store = generation_store[gen_id]
     topic = store["topic"]
@@ -725,8 +1079,23 @@ async def _run_phase2(gen_id: str):
         # Media Generation
         store.update(phase="media_generation", progress=60)
         try:
-            from agents.agent_gamma import run_media_forge
-            media_result = await run_media_forge(main_script, captions)
+            if store.get("render_variations") and store.get("variations"):
+                from agents.agent_beta import NarrativeArchitectAgent
+                from agents.agent_gamma import run_media_forge_variations
+                variants = NarrativeArchitectAgent().splice_hook_variants(
+                    main_script, store["variations"],
+                )
+                variants[0]["captions"] = captions
+                media_result = await run_media_forge_variations(
+                    main_script, variants, export_platforms=store.get("export_platforms"),
+                    generation_id=gen_id,
+                )
+            else:
+                from agents.agent_gamma import run_media_forge
+                media_result = await run_media_forge(
+                    main_script, captions, export_platforms=store.get("export_platforms"),
+                    generation_id=gen_id,
+                )
         except Exception as e:
             logger.warning(f"Media Forge failed: {e}")
             media_result = {"final_video_path": "", "visuals_generated": 0}
@@ -794,12 +1163,37 @@ async def _run_phase2(gen_id: str):
             if vp.exists() and vp.stat().st_size > 0:
                 video_url = f"/video/{vp.name}"
 
+        hls_url = ""
+        hls_fs_path = media_result.get("hls_playlist", "")
+        if hls_fs_path and Path(hls_fs_path).exists():
+            hp = Path(hls_fs_path)
+            hls_url = f"/hls/{hp.parent.name}/{hp.name}"
+
+        variation_videos = []
+        for render in media_result.get("variant_renders", []):
+            rp = Path(render.get("final_video_path", ""))
+            if rp.name and rp.exists() and rp.stat().st_size > 0:
+                variation_videos.append({
+                    "variation_number": render.get("variation_number", 0),
+                    "hook_type": render.get("hook_type", ""),
+                    "video_path": f"/video/{rp.name}",
+                })
+
+        exports = {}
+        for platform, export_path in media_result.get("platform_exports", {}).items():
+            ep = Path(export_path)
+            if ep.exists() and ep.stat().st_size > 0:
+                exports[platform] = f"/video/{ep.name}"
+
         store["result"] = {
             "topic": topic,
             "script": script_text,
             "variations": variation_texts,
             "captions": caption_texts,
             "video_path": video_url,
+            "hls_url": hls_url,
+            "exports": exports,
+            "variation_videos": variation_videos,
             "monetization_brief": brief_content or "Monetization analysis complete -- see products below.",
             "products": products,
             "earnings_projection": {
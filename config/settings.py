@@ -21,11 +21,22 @@ for dir_path in [TRENDS_DIR, ASSETS_DIR, RENDER_DIR, REVIEW_DIR]:
     dir_path.mkdir(parents=True, exist_ok=True)
 
 # Local Service URLs
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 COMFYUI_BASE_URL = os.getenv("COMFYUI_BASE_URL", "http://localhost:8188")
 COMFYUI_WEBSOCKET_URL = os.getenv("COMFYUI_WEBSOCKET_URL", "ws://localhost:8188/ws")
+COMFYUI_ENABLED = os.getenv("COMFYUI_ENABLED", "false").lower() == "true"
+COMFYUI_CHECKPOINT = os.getenv("COMFYUI_CHECKPOINT", "sd_xl_base_1.0.safetensors")
+COMFYUI_WORKFLOW_PATH = os.getenv("COMFYUI_WORKFLOW_PATH", "")  # API-format graph with $PROMPT/$SEED placeholders
+COMFYUI_MAX_QUEUE_DEPTH = int(os.getenv("COMFYUI_MAX_QUEUE_DEPTH", 2))
+COMFYUI_TIMEOUT = int(os.getenv("COMFYUI_TIMEOUT", 300))
 
 # LLM Models
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+# Reuse a past script when a new topic is this similar (embedding / n-gram fallback cosine)
+SCRIPT_REUSE_ENABLED = os.getenv("SCRIPT_REUSE_ENABLED", "true").lower() == "true"
+SCRIPT_REUSE_THRESHOLD = float(os.getenv("SCRIPT_REUSE_THRESHOLD", 0.85))
+SCRIPT_REUSE_NGRAM_THRESHOLD = float(os.getenv("SCRIPT_REUSE_NGRAM_THRESHOLD", 0.9))
+SCRIPT_INDEX_MAX_ENTRIES = int(os.getenv("SCRIPT_INDEX_MAX_ENTRIES", 2000))
 
 # TikTok / Content Config
 CONTENT_LENGTH_SECONDS = int(os.getenv("CONTENT_LENGTH_SECONDS", 30))
@@ -41,6 +52,35 @@ SCRAPE_TIMEOUT = int(os.getenv("SCRAPE_TIMEOUT", 30))
 VIDEO_RESOLUTION = os.getenv("VIDEO_RESOLUTION", "1080x1920")  # TikTok native
 VIDEO_FPS = int(os.getenv("VIDEO_FPS", 30))
 AUDIO_BITRATE = os.getenv("AUDIO_BITRATE", "192k")
+CLIP_QC_ENABLED = os.getenv("CLIP_QC_ENABLED", "true").lower() == "true"  # black/frozen/corrupt check before assembly
+# Fast scratch root for render intermediates (e.g. tmpfs like /dev/shm/viral_engine).
+# Falls back to ASSETS_DIR when unset, unavailable, or below SCRATCH_MIN_FREE_MB.
+SCRATCH_DIR = os.getenv("SCRATCH_DIR", "")
+SCRATCH_MIN_FREE_MB = int(os.getenv("SCRATCH_MIN_FREE_MB", 256))
+# x264 presets come from the machine profile (python -m agents.encoder_calibration);
+# the forge picks the most efficient preset that encodes at least this fast (x realtime)
+ENCODER_TARGET_SPEED = float(os.getenv("ENCODER_TARGET_SPEED", 1.0))
+
+# HLS preview packaging (segments the final render for adaptive streaming)
+HLS_ENABLED = os.getenv("HLS_ENABLED", "false").lower() == "true"
+HLS_DIR = RENDER_DIR / "hls"
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", 2))
+HLS_LOW_BITRATE = os.getenv("HLS_LOW_BITRATE", "")  # e.g. "600k" adds a 540x960 rendition
+
+# Platform exports derived from the final (mezzanine) render, e.g. "tiktok,youtube"
+PLATFORM_EXPORTS = [p.strip() for p in os.getenv("PLATFORM_EXPORTS", "").split(",") if p.strip()]
+# Size-targeted exports: cap every variant at this many MB (0 = platform limits only)
+EXPORT_MAX_MB = float(os.getenv("EXPORT_MAX_MB", 0))
+EXPORT_TWO_PASS = os.getenv("EXPORT_TWO_PASS", "false").lower() == "true"  # else capped VBR
+EXPORT_SIZE_MARGIN = float(os.getenv("EXPORT_SIZE_MARGIN", 0.04))  # reserve for mux overhead
+
+# Archival tier: re-encode finished renders to AV1/HEVC while the render queue is idle
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+ARCHIVE_DIR = WORKSPACE_DIR / "archive"
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "av1").lower()  # av1 (SVT-AV1) or hevc (x265)
+ARCHIVE_AFTER_HOURS = float(os.getenv("ARCHIVE_AFTER_HOURS", 1))  # render age before archiving
+ARCHIVE_IDLE_SECONDS = int(os.getenv("ARCHIVE_IDLE_SECONDS", 300))  # queue idle time before starting
+ARCHIVE_THREADS = int(os.getenv("ARCHIVE_THREADS", 2))
 
 
 def _resolve_ffmpeg() -> str:
@@ -74,6 +114,8 @@ LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
 # Stock Video APIs (free tiers — get keys at pexels.com/api and pixabay.com/api/docs)
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY", "")
 PIXABAY_API_KEY = os.getenv("PIXABAY_API_KEY", "")
+# Seek into remote stock files and fetch only the needed window instead of downloading them whole
+STOCK_STREAM_TRIM = os.getenv("STOCK_STREAM_TRIM", "true").lower() == "true"
 
 # API Keys (for fallback cloud services, if needed)
 AMAZON_API_KEY = os.getenv("AMAZON_API_KEY", "")
@@ -85,9 +127,51 @@ BAIDU_AI_BASE_URL = os.getenv("BAIDU_AI_BASE_URL", "https://aistudio.baidu.com/l
 BAIDU_AI_MODEL = os.getenv("BAIDU_AI_MODEL", "ernie-5.0-thinking-preview")
 BAIDU_AI_FALLBACK_MODEL = os.getenv("BAIDU_AI_FALLBACK_MODEL", "ernie-4.5-turbo-128k-preview")
 
+# Shared LLM gateway: per-call timeout (seconds) and pooled connections per provider
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+# Disk-backed completion cache (workspace/llm_cache.sqlite3): entry lifetime and size cap
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", 168))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", 64))
+# Hedged script generation: start the next provider if no usable answer within the delay (seconds)
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", 4))
+# Stream phase-1 scripts and push each parsed scene to the UI as its line completes
+# (streamed providers are tried in turn; LLM_HEDGE_ENABLED doesn't apply to them)
+LLM_STREAMING_ENABLED = os.getenv("LLM_STREAMING_ENABLED", "true").lower() == "true"
+# Ask for schema-validated JSON scripts (one repair call on invalid output)
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() == "true"
+# Ask for all A/B variations in one structured request (parallel calls only as fallback)
+LLM_BATCH_VARIATIONS = os.getenv("LLM_BATCH_VARIATIONS", "true").lower() == "true"
+
+# Per-provider circuit breakers (Gemini, Baidu, Veo, Pexels, Pixabay): open when the failure
+# rate over the window reaches the threshold, probe again after the recovery time
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", 0.5))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", 4))
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", 300))
+CIRCUIT_RECOVERY_SECONDS = float(os.getenv("CIRCUIT_RECOVERY_SECONDS", 60))
+
+# Adaptive (AIMD) provider concurrency: grows on success, halves on 429/timeouts and
+# waits out Retry-After (capped by RATE_LIMIT_MAX_BACKOFF seconds)
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", 2))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", 2))
+STOCK_MAX_CONCURRENCY = int(os.getenv("STOCK_MAX_CONCURRENCY", 6))
+RATE_LIMIT_MAX_BACKOFF = float(os.getenv("RATE_LIMIT_MAX_BACKOFF", 60))
+
 # Google Veo 3.1 (text-to-video) - Gemini API, get key at aistudio.google.com
 GOOGLE_VEO_API_KEY = os.getenv("GOOGLE_VEO_API_KEY", os.getenv("GOOGLE_API_KEY", ""))
 GOOGLE_VEO_MODEL = os.getenv("GOOGLE_VEO_MODEL", "veo-3.1-generate-preview")
+# Split mode: one Veo generation covers consecutive scenes (up to VEO_MAX_CLIP_SECONDS),
+# then gets cut locally per scene — fewer queued remote operations per render
+VEO_SPLIT_MODE = os.getenv("VEO_SPLIT_MODE", "false").lower() == "true"
+VEO_MAX_CLIP_SECONDS = float(os.getenv("VEO_MAX_CLIP_SECONDS", 8))
+# Shared Veo scheduler: in-flight operations, per-key requests/minute, daily generations (0 = unlimited)
+VEO_MAX_CONCURRENCY = int(os.getenv("VEO_MAX_CONCURRENCY", 1))
+VEO_RPM = int(os.getenv("VEO_RPM", 2))
+VEO_DAILY_QUOTA = int(os.getenv("VEO_DAILY_QUOTA", 0))
 
 # Replicate (text-to-video AI) - get token at replicate.com/account
 REPLICATE_API_TOKEN = os.getenv("REPLICATE_API_TOKEN", "")
@@ -3,6 +3,7 @@ Utility functions for the Viral Engine
 """
 import json
 import os
+import shutil
 import asyncio
 import aiohttp
 from pathlib import Path
@@ -10,8 +11,9 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 from loguru import logger
 from config.settings import (
-    COMFYUI_BASE_URL, TRENDS_DIR, 
-    RENDER_DIR, REVIEW_DIR, LOG_FILE, LOG_LEVEL
+    COMFYUI_BASE_URL, TRENDS_DIR, ASSETS_DIR,
+    RENDER_DIR, REVIEW_DIR, LOG_FILE, LOG_LEVEL,
+    SCRATCH_DIR, SCRATCH_MIN_FREE_MB,
 )
 
 # Configure logging
@@ -58,6 +60,52 @@ def load_latest_trends() -> Optional[Dict[str, Any]]:
     return data
 
 
+def scratch_root(expected_bytes: int = 0) -> Path:
+    """
+    Directory for render intermediates: SCRATCH_DIR when configured and it keeps
+    SCRATCH_MIN_FREE_MB free after expected_bytes, otherwise ASSETS_DIR.
+    Final outputs never go here.
+    """
+    if SCRATCH_DIR:
+        root = Path(SCRATCH_DIR)
+        try:
+            root.mkdir(parents=True, exist_ok=True)
+            free = shutil.disk_usage(root).free
+            if free - expected_bytes >= SCRATCH_MIN_FREE_MB * 1024 * 1024:
+                return root
+            logger.debug(f"Scratch {root} has {free // (1024 * 1024)} MB free — spilling to disk")
+        except OSError as e:
+            logger.warning(f"Scratch dir {root} unavailable ({e}) — using {ASSETS_DIR}")
+    return ASSETS_DIR
+
+
+def scratch_path(name: str, expected_bytes: int = 0, namespace: str = "") -> Path:
+    """
+    Path for an intermediate file, on scratch when there is room for it.
+    On scratch, a namespace (e.g. a generation id) gives concurrent renders
+    their own subdirectory; ASSETS_DIR keeps its flat layout.
+    """
+    root = scratch_root(expected_bytes)
+    if namespace and root != ASSETS_DIR:
+        root = root / scratch_namespace(namespace)
+        root.mkdir(parents=True, exist_ok=True)
+    return root / name
+
+
+def scratch_namespace(namespace: str) -> str:
+    return "".join(c for c in namespace if c.isalnum() or c in "-_")[:40] or "default"
+
+
+def is_scratch(path: Path) -> bool:
+    """True if path lives under the configured SCRATCH_DIR."""
+    if not SCRATCH_DIR:
+        return False
+    try:
+        return Path(path).resolve().is_relative_to(Path(SCRATCH_DIR).resolve())
+    except (OSError, ValueError):
+        return False
+
+
 async def check_service_health(service_name: str, url: str) -> bool:
     """Check if a local service is running."""
     try:
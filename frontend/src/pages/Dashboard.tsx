@@ -25,7 +25,7 @@ import { ToastContainer, useToast } from '../components/Toast';
 import { LogConsole } from '../components/LogConsole';
 import { HistoryList } from '../components/HistoryList';
 import { agentService } from '../services/agentService';
-import type { GenerationResult, ScriptColumn } from '../types';
+import type { GenerationResult, ReusedFrom, ScriptColumn } from '../types';
 import './Dashboard.css';
 
 const PHASE_LABELS: Record<string, string> = {
@@ -81,7 +81,9 @@ export const Dashboard: React.FC = () => {
   const [genId, setGenId] = useState<string | null>(null);
   const [editableScript, setEditableScript] = useState<ScriptColumn[]>([]);
   const [scriptSource, setScriptSource] = useState<string>('');
+  const [reusedFrom, setReusedFrom] = useState<ReusedFrom | null>(null);
   const [scriptReady, setScriptReady] = useState(false);
+  const [liveScenes, setLiveScenes] = useState<ScriptColumn[]>([]);
   const [phase2Loading, setPhase2Loading] = useState(false);
   const [language, setLanguage] = useState<string>('en');
   const [showHistory, setShowHistory] = useState(false);
@@ -118,12 +120,15 @@ export const Dashboard: React.FC = () => {
           const status = await agentService.getGenerationStatus(id);
           setProgress(status.progress);
           setPhase(status.phase || '');
+          if (status.partial_script_columns) setLiveScenes(status.partial_script_columns);
 
           if (status.status === 'script_ready' && status.script_data) {
             setEditableScript(status.script_data.script_columns || []);
             setScriptSource(status.script_data.script_source || '');
+            setReusedFrom(status.script_data.reused_from || null);
             if (status.language) setLanguage(status.language);
             setScriptReady(true);
+            setLiveScenes([]);
             setLoading(false);
             stopPolling();
             addToast(
@@ -159,6 +164,28 @@ export const Dashboard: React.FC = () => {
 
   useEffect(() => () => stopPolling(), [stopPolling]);
 
+  /* ---- Live script preview (scenes pushed over the log socket while Beta streams) ---- */
+
+  useEffect(() => {
+    if (!loading || !genId) return;
+    const apiBase = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+    const ws = new WebSocket(apiBase.replace(/^http/, 'ws') + '/ws/logs');
+    ws.onmessage = (event) => {
+      try {
+        const data = JSON.parse(event.data);
+        if (data.type === 'script_scene' && data.generation_id === genId) {
+          setLiveScenes(data.scenes || []);
+        }
+      } catch {
+        /* ignore malformed frames */
+      }
+    };
+    return () => {
+      ws.onmessage = null;
+      if (ws.readyState === WebSocket.OPEN || ws.readyState === WebSocket.CONNECTING) ws.close();
+    };
+  }, [loading, genId]);
+
   /* removed variation fetching — single script only */
 
   /* ---- Handlers ---- */
@@ -169,6 +196,7 @@ export const Dashboard: React.FC = () => {
     setLoading(true);
     setResult(null);
     setEditableScript([]);
+    setLiveScenes([]);
     setScriptReady(false);
     setProgress(0);
     setPhase('initializing');
@@ -226,6 +254,7 @@ export const Dashboard: React.FC = () => {
     setGenId(null);
     setEditableScript([]);
     setScriptSource('');
+    setReusedFrom(null);
     setScriptReady(false);
     setPhase2Loading(false);
     setLanguage('en');
@@ -442,6 +471,16 @@ export const Dashboard: React.FC = () => {
                       </div>
                     ))}
                   </div>
+                  {loading && phase === 'script_generation' && liveScenes.length > 0 && (
+                    <ol className="live-scenes" dir={dir}>
+                      {liveScenes.map((scene, i) => (
+                        <li key={i} className="live-scene">
+                          <span className="live-scene-time">{scene.timecode}</span>
+                          <span className="live-scene-audio">{scene.audio}</span>
+                        </li>
+                      ))}
+                    </ol>
+                  )}
                 </div>
               )}
               <LogConsole />
@@ -464,6 +503,14 @@ export const Dashboard: React.FC = () => {
                       {scriptSource === 'baidu' ? '🤖 Baidu AI' : scriptSource === 'ollama' ? '🦙 Ollama' : '📋 Template'}
                     </span>
                   )}
+                  {reusedFrom && (
+                    <span
+                      className="script-reused-badge"
+                      title={`${Math.round(reusedFrom.similarity * 100)}% similar${reusedFrom.generated_at ? ` — written ${new Date(reusedFrom.generated_at).toLocaleDateString()}` : ''}`}
+                    >
+                      {isRtl ? `♻️ مُعاد من "${reusedFrom.topic}"` : `♻️ Reused from "${reusedFrom.topic}"`}
+                    </span>
+                  )}
                 </div>
                 <p className="script-editor-sub">
                   {isRtl
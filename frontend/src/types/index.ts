@@ -41,6 +41,14 @@ export interface ScriptData {
   language?: string;
   seo_keywords?: string[];
   script_source?: 'baidu' | 'ollama' | 'template';
+  reused_from?: ReusedFrom | null;
+}
+
+export interface ReusedFrom {
+  topic: string;
+  similarity: number;
+  method?: 'embedding' | 'ngram';
+  generated_at?: string;
 }
 
 export interface GenerationResult {
@@ -49,6 +57,9 @@ export interface GenerationResult {
   variations: string[];
   captions: string[];
   video_path?: string;
+  hls_url?: string;
+  exports?: Record<string, string>;
+  variation_videos?: { variation_number: number; hook_type: string; video_path: string }[];
   monetization_brief: string;
   products: Product[];
   earnings_projection: EarningsProjection;
@@ -65,6 +76,7 @@ export interface GenerationStatus {
   error?: string;
   result?: GenerationResult;
   script_data?: ScriptData;
+  partial_script_columns?: ScriptColumn[];
   variations?: any[];
 }
 
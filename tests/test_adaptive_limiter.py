@@ -0,0 +1,63 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from agents.adaptive_limiter import AdaptiveLimiter, overload_signal, parse_retry_after
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("", None),
+    ("7", 7.0),
+    ("2.5", 2.5),
+    ("-3", 0.0),
+    ("not a date", None),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    value = formatdate(time.time() + 30, usegmt=True)
+    assert 25 <= parse_retry_after(value) <= 30
+    past = formatdate(time.time() - 30, usegmt=True)
+    assert parse_retry_after(past) == 0.0
+
+
+def test_on_overload_halves_limit_and_blocks_for_retry_after():
+    limiter = AdaptiveLimiter("test", initial=8, max_limit=8)
+    limiter.on_overload(retry_after=10)
+    assert limiter.limit == 4
+    assert 10 <= limiter.blocked_for() <= 12.1  # up to 20% jitter
+
+
+def test_on_overload_respects_min_limit_and_max_backoff():
+    limiter = AdaptiveLimiter("test", initial=2, max_limit=8, min_limit=1, max_backoff=5)
+    limiter.on_overload(retry_after=1000)
+    limiter.on_overload(retry_after=1000)
+    assert limiter.limit == 1
+    assert limiter.blocked_for() <= 5 * 1.2
+
+
+def test_overloads_from_calls_started_before_the_cut_count_once():
+    limiter = AdaptiveLimiter("test", initial=8, max_limit=8)
+    started = time.monotonic()
+    limiter.on_overload(retry_after=0, started=started)
+    limiter.on_overload(retry_after=0, started=started)
+    assert limiter.limit == 4
+
+
+def test_success_grows_limit_additively():
+    limiter = AdaptiveLimiter("test", initial=2, max_limit=3)
+    limiter.on_success()
+    assert limiter.limit == 2.5
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.limit == 3
+
+
+def test_overload_signal():
+    assert overload_signal(TimeoutError()) == (True, None)
+    assert overload_signal(RuntimeError("429 RESOURCE_EXHAUSTED retryDelay: '12s'")) == (True, 12.0)
+    assert overload_signal(RuntimeError("invalid prompt")) == (False, None)
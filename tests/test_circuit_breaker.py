@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from agents import circuit_breaker
+from agents.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture(autouse=True)
+def _enabled(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "CIRCUIT_BREAKER_ENABLED", True)
+
+
+def _breaker(**kwargs):
+    options = {"failure_rate": 0.5, "min_calls": 2, "window_seconds": 60, "recovery_seconds": 0.05}
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+def _wait_recovery(breaker):
+    time.sleep(breaker._recovery() + 0.01)
+
+
+def test_opens_at_failure_rate_after_min_calls():
+    breaker = _breaker()
+    breaker.record_failure("boom")
+    assert breaker.state == CLOSED
+    breaker.record_failure("boom")
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_successes_keep_it_closed():
+    breaker = _breaker(min_calls=4)
+    for _ in range(3):
+        breaker.record_success()
+    breaker.record_failure("boom")
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_one_probe_and_success_closes():
+    breaker = _breaker()
+    breaker.record_failure("x")
+    breaker.record_failure("x")
+    _wait_recovery(breaker)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker._reopens == 0
+
+
+def test_failed_probe_reopens_with_longer_backoff():
+    breaker = _breaker()
+    breaker.record_failure("x")
+    breaker.record_failure("x")
+    first = breaker._recovery()
+    _wait_recovery(breaker)
+    assert breaker.allow()
+    breaker.record_failure("still down")
+    assert breaker.state == OPEN
+    assert breaker._recovery() == 2 * first
+
+
+def test_late_outcomes_while_open_are_only_tallied():
+    breaker = _breaker(recovery_seconds=60)
+    breaker.record_failure("x")
+    breaker.record_failure("x")
+    breaker.record_failure("late failure")
+    breaker.record_success()
+    assert breaker.state == OPEN
+    assert breaker._reopens == 0
+    assert breaker.snapshot()["failure"] == 3
+
+
+@pytest.mark.parametrize("message, opens", [
+    ("401 Unauthorized", True),
+    ("API key not valid. Please pass a valid API key.", True),
+    ("insufficient_quota", True),
+    ("Quota exceeded for metric GenerateRequestsPerDayPerProject", True),
+    ("429 RESOURCE_EXHAUSTED: You exceeded your current quota", False),
+    ("Connection reset by peer", False),
+])
+def test_fatal_errors_open_immediately(message, opens):
+    breaker = _breaker(min_calls=10)
+    breaker.record_failure(message)
+    assert (breaker.state == OPEN) is opens
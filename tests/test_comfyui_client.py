@@ -0,0 +1,152 @@
+"""ComfyUIClient against a local aiohttp stand-in for the ComfyUI server."""
+import asyncio
+import json
+
+from aiohttp import web
+
+from agents.comfyui_client import ComfyUIClient, ComfyUIError
+
+PNG = b"\x89PNG\r\n\x1a\nfake-image"
+
+
+class FakeComfyUI:
+    """/prompt, /ws, /history/{id} and /view, finishing each prompt after `delay`."""
+
+    def __init__(self, delay: float = 0.05, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.prompts = []
+        self.running = 0
+        self.max_running = 0
+        self.sockets = []
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/prompt", self.prompt)
+        app.router.add_get("/ws", self.ws)
+        app.router.add_get("/history/{prompt_id}", self.history)
+        app.router.add_get("/view", self.view)
+        return app
+
+    async def broadcast(self, message):
+        for ws in list(self.sockets):
+            if not ws.closed:
+                await ws.send_str(json.dumps(message))
+
+    async def prompt(self, request):
+        body = await request.json()
+        prompt_id = f"p{len(self.prompts)}"
+        self.prompts.append(body["prompt"])
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        asyncio.get_running_loop().create_task(self._finish(prompt_id))
+        return web.json_response({"prompt_id": prompt_id, "number": len(self.prompts)})
+
+    async def _finish(self, prompt_id):
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        if self.fail:
+            await self.broadcast({
+                "type": "execution_error",
+                "data": {"prompt_id": prompt_id, "exception_message": "CUDA out of memory"},
+            })
+        else:
+            await self.broadcast({"type": "executing", "data": {"prompt_id": prompt_id, "node": None}})
+
+    async def ws(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.append(ws)
+        await ws.send_str(json.dumps({
+            "type": "status", "data": {"status": {"exec_info": {"queue_remaining": 0}}},
+        }))
+        async for _ in ws:
+            pass
+        return ws
+
+    async def history(self, request):
+        prompt_id = request.match_info["prompt_id"]
+        return web.json_response({prompt_id: {"outputs": {
+            "9": {"images": [{"filename": f"{prompt_id}.png", "subfolder": "", "type": "output"}]},
+        }}})
+
+    async def view(self, request):
+        return web.Response(body=PNG + request.query["filename"].encode(), content_type="image/png")
+
+
+def _run(fake: FakeComfyUI, scenario, tmp_path, **client_kwargs):
+    async def main():
+        runner = web.AppRunner(fake.app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        client = ComfyUIClient(
+            base_url=f"http://127.0.0.1:{port}", ws_url=f"ws://127.0.0.1:{port}/ws",
+            cache_dir=tmp_path / "cache", **client_kwargs,
+        )
+        try:
+            return await scenario(client)
+        finally:
+            await client.close()
+            await runner.cleanup()
+    return asyncio.run(main())
+
+
+def test_run_workflow_waits_for_websocket_and_fetches_images(tmp_path):
+    fake = FakeComfyUI()
+
+    async def scenario(client):
+        return await client.run_workflow({"3": {"class_type": "KSampler", "inputs": {}}})
+
+    images = _run(fake, scenario, tmp_path)
+    assert images == [PNG + b"p0.png"]
+    assert len(fake.prompts) == 1
+
+
+def test_execution_error_raises(tmp_path):
+    fake = FakeComfyUI(fail=True)
+
+    async def scenario(client):
+        try:
+            await client.run_workflow({})
+        except ComfyUIError as e:
+            return str(e)
+        return None
+
+    assert "CUDA out of memory" in _run(fake, scenario, tmp_path)
+
+
+def test_queue_depth_gate_limits_prompts_in_flight(tmp_path):
+    fake = FakeComfyUI(delay=0.05)
+
+    async def scenario(client):
+        return await asyncio.gather(*(
+            client.run_workflow({"n": {"inputs": {"seed": i}}}) for i in range(4)
+        ))
+
+    images = _run(fake, scenario, tmp_path, max_queue_depth=1)
+    assert len(images) == 4
+    assert len(fake.prompts) == 4
+    assert fake.max_running == 1
+
+
+def test_generate_image_cache_and_shared_inflight(tmp_path):
+    fake = FakeComfyUI()
+    workflow = {"6": {"inputs": {"text": "$PROMPT"}}, "3": {"inputs": {"seed": "$SEED"}}}
+
+    async def scenario(client):
+        first, twin = await asyncio.gather(
+            client.generate_image("a red fox", seed=7, workflow=workflow),
+            client.generate_image("a red fox", seed=7, workflow=workflow),
+        )
+        again = await client.generate_image("a red fox", seed=7, workflow=workflow)
+        other = await client.generate_image("a red fox", seed=8, workflow=workflow)
+        return first, twin, again, other
+
+    first, twin, again, other = _run(fake, scenario, tmp_path)
+    assert first == twin == again
+    assert other != first
+    assert first.read_bytes().startswith(PNG)
+    assert len(fake.prompts) == 2  # seed 7 once (shared + cached), seed 8 once
+    assert fake.prompts[0] == {"6": {"inputs": {"text": "a red fox"}}, "3": {"inputs": {"seed": 7}}}
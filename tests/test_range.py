@@ -0,0 +1,35 @@
+import pytest
+from fastapi import HTTPException
+
+from api import _parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-4", (0, 4)),
+    ("bytes=8-", (8, 9)),
+    ("bytes=-3", (7, 9)),
+    ("bytes=-50", (0, 9)),
+    ("bytes=5-500", (5, 9)),
+    (" bytes=2-2 ", (2, 2)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert _parse_range(header, 10) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=5-3",        # last < first: invalid, ignored (RFC 9110 §14.2)
+    "bytes=-",
+    "bytes=0-1,4-5",    # multiple ranges: full body
+    "items=0-4",
+    "bytes=a-b",
+])
+def test_invalid_ranges_are_ignored(header):
+    assert _parse_range(header, 10) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=10-", "bytes=20-30", "bytes=-0"])
+def test_unsatisfiable_ranges_get_416(header):
+    with pytest.raises(HTTPException) as exc:
+        _parse_range(header, 10)
+    assert exc.value.status_code == 416
+    assert exc.value.headers["Content-Range"] == "bytes */10"
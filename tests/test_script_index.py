@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from agents import script_index
+from agents.script_index import ScriptIndex, covers_topic, ngram_vector
+
+COLUMNS = [{"timecode": "0-3s", "visual_cue": "Scale", "audio": "Lose weight fast with this"}]
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(script_index, "WORKSPACE_DIR", tmp_path)
+    monkeypatch.setattr(script_index, "INDEX_FILE", tmp_path / "script_index.json")
+    monkeypatch.setattr(script_index, "VECTORS_FILE", tmp_path / "script_index.npz")
+    idx = ScriptIndex(max_entries=10)
+    idx._add(
+        {"topic": "lose weight fast", "language": "en", "script_source": "llm", "script_columns": COLUMNS},
+        ngram_vector("lose weight fast"), None,
+    )
+    return idx
+
+
+def _query(topic, embedding=None):
+    return {"topic": topic, "ngram": ngram_vector(topic), "embedding": embedding}
+
+
+def test_ngram_match_needs_same_content_words(index):
+    hit = index.nearest(_query("Lose weight FAST!"), "en")
+    assert hit is not None and hit["method"] == "ngram"
+    assert hit["similarity"] >= script_index.SCRIPT_REUSE_NGRAM_THRESHOLD
+    assert index.nearest(_query("gain weight fast"), "en") is None
+    assert index.nearest(_query("lose weight fast"), "es") is None
+
+
+def test_embedding_threshold(index):
+    e = np.zeros(4, dtype=np.float32)
+    e[0] = 1.0
+    index._add(
+        {"topic": "sleep better tonight", "language": "en", "script_source": "llm", "script_columns": COLUMNS},
+        ngram_vector("sleep better tonight"), e,
+    )
+    close = np.array([0.95, np.sqrt(1 - 0.95 ** 2), 0, 0], dtype=np.float32)
+    far = np.array([0.6, 0.8, 0, 0], dtype=np.float32)
+    hit = index.nearest(_query("fall asleep faster", close), "en")
+    assert hit["method"] == "embedding" and hit["topic"] == "sleep better tonight"
+    assert index.nearest(_query("fall asleep faster", far), "en") is None
+
+
+def test_index_persists_and_replaces_same_topic(index):
+    index._add(
+        {"topic": "Lose  Weight Fast", "language": "en", "script_source": "llm", "script_columns": COLUMNS},
+        ngram_vector("Lose  Weight Fast"), None,
+    )
+    assert index.stats()["entries"] == 1
+    reloaded = ScriptIndex()
+    assert [e["topic"] for e in reloaded.entries] == ["Lose  Weight Fast"]
+    assert reloaded.ngram.shape == (1, script_index.NGRAM_DIM)
+
+
+def test_covers_topic():
+    assert covers_topic(COLUMNS, "how to lose weight fast")
+    assert not covers_topic(COLUMNS, "gain weight fast")
@@ -0,0 +1,82 @@
+from agents.script_schema import (
+    JsonSceneStreamParser, extract_json, validate_scenes, validate_variations,
+)
+
+
+def _scenes(n, step=3, audio="line"):
+    return [
+        {"timecode": f"{i * step}-{(i + 1) * step}s", "visual_cue": "shot", "audio": f"{audio} {i}"}
+        for i in range(n)
+    ]
+
+
+def test_valid_script_is_normalized():
+    data = {"scenes": [
+        {"timecode": "0 - 2", "visual_cue": "Face", "audio": '"Wait"'},
+        {"timecode": "2-5s", "visual_cue": "B-roll", "audio": "Trick"},
+        {"timecode": "5-8.5s", "visual_cue": "Demo", "audio": "Do this"},
+    ]}
+    columns, errors = validate_scenes(data)
+    assert errors == []
+    assert [c["timecode"] for c in columns] == ["0-2s", "2-5s", "5-8.5s"]
+    assert columns[0]["audio"] == "Wait"
+
+
+def test_schema_and_timing_errors():
+    data = {"scenes": [
+        {"timecode": "0-2s", "visual_cue": "a", "audio": ""},
+        {"timecode": "oops", "visual_cue": "b", "audio": "b"},
+        {"timecode": "5-4s", "visual_cue": "c", "audio": "c"},
+    ]}
+    columns, errors = validate_scenes(data)
+    assert columns == []
+    assert any("missing audio" in e for e in errors)
+    assert any('"oops"' in e for e in errors)
+    assert any("ends before it starts" in e for e in errors)
+
+
+def test_scene_count_and_duration_limits():
+    assert any("at least" in e for e in validate_scenes({"scenes": _scenes(2)})[1])
+    assert any("at most" in e for e in validate_scenes({"scenes": _scenes(13)})[1])
+    assert any("keep it near 30s" in e for e in validate_scenes({"scenes": _scenes(12, step=4)}, 30)[1])
+    assert validate_scenes(_scenes(4))[1] == []  # bare array accepted
+
+
+def test_extract_json_tolerates_fences_and_prose():
+    assert extract_json('```json\n{"a": 1}\n```') == {"a": 1}
+    assert extract_json('Sure! Here it is: {"a": [1, 2]} Enjoy.') == {"a": [1, 2]}
+    assert extract_json("no json here") is None
+
+
+def test_variations_keep_hook_positions_when_one_is_invalid():
+    data = {"variations": [
+        {"scenes": _scenes(4, audio="A")},
+        {"scenes": _scenes(2, audio="B")},   # too short
+        {"scenes": _scenes(4, audio="C")},
+        {"scenes": _scenes(4, audio="extra")},
+    ]}
+    scripts, errors = validate_variations(data, count=3)
+    assert sorted(scripts) == [0, 2]
+    assert scripts[2][0]["audio"] == "C 0"
+    assert any(e.startswith("Variation 2:") for e in errors)
+
+
+def test_variations_report_missing_entries():
+    scripts, errors = validate_variations({"variations": [{"scenes": _scenes(3)}]}, count=2)
+    assert list(scripts) == [0]
+    assert "Expected 2 variations, got 1." in errors
+    assert validate_variations({"nope": []}, count=2)[0] == {}
+
+
+def test_stream_parser_yields_scenes_as_they_close():
+    text = '{"scenes": [' + ", ".join(
+        f'{{"timecode": "{i}-{i + 1}s", "visual_cue": "v {{x}}", "audio": "say \\"{i}\\""}}'
+        for i in range(3)
+    ) + "]}"
+    parser = JsonSceneStreamParser()
+    seen = []
+    for i in range(0, len(text), 5):
+        if parser.feed(text[i:i + 5]):
+            seen.append(len(parser.columns))
+    assert seen == [1, 2, 3]
+    assert parser.columns[1] == {"timecode": "1-2s", "visual_cue": "v {x}", "audio": 'say "1'}